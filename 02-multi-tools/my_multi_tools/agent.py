@@ -1,9 +1,18 @@
 import datetime
+from functools import lru_cache
 from zoneinfo import ZoneInfo
 from google.adk.agents.llm_agent import Agent
+from .tool_cache import memoize_tool
+
+# Zona horaria de cada ciudad conocida
+CITY_TIMEZONES = {
+    "ponferrada": "Europe/Madrid",
+}
 
 
 #Creamos una función para tomar el tiempo de una ciudad específica, en este caso de Ponferrada
+# El parte cambia poco: se memoriza 10 minutos y 'Ponferrada' y 'ponferrada' comparten resultado
+@memoize_tool(ttl_sec=600, maxsize=128, normalize=('city',))
 def get_weather(city: str) -> dict:
     """Nos da el informe meterológico actual de una ciudad específica
 
@@ -28,7 +37,13 @@ def get_weather(city: str) -> dict:
             "message": f"No se pudo obtener el informe meteorológico para {city}."
             }
     
+@lru_cache(maxsize=64)
+def _timezone(tz_identifier: str) -> ZoneInfo:
+    """Carga cada zona horaria una sola vez"""
+    return ZoneInfo(tz_identifier)
+
 # Creamos una función para obtener la hora actual de una ciudad específica
+# No se memoriza el resultado (la hora cambia en cada llamada), sólo la zona horaria
 def get_current_time(city: str) -> dict:
     """Devuelve la hora de la ciudad especificada
 
@@ -39,16 +54,15 @@ def get_current_time(city: str) -> dict:
         dict: La hora actual de la ciudad o un error
     """
 
-    if city.lower() == "ponferrada":
-        tz_identifier = "Europe/Madrid"
-    else:
+    tz_identifier = CITY_TIMEZONES.get(city.strip().casefold())
+    if tz_identifier is None:
         return {
             "status": "error",
             "error_message": (
                 f"Lo siento poero no tengo información sobre la hora en {city}."
             ),
         }
-    tz = ZoneInfo(tz_identifier)
+    tz = _timezone(tz_identifier)
     now = datetime.datetime.now(tz)
     report = (
         f'La hora actual en {city} es {now.strftime("%H:%M")}'
@@ -0,0 +1,161 @@
+import copy
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterable, Optional
+
+_registry: dict[str, 'ToolCache'] = {}
+
+def normalize_value(value: Any, fold_case: bool = False) -> Hashable:
+    """Normaliza un argumento para la clave: colecciones a tuplas y, si se pide, textos sin mayúsculas ni espacios sobrantes
+
+    Args:
+        value (Any): El valor del argumento
+        fold_case (bool, optional): El argumento no distingue mayúsculas ('  Ponferrada ' y 'ponferrada'
+            dan lo mismo). Defaults to False (los textos se comparan tal cual: URLs, rutas, códigos).
+
+    Returns:
+        Hashable: Valor equivalente apto como clave
+    """
+    if isinstance(value, str):
+        return ' '.join(value.split()).casefold() if fold_case else value
+    if isinstance(value, dict):
+        return tuple(sorted((normalize_value(k, fold_case), normalize_value(v, fold_case)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize_value(v, fold_case) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(normalize_value(v, fold_case) for v in value))
+    return value
+
+def cache_disabled(name: str) -> bool:
+    """Indica si la caché de una herramienta está desactivada con TOOL_CACHE_DISABLE ('all' o nombres separados por comas)."""
+    disabled = {n.strip() for n in os.getenv("TOOL_CACHE_DISABLE", "").split(',') if n.strip()}
+    return 'all' in disabled or name in disabled
+
+class ToolCache:
+    """
+    Caché LRU con caducidad para los resultados de una herramienta.
+
+    Guarda como mucho maxsize resultados durante ttl_sec segundos; al llenarse expulsa el
+    usado hace más tiempo. Lleva la cuenta de aciertos, fallos, caducados y expulsados.
+    """
+    def __init__(self, name: str, ttl_sec: float, maxsize: int):
+        self.name = name
+        self.ttl_sec = ttl_sec
+        self.maxsize = max(1, maxsize)
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> tuple[bool, Any]:
+        """Busca una clave; devuelve (encontrado, valor)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return True, value
+                del self._entries[key]
+                self.stats['expired'] += 1
+            self.stats['misses'] += 1
+            return False, None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_sec, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def info(self) -> dict[str, Any]:
+        """Métricas de la caché: aciertos, fallos, caducados, expulsados, tamaño y tasa de aciertos"""
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl_sec': self.ttl_sec,
+                'hit_rate': self.stats['hits'] / lookups if lookups else 0.0,
+            }
+
+def memoize_tool(
+        ttl_sec: float = 60.0,
+        maxsize: int = 256,
+        *,
+        vary: Optional[Callable[[dict], Hashable]] = None,
+        normalize: Iterable[str] = (),
+        cache_errors: bool = False,
+        enabled: bool = True,
+) -> Callable[[Callable], Callable]:
+    """Decorador que memoriza los resultados de una herramienta del agente
+
+    La clave se forma con los argumentos ya enlazados a la firma (con sus valores por defecto)
+    y normalizados con normalize_value. Sólo los argumentos de normalize se comparan sin
+    mayúsculas ni espacios sobrantes: con normalize=('city',), get_weather('Ponferrada') y
+    get_weather(city='ponferrada ') comparten resultado, pero dos URLs o rutas que sólo
+    difieren en mayúsculas no. La firma y el docstring se conservan
+    para que ADK genere la misma declaración de la herramienta. Cada resultado se devuelve
+    como copia para que quien lo modifique no altere la caché.
+
+    Args:
+        ttl_sec (float, optional): Segundos que vale un resultado. Defaults to 60.0.
+        maxsize (int, optional): Resultados guardados como máximo (LRU). Defaults to 256.
+        vary (Optional[Callable[[dict], Hashable]], optional): Recibe los argumentos y devuelve datos
+            adicionales para la clave (ej: la fecha de modificación de una carpeta). Defaults to None.
+        normalize (Iterable[str], optional): Argumentos que no distinguen mayúsculas ni espacios
+            sobrantes. Defaults to () (todos se comparan tal cual).
+        cache_errors (bool, optional): Memoriza también los resultados con status 'error'. Defaults to False.
+        enabled (bool, optional): False deja la herramienta sin caché. También se puede desactivar
+            con TOOL_CACHE_DISABLE. Defaults to True.
+
+    Returns:
+        Callable[[Callable], Callable]: El decorador
+    """
+    def decorator(fn: Callable) -> Callable:
+        if not enabled or cache_disabled(fn.__name__):
+            return fn
+        signature = inspect.signature(fn)
+        fold_case = frozenset(normalize)
+        unknown = fold_case - signature.parameters.keys()
+        if unknown:
+            raise ValueError(f"{fn.__name__} no tiene los argumentos: {', '.join(sorted(unknown))}")
+        cache = ToolCache(fn.__name__, ttl_sec, maxsize)
+        _registry[fn.__name__] = cache
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key: Hashable = tuple(
+                (name, normalize_value(value, name in fold_case)) for name, value in bound.arguments.items()
+            )
+            if vary is not None:
+                key = (key, vary(dict(bound.arguments)))
+            found, value = cache.get(key)
+            if found:
+                return copy.deepcopy(value)
+            result = fn(*args, **kwargs)
+            if cache_errors or not (isinstance(result, dict) and result.get('status') == 'error'):
+                cache.put(key, copy.deepcopy(result))
+            return result
+
+        wrapper.cache = cache  # type: ignore[attr-defined]
+        wrapper.cache_info = cache.info  # type: ignore[attr-defined]
+        wrapper.cache_clear = cache.clear  # type: ignore[attr-defined]
+        return wrapper
+    return decorator
+
+def tool_cache_stats() -> dict[str, dict[str, Any]]:
+    """Métricas de todas las herramientas memorizadas del proceso, por nombre"""
+    return {name: cache.info() for name, cache in _registry.items()}
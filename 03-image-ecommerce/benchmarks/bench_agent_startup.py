@@ -0,0 +1,154 @@
+"""
+Benchmark de arranque en frío: cuánto tarda en importarse el agente y sus herramientas.
+
+Cada módulo se importa en un intérprete nuevo con `-X importtime`, varias veces, y se
+informa de la mediana del tiempo total y de los módulos que más pesan. También comprueba
+que importar no crea el cliente de Veo (debe crearse con la primera herramienta de video).
+
+Uso:
+    python 03-image-ecommerce/benchmarks/bench_agent_startup.py
+    python 03-image-ecommerce/benchmarks/bench_agent_startup.py --save-baseline startup.json
+    python 03-image-ecommerce/benchmarks/bench_agent_startup.py --baseline startup.json --tolerance 0.25
+
+Con --baseline el script termina con código 1 si algún módulo arranca más lento que la tolerancia.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Optional
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODULES = ['my_multi_tools.veo_images_videos', 'my_multi_tools.agent']
+
+# Tras importar, el cliente de Veo no debe existir todavía
+PROBE = (
+    "import importlib, sys; importlib.import_module(sys.argv[1]); "
+    "veo = sys.modules.get('my_multi_tools.veo_images_videos'); "
+    "print('VEO_CLIENT', getattr(veo, '_client', None) is not None)"
+)
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S.*)$')
+
+def profile_import(module: str) -> dict:
+    """Importa un módulo en un intérprete nuevo y analiza la salida de -X importtime
+
+    Args:
+        module (str): Nombre del módulo a importar
+
+    Returns:
+        dict: 'total_ms', 'top' (módulos con más tiempo propio), 'client_created' o 'error'
+    """
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE, module],
+        cwd=PROJECT_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        messages = [l for l in (proc.stderr + proc.stdout).splitlines() if l.strip() and not l.startswith('import time:')]
+        return {'error': messages[-1] if messages else f"código de salida {proc.returncode}"}
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name.strip(), int(self_us), int(cumulative_us), len(indent)))
+    # Los módulos de nivel superior (menor sangría) suman el tiempo total de importación
+    min_indent = min((r[3] for r in rows), default=0)
+    total_us = sum(r[2] for r in rows if r[3] == min_indent)
+    top = sorted(rows, key=lambda r: r[1], reverse=True)[:10]
+    return {
+        'total_ms': total_us / 1000,
+        'top': [{'module': name, 'self_ms': self_us / 1000, 'cumulative_ms': cum_us / 1000} for name, self_us, cum_us, _ in top],
+        'client_created': 'VEO_CLIENT True' in proc.stdout,
+    }
+
+def run_benchmarks(modules: list[str], repeat: int) -> dict[str, dict]:
+    """Perfila cada módulo repeat veces y se queda con la mediana"""
+    report = {}
+    for module in modules:
+        runs = [profile_import(module) for _ in range(repeat)]
+        errors = [r['error'] for r in runs if 'error' in r]
+        if errors:
+            report[module] = {'error': errors[0]}
+            continue
+        median_run = sorted(runs, key=lambda r: r['total_ms'])[len(runs) // 2]
+        report[module] = {
+            'total_ms': statistics.median(r['total_ms'] for r in runs),
+            'min_ms': min(r['total_ms'] for r in runs),
+            'client_created': any(r['client_created'] for r in runs),
+            'top': median_run['top'],
+        }
+    return report
+
+def compare_with_baseline(report: dict[str, dict], baseline: dict[str, dict], tolerance: float) -> list[str]:
+    """Módulos cuyo arranque empeora más que la tolerancia respecto a la línea base
+
+    También cuentan como regresión los módulos que fallan al importarse y los que no tienen
+    medida en la línea base: sin referencia no se puede afirmar que no hayan empeorado.
+    """
+    regressions = []
+    for module, metrics in report.items():
+        reference = baseline.get(module) or {}
+        old, new = reference.get('total_ms'), metrics.get('total_ms')
+        if new is None:
+            regressions.append(f"{module}: no se puede importar")
+        elif not old:
+            regressions.append(f"{module}: sin medida en la línea base")
+        elif new > old * (1 + tolerance):
+            regressions.append(f"{module}: {new:.0f} ms > {old:.0f} ms")
+    return regressions
+
+def _format(value: Optional[float]) -> str:
+    return '-' if value is None else f"{value:.0f}"
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de arranque del agente")
+    parser.add_argument('--modules', nargs='+', default=DEFAULT_MODULES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=5, help="Módulos más pesados a mostrar")
+    parser.add_argument('--baseline', help="JSON de referencia con el que comparar")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--save-baseline', help="Guarda los resultados como línea base en este JSON")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.modules, max(1, args.repeat))
+    failed = False
+    for module, metrics in report.items():
+        if 'error' in metrics:
+            print(f"[X] {module}: {metrics['error']}")
+            failed = True
+            continue
+        print(f"\n{module}: mediana {_format(metrics['total_ms'])} ms, mínimo {_format(metrics['min_ms'])} ms")
+        for row in metrics['top'][:args.top]:
+            print(f"  {row['self_ms']:>8.1f} ms  {row['module']}")
+        if metrics['client_created']:
+            print(f"[X] {module} crea el cliente de Veo al importarse")
+            failed = True
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nLínea base guardada en {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(report, baseline, args.tolerance)
+        if regressions:
+            print("\n[X] Regresiones de arranque:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            failed = True
+        else:
+            print(f"\n[✓] Sin regresiones respecto a {args.baseline} (tolerancia {args.tolerance:.0%})")
+
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
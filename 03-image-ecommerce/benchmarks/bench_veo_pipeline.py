@@ -0,0 +1,365 @@
+"""
+Benchmark de extremo a extremo del pipeline de videos contra el cliente falso de fake_veo.py.
+
+Lanza generate_videos_for_list con lotes de imágenes sintéticas (10–1000) y mide trabajos por
+minuto, latencia de finalización p50/p99 (desde el lanzamiento hasta que el sondeo ve la
+operación terminada), sondeos por trabajo y pico de memoria (RSS). Cada lote se ejecuta en un
+proceso propio para que el pico de RSS sea sólo suyo. Los tiempos de Veo (minutos) se
+sustituyen por la distribución de latencia elegida, en segundos.
+
+Uso:
+    python 03-image-ecommerce/benchmarks/bench_veo_pipeline.py --sizes 10 100 --latency-sec 1
+    python 03-image-ecommerce/benchmarks/bench_veo_pipeline.py --fault-rate 0.1 --fault-status 503 --response mixed
+    python 03-image-ecommerce/benchmarks/bench_veo_pipeline.py --save-baseline veo.json
+    python 03-image-ecommerce/benchmarks/bench_veo_pipeline.py --baseline veo.json --tolerance 0.2
+    python 03-image-ecommerce/benchmarks/bench_veo_pipeline.py --overlap --latency fixed --latency-sec 1
+
+Con --baseline el script termina con código 1 si algún lote empeora más que la tolerancia.
+Con --overlap, en lugar de medir, se comprueba que dos lotes simultáneos del mismo proceso (dos usuarios
+del mismo servidor) no se retoman los trabajos ni se mezclan los resultados; si fallan, código 1.
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from typing import Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from fake_veo import LATENCY_DISTRIBUTIONS, RESPONSE_MODES, FakeVeoClient
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def _peak_rss_mb() -> Optional[float]:
+    """Pico de memoria residente del proceso actual en MB"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa en KB y macOS en bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def percentile(values: list[float], pct: float) -> Optional[float]:
+    """Percentil por rango más cercano (pct entre 0 y 100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, round(pct / 100 * len(ordered) + 0.5))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def make_images(folder: str, count: int, seed: int = 0) -> list[str]:
+    """Crea count imágenes distintas (cada una tiene su propio hash y no acierta en la caché)"""
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        Image = None
+    rng = random.Random(seed)
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, f"producto-{i:05d}.jpg")
+        if Image is not None:
+            img = Image.new('RGB', (1024, 1024), (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+            ImageDraw.Draw(img).rectangle((100, 100, 300 + i % 600, 700), fill=(i % 256, (i // 256) % 256, 128))
+            img.save(path, 'JPEG', quality=85)
+        else:
+            with open(path, 'wb') as f:
+                f.write(b'\xff\xd8\xff\xe0' + rng.randbytes(100_000))
+        paths.append(path)
+    return paths
+
+def _run_batch(size: int, options: dict, results) -> None:
+    """Ejecuta un lote en el proceso hijo y publica sus métricas en la cola"""
+    workdir = tempfile.mkdtemp(prefix='bench-veo-')
+    output = contextlib.nullcontext() if options['verbose'] else contextlib.redirect_stdout(io.StringIO())
+    try:
+        images_dir = os.path.join(workdir, 'images')
+        os.makedirs(images_dir)
+        paths = make_images(images_dir, size, options['seed'])
+        with output:
+            from my_multi_tools import veo_images_videos
+            from my_multi_tools.veo_operations import OperationPoller
+            from my_multi_tools.veo_scheduler import CircuitBreaker
+
+            # Tras importar: load_dotenv no debe pisar la configuración del benchmark
+            os.environ['VEO_VIDEOS_DIR'] = os.path.join(workdir, 'videos')
+            os.environ['VEO_BUDGET_PER_RUN_USD'] = '0'
+            os.environ['VEO_BUDGET_PER_DAY_USD'] = '0'
+            with FakeVeoClient(
+                latency=options['latency'],
+                latency_sec=options['latency_sec'],
+                latency_sigma=options['latency_sigma'],
+                fault_rate=options['fault_rate'],
+                fault_status=options['fault_status'],
+                retry_after=options['retry_after'],
+                failure_rate=options['failure_rate'],
+                response_mode=options['response'],
+                video_bytes=options['video_bytes'],
+                seed=options['seed'],
+            ) as client:
+                poller = OperationPoller(
+                    client.operations.get,
+                    initial_interval=options['poll_initial'],
+                    max_interval=options['poll_max'],
+                    max_polls_per_sec=options['polls_per_sec'],
+                )
+                if client.url:
+                    # Los videos gs:// se leen del servidor del cliente falso, como del emulador de Cloud Storage
+                    os.environ['STORAGE_EMULATOR_HOST'] = client.url
+                veo_images_videos.set_client(client, poller=poller)
+                start = time.perf_counter()
+                summary = veo_images_videos.generate_videos_for_list(
+                    paths,
+                    prompt="Benchmark: rotación lenta del producto",
+                    max_concurrent=options['concurrency'],
+                    scheduler_options={
+                        'base_delay': options['retry_delay'],
+                        'breaker': CircuitBreaker(cooldown_sec=options['retry_delay'] * 5),
+                    },
+                )
+                elapsed = time.perf_counter() - start
+                stats = client.snapshot()
+                latencies = client.completion_latencies()
+        results.put({
+            'size': size,
+            'elapsed_sec': elapsed,
+            'processed': summary['processed'],
+            'failed': summary['failed'],
+            'latencies': latencies,
+            'stats': stats,
+            'peak_rss_mb': _peak_rss_mb(),
+        })
+    except Exception as e:
+        results.put({'size': size, 'error': f"{type(e).__name__}: {e}"})
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def _run_overlap(options: dict, results) -> None:
+    """Lanza un lote B mientras el lote A sigue en Veo y publica los problemas encontrados en la cola"""
+    workdir = tempfile.mkdtemp(prefix='bench-veo-overlap-')
+    output = contextlib.nullcontext() if options['verbose'] else contextlib.redirect_stdout(io.StringIO())
+    problems = []
+    try:
+        images_dir = os.path.join(workdir, 'images')
+        os.makedirs(images_dir)
+        paths = make_images(images_dir, 4, options['seed'])
+        batches = {'A': paths[:2], 'B': paths[2:]}
+        with output:
+            from my_multi_tools import veo_images_videos
+            from my_multi_tools.veo_operations import OperationPoller
+
+            os.environ['VEO_VIDEOS_DIR'] = os.path.join(workdir, 'videos')
+            os.environ['VEO_BUDGET_PER_RUN_USD'] = '0'
+            os.environ['VEO_BUDGET_PER_DAY_USD'] = '0'
+            with FakeVeoClient(
+                latency=options['latency'],
+                latency_sec=options['latency_sec'],
+                latency_sigma=options['latency_sigma'],
+                response_mode=options['response'],
+                video_bytes=options['video_bytes'],
+                seed=options['seed'],
+            ) as client:
+                if client.url:
+                    os.environ['STORAGE_EMULATOR_HOST'] = client.url
+                veo_images_videos.set_client(client, poller=OperationPoller(
+                    client.operations.get,
+                    initial_interval=options['poll_initial'],
+                    max_interval=options['poll_max'],
+                    max_polls_per_sec=options['polls_per_sec'],
+                ))
+                summaries = {}
+
+                def run(name: str) -> None:
+                    summaries[name] = veo_images_videos.generate_videos_for_list(
+                        batches[name], prompt="Benchmark: rotación lenta del producto",
+                    )
+
+                first = threading.Thread(target=run, args=('A',))
+                first.start()
+                # B empieza con las operaciones de A lanzadas y apuntadas como pendientes en el diario
+                deadline = time.monotonic() + 60
+                while client.snapshot()['submitted'] < len(batches['A']) and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                time.sleep(0.1)
+                run('B')
+                first.join()
+                submitted = client.snapshot()['submitted']
+        for name, summary in summaries.items():
+            images = [r['image'] for r in summary['results']]
+            if images != batches[name]:
+                problems.append(f"lote {name}: resultados de {images}, se esperaban {batches[name]}")
+            if summary['processed'] != len(batches[name]):
+                problems.append(f"lote {name}: {summary['processed']} procesados de {len(batches[name])}")
+            if any(r.get('resumed') for r in summary['results']):
+                problems.append(f"lote {name}: ha retomado trabajos de otro lote")
+        if submitted != len(paths):
+            problems.append(f"{submitted} operaciones lanzadas para {len(paths)} imágenes")
+    except Exception as e:
+        problems.append(f"{type(e).__name__}: {e}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    results.put(problems)
+
+def check_overlapping_batches(args: argparse.Namespace) -> list[str]:
+    """Comprueba en un proceso aparte que dos lotes simultáneos no se pisan
+
+    Returns:
+        list[str]: Descripción de cada problema encontrado (vacía si todo va bien)
+    """
+    options = {key: getattr(args, key) for key in (
+        'latency', 'latency_sec', 'latency_sigma', 'response', 'video_bytes',
+        'poll_initial', 'poll_max', 'polls_per_sec', 'seed', 'verbose',
+    )}
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=_run_overlap, args=(options, results))
+    process.start()
+    problems = results.get()
+    process.join()
+    return problems
+
+def run_benchmarks(args: argparse.Namespace) -> dict[str, dict]:
+    """Ejecuta un lote por cada tamaño pedido
+
+    Returns:
+        dict[str, dict]: Métricas por tamaño de lote
+    """
+    options = {key: getattr(args, key) for key in (
+        'latency', 'latency_sec', 'latency_sigma', 'fault_rate', 'fault_status', 'retry_after',
+        'failure_rate', 'response', 'video_bytes', 'concurrency', 'poll_initial', 'poll_max',
+        'polls_per_sec', 'retry_delay', 'seed', 'verbose',
+    )}
+    # spawn: el hijo no hereda la memoria del padre y su ru_maxrss es comparable entre lotes
+    context = multiprocessing.get_context('spawn')
+    report = {}
+    for size in args.sizes:
+        results = context.Queue()
+        process = context.Process(target=_run_batch, args=(size, options, results))
+        process.start()
+        metrics = results.get()
+        process.join()
+        name = f"batch_{size}"
+        if 'error' in metrics:
+            print(f"[X] {name}: {metrics['error']}")
+            report[name] = metrics
+            continue
+        elapsed = max(metrics['elapsed_sec'], 1e-9)
+        stats = metrics.pop('stats')
+        latencies = metrics.pop('latencies')
+        metrics.update({
+            'jobs_per_min': metrics['processed'] / elapsed * 60,
+            'latency_p50_sec': percentile(latencies, 50),
+            'latency_p99_sec': percentile(latencies, 99),
+            'polls_per_job': stats['polls'] / max(1, stats['submitted']),
+            'submitted': stats['submitted'],
+            'faults': stats['faults'],
+            'upload_mb': stats['upload_bytes'] / (1024 * 1024),
+        })
+        report[name] = metrics
+    return report
+
+def compare_with_baseline(report: dict[str, dict], baseline: dict[str, dict], tolerance: float) -> list[str]:
+    """Compara las métricas con una línea base guardada
+
+    Args:
+        report (dict[str, dict]): Métricas actuales
+        baseline (dict[str, dict]): Métricas de referencia
+        tolerance (float): Empeoramiento relativo admitido (0.2 = 20%)
+
+    Returns:
+        list[str]: Descripción de cada regresión detectada
+    """
+    regressions = []
+    for name, metrics in report.items():
+        reference = baseline.get(name)
+        if not reference or 'error' in metrics or 'error' in reference:
+            continue
+        old, new = reference.get('jobs_per_min'), metrics.get('jobs_per_min')
+        if old and new is not None and new < old * (1 - tolerance):
+            regressions.append(f"{name}.jobs_per_min: {new:.1f} < {old:.1f}")
+        for key in ('latency_p50_sec', 'latency_p99_sec', 'polls_per_job', 'peak_rss_mb'):
+            old, new = reference.get(key), metrics.get(key)
+            if old and new is not None and new > old * (1 + tolerance):
+                regressions.append(f"{name}.{key}: {new:.2f} > {old:.2f}")
+    return regressions
+
+def _format(value: Optional[float], digits: int = 1) -> str:
+    return '-' if value is None else f"{value:.{digits}f}"
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline de videos de Veo")
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10, 100, 1000], help="Imágenes por lote")
+    parser.add_argument('--concurrency', type=int, default=32, help="Trabajos de Veo simultáneos")
+    parser.add_argument('--latency', choices=LATENCY_DISTRIBUTIONS, default='lognormal')
+    parser.add_argument('--latency-sec', type=float, default=1.0, help="Duración media de una operación")
+    parser.add_argument('--latency-sigma', type=float, default=0.5)
+    parser.add_argument('--fault-rate', type=float, default=0.0, help="Proporción de lanzamientos con 429/503")
+    parser.add_argument('--fault-status', type=int, default=429, choices=(429, 503))
+    parser.add_argument('--retry-after', type=float, default=None)
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Proporción de operaciones que terminan con error")
+    parser.add_argument('--response', choices=RESPONSE_MODES, default='mixed', help="Cómo entrega Veo el video")
+    parser.add_argument('--video-bytes', type=int, default=1_000_000)
+    parser.add_argument('--poll-initial', type=float, default=0.5, help="Segundos hasta el primer sondeo")
+    parser.add_argument('--poll-max', type=float, default=3.0, help="Intervalo máximo entre sondeos")
+    parser.add_argument('--polls-per-sec', type=float, default=20.0)
+    parser.add_argument('--retry-delay', type=float, default=0.2, help="Backoff base del planificador")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', help="JSON de referencia con el que comparar")
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--save-baseline', help="Guarda los resultados como línea base en este JSON")
+    parser.add_argument('--verbose', action='store_true', help="Muestra la salida del pipeline")
+    parser.add_argument('--overlap', action='store_true', help="Comprueba dos lotes simultáneos en el mismo proceso")
+    args = parser.parse_args()
+
+    if args.overlap:
+        problems = check_overlapping_batches(args)
+        if problems:
+            print("[X] Los lotes simultáneos se pisan:")
+            for problem in problems:
+                print(f"  - {problem}")
+            sys.exit(1)
+        print("[✓] Dos lotes simultáneos: cada uno procesa sólo sus imágenes")
+        return
+
+    report = run_benchmarks(args)
+
+    print(f"\n{'lote':<12}{'seg':>8}{'ok':>7}{'fallos':>8}{'jobs/min':>10}{'p50 s':>8}{'p99 s':>8}"
+          f"{'polls/job':>11}{'429/503':>9}{'RSS MB':>9}")
+    for name, m in report.items():
+        if 'error' in m:
+            continue
+        print(
+            f"{name:<12}{m['elapsed_sec']:>8.2f}{m['processed']:>7}{m['failed']:>8}{_format(m['jobs_per_min']):>10}"
+            f"{_format(m['latency_p50_sec'], 2):>8}{_format(m['latency_p99_sec'], 2):>8}"
+            f"{_format(m['polls_per_job'], 2):>11}{m['faults']:>9}{_format(m['peak_rss_mb']):>9}"
+        )
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nLínea base guardada en {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(report, baseline, args.tolerance)
+        if regressions:
+            print("\n[X] Regresiones de rendimiento:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            sys.exit(1)
+        print(f"\n[✓] Sin regresiones respecto a {args.baseline} (tolerancia {args.tolerance:.0%})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Benchmark del descargador de WordPress contra el servidor falso de fake_wordpress.py.
+
+Mide pages/s, items/s, MB/s y el pico de memoria (RSS) de fetch_media_urls, download_images
+y run en una librería sintética, con latencia y fallos 429/503 configurables. Cada caso se
+ejecuta en un proceso propio para que el pico de RSS sea sólo suyo.
+
+Uso:
+    python 03-image-ecommerce/benchmarks/bench_wordpress_downloader.py --items 2000 --latency-ms 20
+    python 03-image-ecommerce/benchmarks/bench_wordpress_downloader.py --save-baseline baseline.json
+    python 03-image-ecommerce/benchmarks/bench_wordpress_downloader.py --baseline baseline.json --tolerance 0.2
+
+Con --baseline el script termina con código 1 si algún caso empeora más que la tolerancia.
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from fake_wordpress import FakeWordPressServer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+CASES = ('fetch_media_urls', 'download_images', 'run')
+
+def _peak_rss_mb() -> Optional[float]:
+    """Pico de memoria residente del proceso actual en MB"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa en KB y macOS en bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _run_case(case: str, base_url: str, options: dict, results) -> None:
+    """Ejecuta un caso en el proceso hijo y publica sus métricas en la cola"""
+    from my_multi_tools.wordpress_downloader import WordPressMediaDownload
+
+    destination = tempfile.mkdtemp(prefix='bench-wp-')
+    output = contextlib.nullcontext() if options['verbose'] else contextlib.redirect_stdout(io.StringIO())
+    try:
+        with output:
+            downloader = WordPressMediaDownload(
+                base_url,
+                max_workers=options['workers'],
+                max_per_host=options['workers'],
+                requests_per_second=options['rate'],
+                dedup=False,
+            )
+            urls = downloader.fetch_media_urls() if case == 'download_images' else None
+            start = time.perf_counter()
+            if case == 'fetch_media_urls':
+                items = len(downloader.fetch_media_urls(max_images=options['max_images']))
+            elif case == 'download_images':
+                downloader.download_images(urls, destination)
+                items = downloader.downloaded_count
+            else:
+                items = len(downloader.run(destination, max_images=options['max_images']))
+            elapsed = time.perf_counter() - start
+        results.put({
+            'case': case,
+            'elapsed_sec': elapsed,
+            'items': items,
+            'downloaded_bytes': downloader.downloaded_bytes,
+            'failed': downloader.failed_count,
+            'peak_rss_mb': _peak_rss_mb(),
+        })
+    except Exception as e:
+        results.put({'case': case, 'error': f"{type(e).__name__}: {e}"})
+    finally:
+        shutil.rmtree(destination, ignore_errors=True)
+
+def run_benchmarks(args: argparse.Namespace) -> dict[str, dict]:
+    """Ejecuta todos los casos pedidos contra una única instancia del servidor falso
+
+    Returns:
+        dict[str, dict]: Métricas por caso
+    """
+    options = {
+        'workers': args.workers,
+        'rate': args.rate,
+        'max_images': args.max_images,
+        'verbose': args.verbose,
+    }
+    # spawn: el hijo no hereda la memoria del padre y su ru_maxrss es comparable entre casos
+    context = multiprocessing.get_context('spawn')
+    report = {}
+    with FakeWordPressServer(
+        num_items=args.items,
+        image_bytes=args.image_bytes,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        fault_rate=args.fault_rate,
+        fault_status=args.fault_status,
+        retry_after=args.retry_after,
+    ) as server:
+        for case in args.cases:
+            results = context.Queue()
+            before = server.snapshot()
+            process = context.Process(target=_run_case, args=(case, server.url, options, results))
+            process.start()
+            metrics = results.get()
+            process.join()
+            after = server.snapshot()
+            if 'error' in metrics:
+                print(f"[X] {case}: {metrics['error']}")
+                report[case] = metrics
+                continue
+            elapsed = max(metrics['elapsed_sec'], 1e-9)
+            # download_images lista antes de medir: sus páginas no cuentan
+            pages = (after['pages'] - before['pages']) if case != 'download_images' else 0
+            metrics.update({
+                'pages_per_sec': pages / elapsed if case != 'download_images' else None,
+                'items_per_sec': metrics['items'] / elapsed,
+                'mb_per_sec': metrics['downloaded_bytes'] / elapsed / (1024 * 1024),
+                'server_requests': after['requests'] - before['requests'],
+                'server_faults': after['faults'] - before['faults'],
+            })
+            report[case] = metrics
+    return report
+
+def compare_with_baseline(report: dict[str, dict], baseline: dict[str, dict], tolerance: float) -> list[str]:
+    """Compara las métricas con una línea base guardada
+
+    Args:
+        report (dict[str, dict]): Métricas actuales
+        baseline (dict[str, dict]): Métricas de referencia
+        tolerance (float): Empeoramiento relativo admitido (0.2 = 20%)
+
+    Returns:
+        list[str]: Descripción de cada regresión detectada
+    """
+    regressions = []
+    for case, metrics in report.items():
+        reference = baseline.get(case)
+        if not reference or 'error' in metrics or 'error' in reference:
+            continue
+        for key in ('pages_per_sec', 'items_per_sec', 'mb_per_sec'):
+            old, new = reference.get(key), metrics.get(key)
+            if old and new is not None and new < old * (1 - tolerance):
+                regressions.append(f"{case}.{key}: {new:.1f} < {old:.1f}")
+        old, new = reference.get('peak_rss_mb'), metrics.get('peak_rss_mb')
+        if old and new is not None and new > old * (1 + tolerance):
+            regressions.append(f"{case}.peak_rss_mb: {new:.1f} > {old:.1f}")
+    return regressions
+
+def _format(value: Optional[float]) -> str:
+    return '-' if value is None else f"{value:.1f}"
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark del descargador de WordPress")
+    parser.add_argument('--items', type=int, default=1000, help="Tamaño de la librería sintética")
+    parser.add_argument('--image-bytes', type=int, default=50_000)
+    parser.add_argument('--latency-ms', type=float, default=5.0)
+    parser.add_argument('--jitter-ms', type=float, default=5.0)
+    parser.add_argument('--fault-rate', type=float, default=0.0)
+    parser.add_argument('--fault-status', type=int, default=429, choices=(429, 503))
+    parser.add_argument('--retry-after', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=50.0, help="Peticiones por segundo iniciales por host")
+    parser.add_argument('--max-images', type=int, default=0)
+    parser.add_argument('--cases', nargs='+', choices=CASES, default=list(CASES))
+    parser.add_argument('--baseline', help="JSON de referencia con el que comparar")
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--save-baseline', help="Guarda los resultados como línea base en este JSON")
+    parser.add_argument('--verbose', action='store_true', help="Muestra la salida del descargador")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args)
+
+    print(f"\n{'caso':<18}{'seg':>8}{'items':>8}{'pages/s':>10}{'items/s':>10}{'MB/s':>8}{'RSS MB':>9}{'fallos':>8}")
+    for case, m in report.items():
+        if 'error' in m:
+            continue
+        print(
+            f"{case:<18}{m['elapsed_sec']:>8.2f}{m['items']:>8}{_format(m['pages_per_sec']):>10}"
+            f"{_format(m['items_per_sec']):>10}{_format(m['mb_per_sec']):>8}{_format(m['peak_rss_mb']):>9}"
+            f"{m['server_faults']:>8}"
+        )
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nLínea base guardada en {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(report, baseline, args.tolerance)
+        if regressions:
+            print("\n[X] Regresiones de rendimiento:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            sys.exit(1)
+        print(f"\n[✓] Sin regresiones respecto a {args.baseline} (tolerancia {args.tolerance:.0%})")
+
+if __name__ == "__main__":
+    main()
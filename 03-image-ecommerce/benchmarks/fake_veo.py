@@ -0,0 +1,273 @@
+"""
+Cliente de Veo falso para pruebas y benchmarks del pipeline de videos sin pagar Vertex AI.
+
+Imita la parte del cliente de google-genai que usa veo_images_videos: models.generate_videos
+lanza una operación de larga duración y operations.get la refresca. Cada operación tarda lo
+que marque la distribución de latencia elegida, el lanzamiento puede fallar con 429/503 (con
+Retry-After) y el video llega en línea, por URI gs:// o por HTTP, como un MP4 sintético. Un
+servidor local sirve los videos HTTP y hace de emulador de Cloud Storage para los gs://
+(STORAGE_EMULATOR_HOST=client.url).
+
+Uso:
+    from fake_veo import FakeVeoClient
+    with FakeVeoClient(latency='lognormal', latency_sec=2, response_mode='mixed') as client:
+        os.environ['STORAGE_EMULATOR_HOST'] = client.url
+        veo_images_videos.set_client(client)
+"""
+import hashlib
+import itertools
+import math
+import random
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Optional
+
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'exponential', 'lognormal')
+RESPONSE_MODES = ('inline', 'uri', 'http', 'mixed')
+FAULTS = {
+    429: ('RESOURCE_EXHAUSTED', "Quota exceeded for aiplatform.googleapis.com/online_prediction_requests"),
+    503: ('UNAVAILABLE', "The model is overloaded. Please try again later."),
+}
+_BLOCK_SIZE = 64 * 1024
+
+def synthetic_mp4(size: int, seed: str = '') -> bytes:
+    """MP4 sintético: caja ftyp y una caja mdat con relleno pseudoaleatorio hasta size bytes
+
+    Args:
+        size (int): Tamaño total en bytes
+        seed (str, optional): Semilla; cada valor da un contenido distinto. Defaults to ''.
+
+    Returns:
+        bytes: El video sintético
+    """
+    ftyp = b'ftyp' + b'isom' + struct.pack('>I', 512) + b'isomiso2avc1mp41'
+    ftyp = struct.pack('>I', len(ftyp) + 4) + ftyp
+    body_size = max(0, size - len(ftyp) - 8)
+    digest = hashlib.sha256(seed.encode()).digest()
+    block = random.Random(digest).randbytes(min(body_size, _BLOCK_SIZE)) if body_size else b''
+    body = (block * (body_size // max(1, len(block)) + 1))[:body_size]
+    return ftyp + struct.pack('>I', body_size + 8) + b'mdat' + body
+
+class FakeVeoError(Exception):
+    """Error de la API con el formato de google-genai ('429 RESOURCE_EXHAUSTED. ...')"""
+    def __init__(self, code: int, status: str, message: str, retry_after: Optional[float] = None):
+        super().__init__(f"{code} {status}. {message}")
+        self.code = code
+        self.status = status
+        headers = {'Retry-After': str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(status_code=code, headers=headers)
+
+class FakeOperation:
+    """Operación de larga duración: name, done, error y response como GenerateVideosOperation"""
+    def __init__(self, name: str, done: bool = False, response=None, error: Optional[dict] = None):
+        self.name = name
+        self.done = done
+        self.response = response
+        self.error = error
+
+class FakeVeoClient:
+    """
+    Backend de Veo local y determinista (para una semilla dada).
+
+    Los contadores de stats permiten medir el coste del pipeline: lanzamientos, fallos
+    inyectados, sondeos (operations.get) y descargas. completion_latencies() devuelve,
+    por operación, el tiempo entre el lanzamiento y el primer sondeo que la vio terminada.
+    """
+    def __init__(
+            self,
+            latency: str = 'lognormal',
+            latency_sec: float = 2.0,
+            latency_sigma: float = 0.5,
+            fault_rate: float = 0.0,
+            fault_status: int = 429,
+            retry_after: Optional[float] = None,
+            failure_rate: float = 0.0,
+            response_mode: str = 'inline',
+            video_bytes: int = 1_000_000,
+            host: str = '127.0.0.1',
+            seed: int = 0,
+    ):
+        """
+        Configura el backend falso
+
+        Args:
+            latency (str, optional): Distribución de la duración de cada operación (LATENCY_DISTRIBUTIONS). Defaults to 'lognormal'.
+            latency_sec (float, optional): Duración media de una operación en segundos. Defaults to 2.0.
+            latency_sigma (float, optional): Dispersión de la lognormal. Defaults to 0.5.
+            fault_rate (float, optional): Proporción de lanzamientos que fallan con fault_status. Defaults to 0.0.
+            fault_status (int, optional): Código de los fallos inyectados (429 o 503). Defaults to 429.
+            retry_after (Optional[float], optional): Retry-After de los fallos. Defaults to None (sin cabecera).
+            failure_rate (float, optional): Proporción de operaciones que terminan con error. Defaults to 0.0.
+            response_mode (str, optional): Cómo llega el video (RESPONSE_MODES); 'mixed' elige al azar. Defaults to 'inline'.
+            video_bytes (int, optional): Tamaño de cada MP4 sintético. Defaults to 1_000_000.
+            host (str, optional): Interfaz del servidor HTTP de videos. Defaults to '127.0.0.1'.
+            seed (int, optional): Semilla de latencias, fallos y modos de respuesta. Defaults to 0.
+        """
+        if latency not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Distribución no válida: {latency}")
+        if response_mode not in RESPONSE_MODES:
+            raise ValueError(f"Modo de respuesta no válido: {response_mode}")
+        if fault_status not in FAULTS:
+            raise ValueError(f"Código de fallo no válido: {fault_status}")
+        self.latency = latency
+        self.latency_sec = latency_sec
+        self.latency_sigma = latency_sigma
+        self.fault_rate = fault_rate
+        self.fault_status = fault_status
+        self.retry_after = retry_after
+        self.failure_rate = failure_rate
+        self.response_mode = response_mode
+        self.video_bytes = video_bytes
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._counter = itertools.count(1)
+        self._jobs: dict[str, dict] = {}
+        self.stats = {
+            'submitted': 0, 'faults': 0, 'failed_operations': 0, 'polls': 0,
+            'upload_bytes': 0, 'downloads': 0, 'download_bytes': 0,
+        }
+        self.models = SimpleNamespace(generate_videos=self._generate_videos)
+        self.operations = SimpleNamespace(get=self._get_operation)
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        if response_mode != 'inline':
+            self._httpd = ThreadingHTTPServer((host, 0), self._handler_class())
+            self._httpd.daemon_threads = True
+
+    @property
+    def url(self) -> Optional[str]:
+        if self._httpd is None:
+            return None
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeVeoClient':
+        """Arranca el servidor HTTP de videos, si el modo de respuesta lo usa"""
+        if self._httpd is not None:
+            threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        """Detiene el servidor HTTP de videos"""
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+
+    def __enter__(self) -> 'FakeVeoClient':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def snapshot(self) -> dict:
+        """Copia de los contadores"""
+        with self._lock:
+            return dict(self.stats)
+
+    def completion_latencies(self) -> list[float]:
+        """Segundos entre el lanzamiento y la detección del final de cada operación terminada"""
+        with self._lock:
+            return [job['observed'] - job['submitted'] for job in self._jobs.values() if job['observed'] is not None]
+
+    def _count(self, key: str, value: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += value
+
+    def _sample_latency(self) -> float:
+        mean = max(0.0, self.latency_sec)
+        if self.latency == 'fixed' or not mean:
+            return mean
+        if self.latency == 'uniform':
+            return self._random.uniform(0.5 * mean, 1.5 * mean)
+        if self.latency == 'exponential':
+            return self._random.expovariate(1 / mean)
+        # Lognormal con la media pedida: mu = ln(media) - sigma^2 / 2
+        sigma = self.latency_sigma
+        return self._random.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+
+    def _generate_videos(self, *, model: str, prompt: str, image=None, config=None) -> FakeOperation:
+        with self._lock:
+            fault = self.fault_rate and self._random.random() < self.fault_rate
+            if fault:
+                self.stats['faults'] += 1
+            else:
+                name = f"projects/fake/locations/us-central1/publishers/google/models/{model}/operations/{next(self._counter)}"
+                mode = self.response_mode
+                if mode == 'mixed':
+                    mode = self._random.choice(('inline', 'uri', 'http'))
+                now = time.monotonic()
+                self._jobs[name] = {
+                    'submitted': now,
+                    'ready_at': now + self._sample_latency(),
+                    'failed': bool(self.failure_rate) and self._random.random() < self.failure_rate,
+                    'mode': mode,
+                    'observed': None,
+                }
+                self.stats['submitted'] += 1
+                self.stats['upload_bytes'] += len(getattr(image, 'image_bytes', None) or b'')
+        if fault:
+            status, message = FAULTS[self.fault_status]
+            raise FakeVeoError(self.fault_status, status, message, self.retry_after)
+        return FakeOperation(name)
+
+    def _get_operation(self, operation) -> FakeOperation:
+        name = getattr(operation, 'name', None) or str(operation)
+        now = time.monotonic()
+        with self._lock:
+            self.stats['polls'] += 1
+            job = self._jobs.get(name)
+            if job is None:
+                raise FakeVeoError(404, 'NOT_FOUND', f"Operation {name} not found")
+            if now < job['ready_at']:
+                return FakeOperation(name)
+            if job['observed'] is None:
+                job['observed'] = now
+                if job['failed']:
+                    self.stats['failed_operations'] += 1
+        if job['failed']:
+            return FakeOperation(name, done=True, error={'code': 13, 'message': 'Internal error generating video'})
+        video = SimpleNamespace(video_bytes=None, uri=None, mime_type='video/mp4')
+        if job['mode'] == 'inline':
+            video.video_bytes = self._payload(name)
+        elif job['mode'] == 'http':
+            video.uri = f"{self.url}/videos/{name.rsplit('/', 1)[-1]}.mp4"
+        else:
+            video.uri = f"gs://fake-veo/{name.rsplit('/', 1)[-1]}.mp4"
+        response = SimpleNamespace(generated_videos=[SimpleNamespace(video=video)])
+        return FakeOperation(name, done=True, response=response)
+
+    def _payload(self, name: str) -> bytes:
+        # La semilla es el número de operación, así que URI y bytes en línea coinciden
+        return synthetic_mp4(self.video_bytes, name.rsplit('/', 1)[-1])
+
+    def _handler_class(self):
+        client = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                # /videos/<n>.mp4 (URI HTTP) o /download/storage/v1/b/fake-veo/o/<n>.mp4?alt=media (gs://)
+                path = self.path.split('?', 1)[0]
+                if not path.startswith(('/videos/', '/download/storage/v1/b/fake-veo/o/')):
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                payload = client._payload(path.rsplit('/', 1)[-1].removesuffix('.mp4'))
+                client._count('downloads')
+                client._count('download_bytes', len(payload))
+                self.send_response(200)
+                self.send_header('Content-Type', 'video/mp4')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                view = memoryview(payload)
+                for start in range(0, len(view), _BLOCK_SIZE):
+                    self.wfile.write(view[start:start + _BLOCK_SIZE])
+
+        return Handler
@@ -0,0 +1,264 @@
+"""
+Servidor local que imita `/wp-json/wp/v2/media` de WordPress para pruebas y benchmarks.
+
+Sirve una librería de medios sintética de tamaño configurable, con cabeceras de paginación
+(X-WP-Total/X-WP-TotalPages), proyección `_fields`, `modified_after`, imágenes con ETag,
+peticiones condicionales y Range, latencia inyectable y fallos 429/503 con Retry-After.
+
+Uso independiente:
+    python 03-image-ecommerce/benchmarks/fake_wordpress.py --items 10000 --port 8080
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+JPEG_HEADER = b'\xff\xd8\xff\xe0\x00\x10JFIF\x00'
+
+class FakeWordPressServer:
+    """
+    Librería de medios WordPress sintética servida en un hilo en segundo plano.
+    """
+    def __init__(
+            self,
+            num_items: int = 1000,
+            image_bytes: int = 50_000,
+            latency_ms: float = 0.0,
+            jitter_ms: float = 0.0,
+            fault_rate: float = 0.0,
+            fault_status: int = 429,
+            retry_after: Optional[int] = None,
+            excluded_ratio: float = 0.1,
+            host: str = '127.0.0.1',
+            port: int = 0,
+            seed: int = 0,
+    ):
+        """
+        Configura la librería sintética
+
+        Args:
+            num_items (int, optional): Número de elementos de medios. Defaults to 1000.
+            image_bytes (int, optional): Tamaño de cada imagen en bytes. Defaults to 50_000.
+            latency_ms (float, optional): Latencia fija añadida a cada respuesta. Defaults to 0.0.
+            jitter_ms (float, optional): Latencia aleatoria adicional (uniforme entre 0 y este valor). Defaults to 0.0.
+            fault_rate (float, optional): Proporción de peticiones que fallan con fault_status. Defaults to 0.0.
+            fault_status (int, optional): Código de los fallos inyectados (429 o 503). Defaults to 429.
+            retry_after (Optional[int], optional): Valor de Retry-After en los fallos. Defaults to None (sin cabecera).
+            excluded_ratio (float, optional): Proporción de elementos que los filtros deben descartar
+                (logos y miniaturas pequeñas). Defaults to 0.1.
+            host (str, optional): Interfaz de escucha. Defaults to '127.0.0.1'.
+            port (int, optional): Puerto; 0 elige uno libre. Defaults to 0.
+            seed (int, optional): Semilla de la latencia y los fallos. Defaults to 0.
+        """
+        self.num_items = num_items
+        self.image_bytes = image_bytes
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.fault_rate = fault_rate
+        self.fault_status = fault_status
+        self.retry_after = retry_after
+        self.excluded_ratio = excluded_ratio
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'pages': 0, 'images': 0, 'bytes': 0, 'faults': 0, 'not_modified': 0}
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeWordPressServer':
+        """Arranca el servidor en un hilo en segundo plano"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Detiene el servidor"""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> 'FakeWordPressServer':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def snapshot(self) -> dict:
+        """Copia de los contadores del servidor"""
+        with self._lock:
+            return dict(self.stats)
+
+    def _count(self, key: str, value: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += value
+
+    def _media_item(self, media_id: int) -> dict:
+        """Genera un elemento de medios determinista a partir de su id"""
+        excluded = self.excluded_ratio and media_id % max(1, round(1 / self.excluded_ratio)) == 0
+        name = f"logo-{media_id}" if excluded else f"producto-{media_id}"
+        width, height = 1200, 1800
+        source_url = f"{self.url}/wp-content/uploads/{name}.jpg"
+        sizes = {
+            'thumbnail': {'width': 150, 'height': 150, 'source_url': f"{self.url}/wp-content/uploads/{name}-150x150.jpg"},
+            'medium': {'width': 200, 'height': 300, 'source_url': f"{self.url}/wp-content/uploads/{name}-200x300.jpg"},
+            'large': {'width': 683, 'height': 1024, 'source_url': f"{self.url}/wp-content/uploads/{name}-683x1024.jpg"},
+            'full': {'width': width, 'height': height, 'source_url': source_url},
+        }
+        return {
+            'id': media_id,
+            'source_url': source_url,
+            'media_type': 'image',
+            'mime_type': 'image/jpeg',
+            'alt_text': name,
+            'modified_gmt': f"2024-01-{1 + media_id % 28:02d}T00:00:00",
+            'media_details': {'width': width, 'height': height, 'filesize': self.image_bytes, 'sizes': sizes},
+            'title': {'rendered': name},
+            'description': {'rendered': f"<p>{name}</p>" * 20},
+        }
+
+    def _image_payload(self, path: str) -> bytes:
+        """Imagen sintética de image_bytes bytes, distinta para cada ruta"""
+        seed = path.encode()
+        body = (seed * (self.image_bytes // max(1, len(seed)) + 1))[:max(0, self.image_bytes - len(JPEG_HEADER))]
+        return JPEG_HEADER + body
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def _send(self, status: int, body: bytes = b'', headers: Optional[dict] = None) -> None:
+                self.send_response(status)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if body:
+                    self.wfile.write(body)
+
+            def do_GET(self) -> None:
+                server._count('requests')
+                delay = server.latency_ms + (server._random.uniform(0, server.jitter_ms) if server.jitter_ms else 0)
+                if delay:
+                    time.sleep(delay / 1000)
+                if server.fault_rate and server._random.random() < server.fault_rate:
+                    server._count('faults')
+                    headers = {'Retry-After': str(server.retry_after)} if server.retry_after is not None else {}
+                    self._send(server.fault_status, b'{"code":"rest_throttled"}', headers)
+                    return
+                parsed = urlparse(self.path)
+                if parsed.path.rstrip('/') == '/wp-json/wp/v2/media':
+                    self._media_page(parse_qs(parsed.query))
+                elif parsed.path.startswith('/wp-content/uploads/'):
+                    self._image(parsed.path)
+                else:
+                    self._send(404, b'{"code":"rest_no_route"}')
+
+            def _media_page(self, query: dict) -> None:
+                per_page = min(100, int(query.get('per_page', ['10'])[0]))
+                page = int(query.get('page', ['1'])[0])
+                modified_after = query.get('modified_after', [None])[0]
+                ids = range(1, server.num_items + 1)
+                if modified_after:
+                    ids = [i for i in ids if server._media_item(i)['modified_gmt'] > modified_after]
+                total = len(ids)
+                total_pages = max(1, math.ceil(total / per_page))
+                if page > total_pages:
+                    self._send(400, b'{"code":"rest_post_invalid_page_number"}')
+                    return
+                items = [server._media_item(i) for i in list(ids)[(page - 1) * per_page:page * per_page]]
+                fields = query.get('_fields', [None])[0]
+                if fields:
+                    items = [_project(item, fields.split(',')) for item in items]
+                server._count('pages')
+                self._send(200, json.dumps(items).encode(), {
+                    'Content-Type': 'application/json',
+                    'X-WP-Total': str(total),
+                    'X-WP-TotalPages': str(total_pages),
+                })
+
+            def _image(self, path: str) -> None:
+                etag = f'"{abs(hash(path)) % 10 ** 12}"'
+                if self.headers.get('If-None-Match') == etag:
+                    server._count('not_modified')
+                    self._send(304, headers={'ETag': etag})
+                    return
+                payload = server._image_payload(path)
+                headers = {'Content-Type': 'image/jpeg', 'ETag': etag, 'Accept-Ranges': 'bytes'}
+                range_header = self.headers.get('Range')
+                if range_header and range_header.startswith('bytes='):
+                    start = int(range_header[6:].split('-')[0] or 0)
+                    if start >= len(payload):
+                        self._send(416, headers={'Content-Range': f"bytes */{len(payload)}"})
+                        return
+                    headers['Content-Range'] = f"bytes {start}-{len(payload) - 1}/{len(payload)}"
+                    body, status = payload[start:], 206
+                else:
+                    body, status = payload, 200
+                server._count('images')
+                server._count('bytes', len(body))
+                self._send(status, body, headers)
+
+        return Handler
+
+def _project(item: dict, fields: list[str]) -> dict:
+    """Aplica _fields como WordPress: admite rutas anidadas con punto (media_details.width)"""
+    result: dict = {}
+    for field in fields:
+        source, target = item, result
+        parts = field.split('.')
+        for part in parts[:-1]:
+            if not isinstance(source, dict) or part not in source:
+                break
+            source = source[part]
+            target = target.setdefault(part, {})
+        else:
+            if isinstance(source, dict) and parts[-1] in source:
+                target[parts[-1]] = source[parts[-1]]
+    return result
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Servidor WordPress falso para pruebas del descargador")
+    parser.add_argument('--items', type=int, default=1000)
+    parser.add_argument('--image-bytes', type=int, default=50_000)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--fault-rate', type=float, default=0.0)
+    parser.add_argument('--fault-status', type=int, default=429)
+    parser.add_argument('--retry-after', type=int, default=None)
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args()
+
+    server = FakeWordPressServer(
+        num_items=args.items,
+        image_bytes=args.image_bytes,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        fault_rate=args.fault_rate,
+        fault_status=args.fault_status,
+        retry_after=args.retry_after,
+        port=args.port,
+    )
+    print(f"[X] WordPress falso con {args.items} medios en {server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
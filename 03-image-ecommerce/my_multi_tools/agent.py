@@ -4,9 +4,11 @@ Este módulo contiene herramientas para la extracción de imágenes desde CMS y
 Funciones:
 - extraer_imagenes_de_cms: Extrae imágenes de un CMS específico.
 - generar_video_veo: Genera un video a partir de una imagen y un prompt.
-- listar_imagenes_en_carpeta: Lista las imágenes en una carpeta específica.
+- listar_imagenes_en_carpeta: Lista las imágenes de una carpeta con filtros (sin video, tamaño, código de producto), orden y paginación.
 - generar_videos_desde_archivos: Genera videos a partir de una lista de archivos de imagen.
 - generar_videos_en_carpeta: Genera videos para todas las imágenes en una carpeta específica.
+- estado_de_trabajos: Consulta el progreso y el resultado de los trabajos de video en segundo plano.
+- resolver_nombres_de_imagen: Corrige nombres de archivo aproximados y propone candidatos.
 """
 
 import os
@@ -32,103 +34,108 @@ def _resolve_image_path(name_or_path: str, carpeta: str = "wordpress") -> str:
     base = os.path.basename(p)
     return os.path.normpath(os.path.join(root, "images", carpeta, base))
 
-# Forzar modo API (Gemini API, no Vertex AI para el agente)
-os.environ["GOOGLE_GENAI_USE_VERTEXAI"] = "FALSE"
+def _resolve_image_name(name_or_path: str, carpeta: str = "wordpress") -> dict:
+    """Resuelve un nombre de imagen, corrigiendo mayúsculas, extensión o pequeñas erratas.
+
+    Returns:
+        dict: 'path' (None si no hay una coincidencia única), 'match_type' y 'candidates'
+    """
+    return _resolve_image_names([name_or_path], carpeta)[0]
 
-# Configurar credenciales para Veo (que SÍ usa Vertex AI)
-proj = os.getenv("GCP_PROJECT_ID") or "gdg-ponferrada"
-loc = os.getenv("GCP_LOCATION") or "us-central1"
-os.environ["GOOGLE_CLOUD_PROJECT"] = proj
-os.environ["GOOGLE_CLOUD_LOCATION"] = loc
+def _resolve_image_names(names: list[str], carpeta: str = "wordpress") -> list[dict]:
+    """Resuelve varios nombres de imagen con un único índice de nombres por carpeta.
 
-CRED_ENV = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "")
-upper_path = os.path.join(
-    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-    "gcp-credentials.json"
-)
-if not CRED_ENV or not os.path.isfile(CRED_ENV):
-    if os.path.isfile(upper_path):
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = upper_path
-        print(f"[FIX] GOOGLE_APPLICATION_CREDENTIALS -> {upper_path}")
+    Returns:
+        list[dict]: Para cada nombre, en el mismo orden, lo mismo que _resolve_image_name
+    """
+    from .image_names import name_index
+    results: list = [None] * len(names)
+    pending: dict[str, list[tuple[int, str]]] = {}
+    for position, name in enumerate(names):
+        path = _resolve_image_path(name, carpeta)
+        if not path or os.path.isfile(path):
+            results[position] = {"path": path, "match_type": "exact" if path else None, "candidates": []}
+        else:
+            pending.setdefault(os.path.dirname(path), []).append((position, os.path.basename(path)))
+    for folder, queries in pending.items():
+        # Un solo escaneo de la carpeta para todos los nombres que no existen tal cual
+        resolutions = name_index(folder).resolve_many([query for _, query in queries])
+        for (position, _), resolution in zip(queries, resolutions):
+            match = resolution["match"]
+            results[position] = {
+                "path": os.path.join(folder, match) if match else None,
+                "match_type": resolution["match_type"],
+                "candidates": [c["file"] for c in resolution["candidates"]],
+            }
+    return results
 
-print(f"[DEBUG] Gemini API mode | GCP Project={proj}, Location={loc}")
+# Forzar modo API (Gemini API, no Vertex AI para el agente)
+os.environ["GOOGLE_GENAI_USE_VERTEXAI"] = "FALSE"
 
+# Las credenciales de Vertex AI y el cliente de Veo se resuelven en la primera herramienta de video
+# (ver veo_images_videos.get_client): el agente arranca sin crear el cliente ni exigir el fichero de credenciales
+# Igual con el catálogo y el índice de duplicados (SQLite y Pillow): se importan en la herramienta que los usa
 
-import datetime
-import time 
-import mimetypes 
 from typing import List, Dict, Union
 from google.adk.agents.llm_agent import Agent
+from google.adk.tools import LongRunningFunctionTool
 # Importamos la clase del otro archivo
+from .cms_connectors import HttpTransport
 from .wordpress_downloader import WordPressMediaDownload 
-from .veo_images_videos import (
-    generate_videos_for_list, 
-    generate_videos_in_folder
-    )
-
-# Importaciones reales para la API de Veo (GenAI SDK)
-from google import genai
-from google.genai import types
-
-
-# Forzar uso de Vertex AI y proporcionar project/location para google-genai
-os.environ.setdefault("GOOGLE_GENAI_USE_VERTEXAI", "TRUE")
-
-proj = os.getenv("GCP_PROJECT_ID") or os.getenv("GOOGLE_CLOUD_PROJECT") or "gdg-ponferrada"
-loc = os.getenv("GCP_LOCATION") or os.getenv("GOOGLE_CLOUD_LOCATION") or "us-central1"
-
-os.environ["GOOGLE_CLOUD_PROJECT"] = proj
-os.environ["GOOGLE_CLOUD_LOCATION"] = loc
-# Algunas versiones del SDK también leen estas:
-os.environ["GOOGLE_GENAI_PROJECT"] = proj
-os.environ["GOOGLE_GENAI_LOCATION"] = loc
+from .shopify_downloader import ShopifyMediaDownload
+from .tool_cache import memoize_tool
+from .video_jobs import job_manager
 
 # ----------------------------------------------------------------------
 # 1. HERRAMIENTA DE EXTRACCIÓN (Wrapper para la clase WordPress)
 # ----------------------------------------------------------------------
 
+# Transporte HTTP compartido por todos los conectores: pool de conexiones, limitador y reintentos
+_cms_transport = HttpTransport()
+
+CMS_CONNECTORS = {
+    "wordpress": WordPressMediaDownload,
+    "shopify": ShopifyMediaDownload,
+}
+
 def extraer_imagenes_de_cms(cms_url: str, cms_platform: str) -> Dict[str, Union[str, List[str]]]:
     """
     Extrae imágenes desde la librería de medios de un CMS específico (WordPress, Shopify, etc.).
 
     Args:
         cms_url: La URL base del sitio web del CMS (ej: 'https://misitio.com').
-        cms_platform: La plataforma CMS a la que conectarse (actualmente solo soporta 'wordpress').
+        cms_platform: La plataforma CMS a la que conectarse ('wordpress' o 'shopify').
 
     Returns:
         Un diccionario con 'status' y la lista de 'rutas_archivos_locales' o un 'error_message'.
     """
-    if cms_platform.lower() == "wordpress":
-        try:
-            # Crea una instancia de tu clase y la ejecuta
-            downloader = WordPressMediaDownload(cms_url)
-            local_paths = downloader.run(destination_folder=f'images/{cms_platform.lower()}')
-            
-            if local_paths:
-                return {
-                    "status": "success",
-                    "rutas_archivos_locales": local_paths,
-                    "message": f"Descargadas {len(local_paths)} imágenes de WordPress. Usa una de estas rutas para generar el video."
-                }
-            else:
-                return {
-                    "status": "warning",
-                    "rutas_archivos_locales": [],
-                    "message": "Conexión exitosa, pero no se encontraron imágenes de producto después de aplicar los filtros."
-                }
-        except ValueError as e:
-            return {"status": "error", "error_message": f"Error de URL o conexión: {e}"}
-        except Exception as e:
-            return {"status": "error", "error_message": f"Fallo al ejecutar WordPress Downloader: {e}"}
-    
-    # Lógica de escalabilidad futura
-    elif cms_platform.lower() == "shopify":
-        # TODO: Implementar la lógica para la API de Shopify aquí
-        return {"status": "error", "error_message": "El soporte para Shopify está en desarrollo."}
-    
-    else:
+    platform = cms_platform.lower()
+    connector_cls = CMS_CONNECTORS.get(platform)
+    if connector_cls is None:
         return {"status": "error", "error_message": f"Plataforma CMS no soportada: {cms_platform}."}
 
+    try:
+        # Crea una instancia del conector y la ejecuta
+        downloader = connector_cls(cms_url, transport=_cms_transport)
+        local_paths = downloader.run(destination_folder=f'images/{platform}')
+
+        if local_paths:
+            return {
+                "status": "success",
+                "rutas_archivos_locales": local_paths,
+                "message": f"Descargadas {len(local_paths)} imágenes de {downloader.platform_name}. Usa una de estas rutas para generar el video."
+            }
+        else:
+            return {
+                "status": "warning",
+                "rutas_archivos_locales": [],
+                "message": "Conexión exitosa, pero no se encontraron imágenes de producto después de aplicar los filtros."
+            }
+    except ValueError as e:
+        return {"status": "error", "error_message": f"Error de URL o conexión: {e}"}
+    except Exception as e:
+        return {"status": "error", "error_message": f"Fallo al ejecutar el conector de {cms_platform}: {e}"}
+
 
 # ----------------------------------------------------------------------
 # 2. HERRAMIENTA DE GENERACIÓN DE VIDEO (Veo) - LÓGICA INTEGRADA DEL SCRIPT
@@ -144,7 +151,8 @@ def generar_video_veo(
         ) -> Dict[str, str]:
     """
     Genera un video promocional usando el modelo Veo (veo-2.0-generate-001) 
-    a partir de una imagen y un prompt detallado, integrando tu lógica de polling.
+    a partir de una imagen y un prompt detallado. El video se genera en segundo plano:
+    devuelve al momento un 'job_id' para consultar con estado_de_trabajos.
 
     Args:
         ruta_imagen_origen: Ruta local del archivo de imagen (ej: 'images/wp/vestido-1.webp').
@@ -152,26 +160,131 @@ def generar_video_veo(
         duracion_segundos: La duración deseada del video. Por defecto es 8 segundos.
 
     Returns:
-        Un diccionario con 'status' y 'video_path' o un 'error_message'.
+        Un diccionario con 'status' 'pending' y el 'job_id' del trabajo, o 'error' con los candidatos.
     """
     
     from .veo_images_videos import generate_videos_for_list
-    image_path = _resolve_image_path(nombre_archivo, carpeta)
-    print(f"[PATH] {image_path} existe={os.path.isfile(image_path)}")
+    resolution = _resolve_image_name(nombre_archivo, carpeta)
+    image_path = resolution["path"]
+    if not image_path:
+        # Sin coincidencia única no se lanza Veo: se devuelven los candidatos para elegir
+        return {
+            "status": "error",
+            "message": f"No se encontró la imagen '{nombre_archivo}' en {carpeta}",
+            "candidates": resolution["candidates"],
+        }
+    print(f"[PATH] {image_path} existe={os.path.isfile(image_path)} ({resolution['match_type']})")
     prompt = f"{prompt_video}. Short {duracion_segundos} seconds. cinematic shot, smooth camera, natural motion."
-    return generate_videos_for_list(
+    return _submit_video_job(
+        "imagen",
+        generate_videos_for_list,
+        total=1,
         image_paths=[image_path],
         prompt=prompt,
         overwrite=overwrite
     )
 
-def listar_imagenes_en_carpeta(plataforma: str = "wordpress") -> Dict[str, object]:
+def _submit_video_job(kind: str, fn, total: int, **kwargs) -> Dict[str, object]:
+    """Lanza un lote de video en segundo plano y devuelve su identificador sin esperar a Veo"""
+    job = job_manager().submit(kind, fn, total=total, **kwargs)
+    return {
+        "status": "pending",
+        "job_id": job["job_id"],
+        "state": job["state"],
+        "total": total,
+        "message": f"Trabajo {job['job_id']} en marcha. Consulta el progreso con estado_de_trabajos.",
+    }
+
+def _folders_version(arguments: dict) -> tuple:
+    """Fecha de modificación de las carpetas de imágenes y videos: cambia al añadir, borrar o renombrar ficheros
+
+    Basta un stat por carpeta. El índice de duplicados y el catálogo no escriben si nada ha
+    cambiado, así que una consulta repetida no mueve la fecha de la carpeta de imágenes.
+    """
+    from .veo_images_videos import videos_output_dir
+    folders = (os.path.join(_project_root(), "images", arguments["plataforma"]), videos_output_dir())
+    return tuple(os.stat(f).st_mtime_ns if os.path.isdir(f) else None for f in folders)
+
+@memoize_tool(ttl_sec=300, maxsize=128, vary=_folders_version)
+def listar_imagenes_en_carpeta(
+        plataforma: str = "wordpress",
+        estado_video: str = "",
+        lado_minimo: int = 0,
+        codigo_producto: str = "",
+        texto_nombre: str = "",
+        ordenar_por: str = "filename",
+        descendente: bool = False,
+        pagina: int = 1,
+        por_pagina: int = 100,
+        incluir_duplicados: bool = False,
+) -> Dict[str, object]:
+    """Lista las imágenes descargadas de una plataforma, con filtros, orden y paginación.
+
+    Args:
+        plataforma (str, optional): Carpeta de imágenes ('wordpress' o 'shopify'). Defaults to "wordpress".
+        estado_video (str, optional): Sólo imágenes con este estado de video: 'none' (sin video),
+            'pending', 'failed' o 'done'. Defaults to "" (todas).
+        lado_minimo (int, optional): Lado largo mínimo en píxeles (ej: 1000). Defaults to 0.
+        codigo_producto (str, optional): Código de producto o su prefijo (ej: '142-JUDIT'). Defaults to "".
+        texto_nombre (str, optional): Texto que debe contener el nombre del archivo. Defaults to "".
+        ordenar_por (str, optional): 'filename', 'product_code', 'size', 'width', 'height' o 'mtime'. Defaults to "filename".
+        descendente (bool, optional): Orden descendente. Defaults to False.
+        pagina (int, optional): Página a devolver, empezando en 1. Defaults to 1.
+        por_pagina (int, optional): Imágenes por página (máximo 1000). Defaults to 100.
+        incluir_duplicados (bool, optional): Incluye las copias de otra imagen. Defaults to False.
+
+    Returns:
+        Dict[str, object]: 'status', 'total' de imágenes que cumplen los filtros, la página pedida
+            y 'images' con nombre, código de producto, dimensiones, bytes y estado del video.
+    """
+    from .image_catalog import MAX_PAGE_SIZE, ImageCatalog
+    from .image_dedup import ImageDedupIndex
+    from .veo_images_videos import videos_output_dir
     images_dir = os.path.join(_project_root(), "images", plataforma)
     if not os.path.isdir(images_dir):
         return {"status": "error", "message": f"No existe: {images_dir}"}
-    soportadas = {".jpg",".jpeg",".png",".gif",".webp"}
-    files = [f for f in os.listdir(images_dir) if os.path.splitext(f)[1].lower() in soportadas]
-    return {"status": "success", "dir": images_dir, "count": len(files), "files": files[:500]}
+    por_pagina = max(1, min(por_pagina, MAX_PAGE_SIZE))
+    pagina = max(1, pagina)
+    index = ImageDedupIndex(images_dir)
+    catalog = ImageCatalog(images_dir)
+    try:
+        stats = index.refresh()
+        catalog.refresh(videos_output_dir(), dedup=index)
+        result = catalog.query(
+            video_status=estado_video or None,
+            min_edge=lado_minimo,
+            product_code=codigo_producto or None,
+            name_contains=texto_nombre or None,
+            include_duplicates=incluir_duplicados,
+            order_by=ordenar_por,
+            descending=descendente,
+            limit=por_pagina,
+            offset=(pagina - 1) * por_pagina,
+        )
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    finally:
+        catalog.close()
+        index.close()
+    return {
+        "status": "success",
+        "dir": images_dir,
+        "total": result["total"],
+        "duplicates": stats["duplicates"],
+        "page": pagina,
+        "pages": max(1, -(-result["total"] // por_pagina)),
+        "images": [
+            {
+                "file": item["filename"],
+                "product_code": item["product_code"],
+                "width": item["width"],
+                "height": item["height"],
+                "bytes": item["size"],
+                "video": item["video_status"],
+            }
+            for item in result["items"]
+        ],
+    }
 
 def generar_videos_desde_archivos(
         nombre_archivo: List[str],
@@ -190,18 +303,31 @@ def generar_videos_desde_archivos(
         overwrite (bool, optional): Si se debe sobrescribir un video existente. Defaults to False.
 
     Returns:
-        Dict[str, object]: Un diccionario con el estado y la ruta del video generado o un mensaje de error.
+        Dict[str, object]: 'status' 'pending' y el 'job_id' del trabajo en segundo plano, o un mensaje de error.
     """
     from .veo_images_videos import generate_videos_for_list
-    image_paths = [_resolve_image_path(n, carpeta) for n in nombre_archivo]
-    for p in image_paths:
-        print(f"[PATH] {p} existe={os.path.isfile(p)}")
+    image_paths = []
+    unresolved = []
+    for name, resolution in zip(nombre_archivo, _resolve_image_names(nombre_archivo, carpeta)):
+        if resolution["path"]:
+            image_paths.append(resolution["path"])
+            print(f"[PATH] {resolution['path']} existe={os.path.isfile(resolution['path'])} ({resolution['match_type']})")
+        else:
+            unresolved.append({"name": name, "candidates": resolution["candidates"]})
+    if not image_paths:
+        return {"status": "error", "message": "No se encontró ninguna de las imágenes", "unresolved": unresolved}
     prompt = f"{prompt_video}. Short {duracion_segundos} seconds. cinematic shot, smooth camera, natural motion."
-    return generate_videos_for_list(
+    result = _submit_video_job(
+        "archivos",
+        generate_videos_for_list,
+        total=len(image_paths),
         image_paths=image_paths,
         prompt=prompt,
         overwrite=overwrite
     )
+    if unresolved:
+        result["unresolved"] = unresolved
+    return result
 
 def generar_videos_en_carpeta(
         plataforma: str = "wordpress",
@@ -209,10 +335,32 @@ def generar_videos_en_carpeta(
         max_videos: int = 0,
         overwrite: bool = False
 ) -> Dict[str, object]:
+    """Genera en segundo plano los videos de todas las imágenes de una carpeta
+
+    Args:
+        plataforma (str, optional): Carpeta de imágenes (ej: 'wordpress'). Defaults to "wordpress".
+        prompt_video (str, optional): El prompt descriptivo del video.
+        max_videos (int, optional): Videos como máximo (0 = todos). Defaults to 0.
+        overwrite (bool, optional): Si se deben sobrescribir los videos existentes. Defaults to False.
+
+    Returns:
+        Dict[str, object]: 'status' 'pending' y el 'job_id' para consultar con estado_de_trabajos, o un error.
+    """
+    from .image_names import name_index
+    from .veo_images_videos import generate_videos_in_folder
     base_dir=os.path.dirname(os.path.abspath(__file__))
     image_dir=os.path.join(os.path.dirname(base_dir), "images", plataforma)
+    if not os.path.isdir(image_dir):
+        return {"status": "error", "message": f"La carpeta {image_dir} no existe"}
+    # Total aproximado (antes de descartar duplicados) a partir del índice de nombres ya cacheado
+    total = len(name_index(image_dir).filenames)
+    if max_videos > 0:
+        total = min(total, max_videos)
     prompt = f"{prompt_video}. Short 8 seconds.  cinematic shot, smooth camera, natural motion."
-    return generate_videos_in_folder(
+    return _submit_video_job(
+        "carpeta",
+        generate_videos_in_folder,
+        total=total,
         images_dir=image_dir,
         prompt=prompt,
         max_videos=max_videos,
@@ -220,6 +368,44 @@ def generar_videos_en_carpeta(
     )
 
 
+def resolver_nombres_de_imagen(nombres: List[str], carpeta: str = "wordpress") -> Dict[str, object]:
+    """Comprueba y corrige varios nombres de archivo de imagen de una vez.
+
+    Acepta nombres aproximados: sin extensión, con otras mayúsculas, sólo el principio
+    del nombre o con pequeñas erratas.
+
+    Args:
+        nombres (List[str]): Nombres de archivo tal y como los ha dado el usuario.
+        carpeta (str, optional): La carpeta de imágenes ('wordpress' o 'shopify'). Defaults to "wordpress".
+
+    Returns:
+        Dict[str, object]: 'resolved' con el archivo encontrado para cada nombre con coincidencia
+            única y 'unresolved' con los candidatos ordenados de los demás.
+    """
+    resolved = {}
+    unresolved = []
+    for name, resolution in zip(nombres, _resolve_image_names(nombres, carpeta)):
+        if resolution["path"]:
+            resolved[name] = os.path.basename(resolution["path"])
+        else:
+            unresolved.append({"name": name, "candidates": resolution["candidates"]})
+    return {"status": "success", "resolved": resolved, "unresolved": unresolved}
+
+def estado_de_trabajos(job_id: str = "") -> Dict[str, object]:
+    """Consulta los trabajos de generación de video lanzados en segundo plano
+
+    Args:
+        job_id (str, optional): El 'job_id' que devolvió la herramienta de video. Defaults to "" (todos los trabajos).
+
+    Returns:
+        Dict[str, object]: Estado ('queued', 'running', 'done' o 'failed'), progreso (procesados, omitidos,
+            fallidos) y, al terminar, el resumen y los resultados. Sin job_id, la lista de trabajos.
+    """
+    if job_id.strip():
+        return job_manager().status(job_id.strip())
+    return {"status": "success", "jobs": job_manager().list_jobs()}
+
+
     """
 # ----------------------------------------------------------------------
 # 3. DEFINICIÓN DEL AGENTE RAÍZ (ADK)
@@ -236,14 +422,18 @@ e_commerce_agent = Agent(
         "Tu objetivo es asistir al usuario en la creación de materiales de marketing (imágenes y videos). "
         "Usa 'extraer_imagenes_de_cms' para obtener imágenes de productos de cualquier CMS soportado. "
         "Luego, usa 'generar_video_veo' para convertir esas imágenes en videos promocionales. "
+        "Las herramientas de video trabajan en segundo plano y devuelven un 'job_id' al momento: "
+        "no las vuelvas a llamar para el mismo lote; informa al usuario y consulta el progreso con 'estado_de_trabajos'. "
         "Sé flexible y creativo. Si el usuario pide un video, primero intenta obtener la imagen si es necesario, y luego genera el video."
     ),
     tools=[
         extraer_imagenes_de_cms, 
-        generar_video_veo,
-        generar_videos_desde_archivos,
-        generar_videos_en_carpeta,
-        listar_imagenes_en_carpeta], 
+        LongRunningFunctionTool(func=generar_video_veo),
+        LongRunningFunctionTool(func=generar_videos_desde_archivos),
+        LongRunningFunctionTool(func=generar_videos_en_carpeta),
+        listar_imagenes_en_carpeta,
+        resolver_nombres_de_imagen,
+        estado_de_trabajos], 
 )
 
 # ADK busca una variable llamada 'root_agent'
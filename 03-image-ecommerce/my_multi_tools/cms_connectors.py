@@ -0,0 +1,561 @@
+import contextlib
+import datetime
+import hashlib
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .media_filters import MediaFilterPipeline
+from .rate_limiter import HostRateLimiters, request_with_retry
+
+if TYPE_CHECKING:
+    # SQLite y Pillow se cargan con la primera descarga, no al importar el agente
+    from .media_manifest import MediaManifest
+
+# WordPress compara modified_after con la fecha local del sitio, no con la GMT: se relista un día
+# de margen (más que cualquier diferencia horaria) y lo que no cambió se resuelve con un 304
+INCREMENTAL_MARGIN = datetime.timedelta(days=1)
+
+def incremental_since(high_water_mark: str, margin: datetime.timedelta = INCREMENTAL_MARGIN) -> str:
+    """Fecha a pedir al CMS a partir de la marca de sincronización, restando el margen
+
+    Args:
+        high_water_mark (str): Fecha ISO 8601 de la última sincronización completa
+        margin (datetime.timedelta, optional): Margen de seguridad. Defaults to INCREMENTAL_MARGIN.
+
+    Returns:
+        str: Fecha ISO 8601 en el mismo formato (con 'Z' si la original tenía zona horaria)
+    """
+    try:
+        moment = datetime.datetime.fromisoformat(high_water_mark)
+    except ValueError:
+        return high_water_mark
+    moment -= margin
+    if moment.tzinfo is not None:
+        return moment.astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    return moment.strftime('%Y-%m-%dT%H:%M:%S')
+
+class HttpTransport:
+    """
+    Capa HTTP compartida por los conectores de CMS.
+
+    Agrupa la sesión con keep-alive (pool de conexiones), el limitador adaptativo por host,
+    los reintentos y el límite de concurrencia por host. Varios conectores pueden compartir
+    la misma instancia para repartirse las conexiones y el ritmo permitido por cada servidor.
+    """
+    def __init__(
+            self,
+            max_connections: int = 8,
+            max_per_host: int = 4,
+            requests_per_second: float = 4.0,
+            host_rates: Optional[dict[str, float]] = None,
+    ):
+        """
+        Inicializa la capa de transporte
+
+        Args:
+            max_connections (int, optional): Tamaño del pool de conexiones. Defaults to 8.
+            max_per_host (int, optional): Número máximo de peticiones simultáneas contra un mismo host. Defaults to 4.
+            requests_per_second (float, optional): Tasa inicial de peticiones por host; se adapta según las respuestas. Defaults to 4.0.
+            host_rates (Optional[dict[str, float]], optional): Tasa inicial para hosts concretos (ej: el CDN). Defaults to None.
+        """
+        self.max_per_host = max(1, max_per_host)
+        # Sesión compartida con keep-alive: un pool de conexiones reutilizable por todos los hilos
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # Limitador adaptativo compartido por el listado y las descargas
+        self.rate_limiters = HostRateLimiters(default_rate=requests_per_second, host_rates=host_rates)
+        self._lock = threading.Lock()
+        self._host_slots: dict[str, threading.Semaphore] = {}
+
+    def host_slot(self, url: str) -> threading.Semaphore:
+        """Devuelve el semáforo que limita la concurrencia contra el host de la URL
+
+        Args:
+            url (str): La URL que se va a descargar
+
+        Returns:
+            threading.Semaphore: El semáforo asociado al host
+        """
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.Semaphore(self.max_per_host)
+            return self._host_slots[host]
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Hace una petición con el limitador del host y reintentos ante 429/503 y errores de red
+
+        Args:
+            method (str): Método HTTP
+            url (str): URL de la petición
+            **kwargs: Argumentos para requests.Session.request
+
+        Returns:
+            requests.Response: La respuesta
+        """
+        return request_with_retry(self.session, method, url, self.rate_limiters, **kwargs)
+
+class CMSMediaDownload(ABC):
+    """
+    Base abstracta de los conectores de CMS: cada plataforma implementa el listado
+    (iter_media_items) y comparte el motor de descarga concurrente, reanudable e incremental.
+    Un conector sin iter_media_items falla al instanciarse, no a mitad de una sincronización.
+
+    Los conectores entregan elementos normalizados con el formato de la API de medios de
+    WordPress: 'id', 'source_url', 'media_type', 'alt_text', 'modified_gmt' y 'media_details'
+    ('width', 'height' y opcionalmente 'sizes').
+    """
+    platform_name = 'CMS'
+
+    def __init__(
+            self,
+            max_workers: int = 8,
+            max_per_host: int = 4,
+            dedup: bool = True,
+            requests_per_second: float = 4.0,
+            host_rates: Optional[dict[str, float]] = None,
+            min_edge: int = 0,
+            filters: Optional[MediaFilterPipeline] = None,
+            transport: Optional[HttpTransport] = None,
+            link_duplicates: bool = False,
+    ):
+        """
+        Inicializa el motor de descarga
+
+        Args:
+            max_workers (int, optional): Número máximo de descargas simultáneas. Defaults to 8.
+            max_per_host (int, optional): Número máximo de descargas simultáneas contra un mismo host. Defaults to 4.
+            dedup (bool, optional): Actualiza el índice de duplicados tras cada descarga. Defaults to True.
+            requests_per_second (float, optional): Tasa inicial de peticiones por host; se adapta según las respuestas. Defaults to 4.0.
+            host_rates (Optional[dict[str, float]], optional): Tasa inicial para hosts concretos (ej: el CDN). Defaults to None.
+            min_edge (int, optional): Lado corto mínimo en píxeles; se descarga la versión generada más pequeña
+                que lo cumpla en lugar del original. 0 descarga siempre el original. Defaults to 0.
+            filters (Optional[MediaFilterPipeline], optional): Reglas para decidir qué medios son fotos de producto.
+                Defaults to None (palabras clave y dimensión mínima de 300px).
+            transport (Optional[HttpTransport], optional): Transporte compartido con otros conectores. Si no se indica,
+                se crea uno con max_workers, max_per_host, requests_per_second y host_rates. Defaults to None.
+            link_duplicates (bool, optional): Con dedup, sustituye las copias exactas por enlaces duros al original
+                para guardarlas una sola vez. Modifica los ficheros de la carpeta. Defaults to False.
+        """
+        self.filters = filters or MediaFilterPipeline()
+        self.downloaded_count = 0
+        self.skipped_count = 0
+        self.failed_count = 0
+        # Lo marcan los conectores si el listado se corta por un error de la API
+        self.listing_failed = False
+        self.downloaded_bytes = 0
+        self.throughput: dict[str, float] = {}
+        self.local_paths: list[str] = []
+
+        self.dedup = dedup
+        self.link_duplicates = link_duplicates
+        self.min_edge = max(0, min_edge)
+        self.max_workers = max(1, max_workers)
+        self.transport = transport or HttpTransport(
+            max_connections=self.max_workers,
+            max_per_host=max_per_host,
+            requests_per_second=requests_per_second,
+            host_rates=host_rates,
+        )
+        self._lock = threading.Lock()
+
+    def _select_rendition(self, media_item: dict) -> str:
+        """Elige la versión más pequeña de la imagen cuyo lado corto alcanza min_edge
+
+        Sólo se consideran las versiones de media_details.sizes que conservan la proporción
+        del original (las miniaturas recortadas se descartan). Si ninguna llega, se usa el original.
+
+        Args:
+            media_item (dict): El elemento de medios
+
+        Returns:
+            str: La URL a descargar
+        """
+        source_url = media_item['source_url']
+        if not self.min_edge:
+            return source_url
+        media_details = media_item.get('media_details') or {}
+        width = media_details.get('width') or 0
+        height = media_details.get('height') or 0
+        if not width or not height:
+            return source_url
+
+        best_url, best_area = source_url, width * height
+        for size in (media_details.get('sizes') or {}).values():
+            size_width = size.get('width') or 0
+            size_height = size.get('height') or 0
+            size_url = size.get('source_url')
+            if not size_url or not size_width or not size_height:
+                continue
+            if abs(size_width / size_height - width / height) > 0.02 * (width / height):
+                continue
+            if min(size_width, size_height) < self.min_edge:
+                continue
+            if size_width * size_height < best_area:
+                best_url, best_area = size_url, size_width * size_height
+        return best_url
+
+    @staticmethod
+    def _rendition_filename(media_item: dict, url: str) -> str:
+        """Nombre local de la versión descargada
+
+        Cada versión se guarda con su propio nombre para que cambiar min_edge descargue la
+        nueva en lugar de conservar la anterior, y para que un '.part' a medias de otra versión
+        nunca se reanude con bytes distintos. WordPress ya nombra sus versiones '<nombre>-<ancho>x<alto>';
+        las que sólo cambian la consulta (el '?width=' del CDN de Shopify) reciben el sufijo '-w<ancho>'.
+
+        Args:
+            media_item (dict): El elemento de medios
+            url (str): La URL elegida por _select_rendition
+
+        Returns:
+            str: El nombre de fichero
+        """
+        original = media_item['source_url'].split('/')[-1].split('?')[0]  # Eliminar parámetros de consulta si existen
+        if url == media_item['source_url']:
+            return original
+        parsed = urlparse(url)
+        chosen = parsed.path.split('/')[-1]
+        if chosen != original:
+            return chosen
+        stem, ext = os.path.splitext(original)
+        width = parse_qs(parsed.query).get('width', [''])[0]
+        tag = f"w{width}" if width.isdigit() else hashlib.sha1(url.encode('utf-8')).hexdigest()[:8]
+        return f"{stem}-{tag}{ext}"
+
+    def _is_potential_image(self, media_item: dict) -> bool:
+        """Aplica los filtros configurados para determinar si una imagen es probablemente una foto de producto
+
+        Args:
+            media_item (dict): El elemento de medios a evaluar
+
+        Returns:
+            bool: True si la imagen pasa los filtros, False en caso contrario
+        """
+        return self.filters.evaluate(media_item) is None
+
+    @abstractmethod
+    def iter_media_items(self, max_images: int = 0, modified_after: Optional[str] = None, **kwargs) -> Iterator[dict]:
+        """
+        Genera los elementos de medios que pasan los filtros de producto a medida que llegan del CMS.
+
+        Args:
+            max_images (int, optional): Número máximo de imágenes. 0 para ilimitado. Defaults to 0.
+            modified_after (Optional[str], optional): Sólo elementos modificados después de esta fecha ISO 8601. Defaults to None.
+
+        Yields:
+            dict: Los elementos de medios válidos, normalizados
+        """
+
+    def fetch_media_items(self, max_images: int = 0, **kwargs) -> list[dict]:
+        """
+        Recupera en una lista los elementos de medios que pasan los filtros de producto.
+
+        Args:
+            max_images (int, optional): Número máximo de imágenes. 0 para ilimitado. Defaults to 0.
+            **kwargs: Argumentos adicionales de iter_media_items
+
+        Returns:
+            list[dict]: Los elementos de medios válidos, en el orden de la API
+        """
+        return list(self.iter_media_items(max_images=max_images, **kwargs))
+
+    def fetch_media_urls(self, max_images: int = 0) -> list[str]:
+        """
+        Recupera todas las URLs de imágenes de la API de medios, manejando la paginación
+
+        Returns:
+            list[str]: Una lista de URLs de imágenes
+        """
+        final_urls = [item['source_url'] for item in self.fetch_media_items(max_images=max_images)]
+
+        print(f"Se encontraron un total de {len(final_urls)} URLs de imágenes válidas.")
+        return final_urls
+
+    def _destination_path(self, destination_folder: str) -> str:
+        """Resuelve la carpeta de destino relativa a la raíz del proyecto y la crea
+
+        Args:
+            destination_folder (str): Carpeta de destino (relativa o absoluta)
+
+        Returns:
+            str: Ruta absoluta de la carpeta de destino
+        """
+        # Vamos crear el destino de manera realita a la carpeta de 'image-ecommerce'
+        project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+        abs_destination_folder = os.path.join(project_root, destination_folder)
+
+        print(f'Creando directorio de destino: {abs_destination_folder}')
+        os.makedirs(abs_destination_folder, exist_ok=True)
+        return abs_destination_folder
+
+    def download_images(self, urls: list[str], destination_folder: str = 'images'):
+        """Descarga imágenes desde una lista de URLs a una carpeta de destino
+
+        Args:
+            urls (list[str]): Lista de URLs de imágenes a descargar
+            destination_folder (str, optional): Carpeta de destino para las imágenes descargadas. Defaults to 'images'.
+        """
+        self.download_media_items([{'source_url': url} for url in urls], destination_folder)
+
+    def download_media_items(
+            self,
+            media_items: Iterable[dict],
+            destination_folder: str = 'images',
+            manifest: Optional['MediaManifest'] = None,
+    ):
+        """Descarga en paralelo los elementos de medios a una carpeta de destino
+
+        Acepta cualquier iterable, incluido el generador de iter_media_items: los elementos se
+        consumen a través de una cola acotada, así que la descarga empieza con la primera página
+        y la memoria no crece con el tamaño de la librería.
+
+        Con un manifiesto, los ficheros ya conocidos se piden con If-None-Match/If-Modified-Since
+        en lugar de saltarse por nombre, de modo que se detectan cambios aunque el nombre no cambie.
+
+        Args:
+            media_items (Iterable[dict]): Elementos de medios con al menos 'source_url'
+            destination_folder (str, optional): Carpeta de destino para las imágenes descargadas. Defaults to 'images'.
+            manifest (Optional[MediaManifest], optional): Manifiesto para la sincronización incremental. Defaults to None.
+        """
+        abs_destination_folder = self._destination_path(destination_folder)
+
+        start_time = time.perf_counter()
+        bytes_before = self.downloaded_bytes
+        files_before = self.downloaded_count
+
+        # Como mucho max_workers descargas en curso y otras tantas esperando en cola
+        slots = threading.BoundedSemaphore(self.max_workers * 2)
+        submitted = 0
+
+        def release(future) -> None:
+            slots.release()
+            if future.exception() is not None:
+                print(f"Error inesperado en la descarga: {future.exception()}")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for item in media_items:
+                slots.acquire()
+                executor.submit(self._download_one, item, abs_destination_folder, manifest).add_done_callback(release)
+                submitted += 1
+
+        if not submitted:
+            print("No hay URLs para descargar.")
+            return
+
+        elapsed = max(time.perf_counter() - start_time, 1e-9)
+        total_bytes = self.downloaded_bytes - bytes_before
+        total_files = self.downloaded_count - files_before
+        self.throughput = {
+            'elapsed_sec': elapsed,
+            'bytes_per_sec': total_bytes / elapsed,
+            'files_per_sec': total_files / elapsed,
+        }
+        print(
+            f"Rendimiento: {total_files} archivos, {total_bytes / (1024 * 1024):.2f} MB en {elapsed:.2f}s "
+            f"({self.throughput['bytes_per_sec'] / (1024 * 1024):.2f} MB/s, "
+            f"{self.throughput['files_per_sec']:.2f} archivos/s)"
+        )
+
+        if self.dedup:
+            from .image_dedup import ImageDedupIndex
+            index = ImageDedupIndex(abs_destination_folder)
+            try:
+                stats = index.refresh(link_exact=self.link_duplicates)
+            finally:
+                index.close()
+            print(
+                f"Índice de duplicados: {stats['indexed']} imágenes, "
+                f"{stats['duplicates']} duplicadas ({stats['hashed']} recalculadas)."
+            )
+
+    def _download_one(
+            self,
+            media_item: dict,
+            abs_destination_folder: str,
+            manifest: Optional['MediaManifest'] = None,
+    ) -> None:
+        """Descarga una única imagen usando la sesión compartida y actualiza los contadores
+
+        Args:
+            media_item (dict): Elemento de medios con al menos 'source_url'
+            abs_destination_folder (str): Carpeta de destino absoluta
+            manifest (Optional[MediaManifest], optional): Manifiesto para peticiones condicionales. Defaults to None.
+        """
+        url = self._select_rendition(media_item)
+        try:
+            filename = self._rendition_filename(media_item, url)
+            filepath = os.path.join(abs_destination_folder, filename)
+
+            headers = {}
+            if manifest is None:
+                if os.path.exists(filepath):
+                    print(f"El archivo {filename} ya existe. Saltando descarga.")
+                    with self._lock:
+                        self.skipped_count += 1
+                        self.local_paths.append(filepath)
+                    return
+            elif os.path.exists(filepath):
+                entry = manifest.get(media_item.get('id'))
+                if entry and entry['local_path'] == filepath and (entry['etag'] or entry['last_modified']):
+                    if entry['etag']:
+                        headers['If-None-Match'] = entry['etag']
+                    if entry['last_modified']:
+                        headers['If-Modified-Since'] = entry['last_modified']
+                else:
+                    headers['If-Modified-Since'] = formatdate(os.path.getmtime(filepath), usegmt=True)
+
+            # Se descarga a un fichero temporal que sólo se renombra al verificarse completo;
+            # si quedó uno a medias de una ejecución anterior, se reanuda con Range
+            part_path = f"{filepath}.part"
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            if offset:
+                headers['Range'] = f"bytes={offset}-"
+            headers['Accept-Encoding'] = 'identity'
+
+            print(f"Descargando {url} -> {filepath}" + (f" (reanudando desde {offset} bytes)" if offset else ""))
+            written = 0
+            with self.transport.host_slot(url):
+                with self.transport.request('GET', url, stream=True, timeout=15, headers=headers) as r:
+                    not_modified = r.status_code == 304
+                    if not not_modified:
+                        if r.status_code == 416 and offset:
+                            # Rango rechazado: el .part ya no vale. Sin Range, el 416 es un error HTTP más
+                            with contextlib.suppress(FileNotFoundError):
+                                os.remove(part_path)
+                            raise IOError(f"El servidor rechazó reanudar {filename}; se descargará de cero en la próxima ejecución")
+                        r.raise_for_status()
+                        written, expected_size = self._write_part(r, part_path, offset)
+                        actual_size = os.path.getsize(part_path)
+                        if expected_size is not None and actual_size != expected_size:
+                            raise IOError(
+                                f"Descarga incompleta de {filename}: {actual_size} de {expected_size} bytes"
+                            )
+                        os.replace(part_path, filepath)
+                    if manifest is not None:
+                        manifest.record(
+                            media_item.get('id'),
+                            source_url=url,
+                            modified_gmt=media_item.get('modified_gmt'),
+                            etag=r.headers.get('ETag'),
+                            last_modified=r.headers.get('Last-Modified'),
+                            local_path=filepath,
+                        )
+            if not_modified:
+                print(f"El archivo {filename} no ha cambiado. Saltando descarga.")
+                with self._lock:
+                    self.skipped_count += 1
+                    self.local_paths.append(filepath)
+                return
+            with self._lock:
+                self.downloaded_count += 1
+                self.downloaded_bytes += written
+                self.local_paths.append(filepath)
+        except requests.exceptions.RequestException as e:
+            print(f"Error al descargar {url}: {e}")
+            with self._lock:
+                self.failed_count += 1
+        except Exception as e:
+            print(f"Error inesperado al descargar {url}: {e}")
+            with self._lock:
+                self.failed_count += 1
+
+    @staticmethod
+    def _write_part(response: requests.Response, part_path: str, offset: int) -> tuple[int, Optional[int]]:
+        """Escribe la respuesta en el fichero temporal y lo sincroniza con disco
+
+        Args:
+            response (requests.Response): Respuesta 200 (completa) o 206 (parcial)
+            part_path (str): Ruta del fichero temporal
+            offset (int): Bytes ya descargados en el fichero temporal
+
+        Returns:
+            tuple[int, Optional[int]]: Bytes escritos y tamaño final esperado (None si el servidor no lo indica)
+        """
+        expected_size = None
+        mode = 'wb'
+        if response.status_code == 206:
+            # Content-Range: bytes <inicio>-<fin>/<total>
+            content_range = response.headers.get('Content-Range', '')
+            try:
+                range_part, total = content_range.split(' ', 1)[1].split('/')
+                start = int(range_part.split('-')[0])
+            except (IndexError, ValueError):
+                raise IOError(f"Content-Range no válido: {content_range!r}")
+            if start != offset:
+                os.remove(part_path)
+                raise IOError(f"El servidor reanudó en el byte {start} en lugar de {offset}")
+            expected_size = int(total) if total.isdigit() else None
+            mode = 'ab'
+        elif response.headers.get('Content-Length', '').isdigit():
+            expected_size = int(response.headers['Content-Length'])
+
+        written = 0
+        with open(part_path, mode) as f:
+            for chunk in response.iter_content(chunk_size=65536):
+                f.write(chunk)
+                written += len(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        return written, expected_size
+
+    def run(
+            self,
+            destination_folder: str,
+            max_images: int = 0,
+            incremental: bool = False,
+            streaming: bool = True,
+    ) -> list[str]:
+        """Método principal para obtener las URLs de imágenes y descargarlas
+
+        Args:
+            destination_folder (str, optional): Carpeta de destino para las imágenes descargadas.
+            max_images (int, optional): Número máximo de imágenes a descargar. 0 para ilimitado. Defaults to 0.
+            incremental (bool, optional): Sólo lista lo modificado desde la última sincronización completa
+                (con INCREMENTAL_MARGIN de margen) y descarga con peticiones condicionales usando el manifiesto
+                de la carpeta. La marca sólo avanza si se listó todo (sin max_images) y no falló ninguna
+                descarga, así que lo fallido se vuelve a listar en la siguiente ejecución. Defaults to False.
+            streaming (bool, optional): Descarga cada página en cuanto llega, solapando listado y descarga.
+                Si es False, primero se obtiene el listado completo. Defaults to True.
+
+        Returns:
+            list[str]: Rutas locales de las imágenes descargadas o ya presentes en esta ejecución
+        """
+        print(f"Iniciando el proceso de descarga de imágenes desde {self.platform_name}... Límite de descarga de imágenes: {'Sin límite' if max_images == 0 else max_images}")
+        from .media_manifest import MediaManifest
+        manifest = MediaManifest(self._destination_path(destination_folder)) if incremental else None
+        try:
+            high_water_mark = manifest.high_water_mark() if manifest else None
+            modified_after = incremental_since(high_water_mark) if high_water_mark else None
+            if modified_after:
+                print(f"Sincronización incremental: medios modificados después de {modified_after}")
+            failed_before = self.failed_count
+            self.listing_failed = False
+            # Las rutas devueltas son las de esta ejecución; los contadores sí se acumulan
+            self.local_paths = []
+            media_items = self.iter_media_items(max_images=max_images, modified_after=modified_after)
+            if not streaming:
+                media_items = list(media_items)
+                print(f"Se encontraron un total de {len(media_items)} imágenes válidas.")
+            self.download_media_items(media_items, destination_folder, manifest=manifest)
+            if manifest is not None:
+                if max_images == 0 and not self.listing_failed and self.failed_count == failed_before:
+                    manifest.set_high_water_mark(manifest.last_modified_gmt())
+                else:
+                    print("[!] Sincronización incompleta: la próxima ejecución volverá a listar desde la marca anterior")
+        finally:
+            if manifest is not None:
+                manifest.close()
+        print("Proceso de descarga completado.")
+        return list(self.local_paths)
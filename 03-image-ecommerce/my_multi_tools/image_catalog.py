@@ -0,0 +1,280 @@
+import os
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow es una dependencia; si falta se avisa y no se guardan las dimensiones
+    Image = None
+
+from .image_dedup import SUPPORTED_EXTS, ImageDedupIndex, file_sha256, warn_without_pillow
+from .veo_journal import JOURNAL_FILENAME, VeoJobJournal
+
+CATALOG_FILENAME = '.image_catalog.sqlite'
+SORT_COLUMNS = ('filename', 'product_code', 'size', 'width', 'height', 'mtime')
+VIDEO_STATUSES = ('none', 'pending', 'failed', 'done')
+MAX_PAGE_SIZE = 1000
+
+# Sufijos que añaden los CMS a las variantes: "_<uuid>" de Shopify y "-1", "-2"… de WordPress,
+# más los de las versiones reducidas: "-683x1024" de WordPress y "-w800" del CDN de Shopify
+_VARIANT_SUFFIX_RE = re.compile(r'(_[0-9a-f]{8}(-[0-9a-f]{4}){3}-[0-9a-f]{12}|-\d+x\d+|-w\d+|-\d+)*$', re.IGNORECASE)
+
+def product_code(filename: str) -> str:
+    """Código de producto a partir del nombre del fichero ('142-JUDIT-4-1.jpg' -> '142-JUDIT')
+
+    Args:
+        filename (str): Nombre del fichero
+
+    Returns:
+        str: El nombre sin extensión ni sufijos de variante
+    """
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return _VARIANT_SUFFIX_RE.sub('', stem) or stem
+
+def image_size(path: str) -> tuple[Optional[int], Optional[int]]:
+    """Ancho y alto de una imagen leyendo sólo la cabecera
+
+    Returns:
+        tuple[Optional[int], Optional[int]]: (ancho, alto) o (None, None) sin Pillow o si no se puede leer
+    """
+    if Image is None:
+        warn_without_pillow("el catálogo no guarda las dimensiones y los filtros por tamaño no encuentran nada")
+        return None, None
+    try:
+        with Image.open(path) as img:
+            return img.size
+    except Exception:
+        return None, None
+
+def _describe(path: str, sha256: Optional[str] = None) -> tuple[str, Optional[int], Optional[int]]:
+    width, height = image_size(path)
+    return sha256 or file_sha256(path), width, height
+
+class ImageCatalog:
+    """
+    Catálogo persistente de una carpeta de imágenes.
+
+    Guarda por cada imagen tamaño, fecha, dimensiones, hash de contenido, código de producto,
+    si es duplicado de otra y el estado de su video, en SQLite dentro de la carpeta. refresh()
+    recorre la carpeta con os.scandir y sólo vuelve a leer los ficheros cuyo tamaño o fecha
+    cambian, así que las consultas filtradas, ordenadas y paginadas no tocan el disco. Si se le
+    pasa el ImageDedupIndex de la carpeta, toma de él el hash y el original de cada imagen en
+    lugar de volver a leer el fichero entero.
+    """
+    def __init__(self, folder: str, filename: str = CATALOG_FILENAME):
+        """
+        Abre (o crea) el catálogo de una carpeta
+
+        Args:
+            folder (str): Carpeta de imágenes
+            filename (str, optional): Nombre del fichero SQLite. Defaults to CATALOG_FILENAME.
+        """
+        self.folder = folder
+        self._conn = sqlite3.connect(os.path.join(folder, filename))
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS images (
+                filename TEXT PRIMARY KEY,
+                product_code TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                width INTEGER,
+                height INTEGER,
+                sha256 TEXT NOT NULL,
+                duplicate_of TEXT,
+                video_status TEXT NOT NULL DEFAULT 'none'
+            );
+            CREATE INDEX IF NOT EXISTS images_product_code ON images (product_code);
+            CREATE INDEX IF NOT EXISTS images_video_status ON images (video_status);
+            """
+        )
+        self._conn.commit()
+
+    def refresh(
+            self,
+            videos_dir: Optional[str] = None,
+            dedup: Optional[ImageDedupIndex] = None,
+            max_workers: int = 8,
+    ) -> dict[str, int]:
+        """Actualiza el catálogo de forma incremental
+
+        Args:
+            videos_dir (Optional[str], optional): Carpeta de videos; si se indica se actualiza el estado
+                del video de cada imagen ('<nombre>.mp4' y el diario de Veo). Defaults to None.
+            dedup (Optional[ImageDedupIndex], optional): Índice de duplicados ya actualizado de la misma carpeta;
+                se reutilizan su SHA-256 y su original de cada imagen. Defaults to None (se calcula el hash
+                aquí y no se cambian los duplicados).
+            max_workers (int, optional): Hilos para leer los ficheros nuevos o modificados. Defaults to 8.
+
+        Returns:
+            dict[str, int]: Contadores de imágenes indexadas, leídas de nuevo y eliminadas
+        """
+        known = {
+            row[0]: (row[1], row[2])
+            for row in self._conn.execute("SELECT filename, size, mtime FROM images")
+        }
+        seen = set()
+        changed = []
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if not entry.is_file() or os.path.splitext(entry.name)[1].lower() not in SUPPORTED_EXTS:
+                    continue
+                seen.add(entry.name)
+                stat = entry.stat()
+                if known.get(entry.name) != (stat.st_size, stat.st_mtime):
+                    changed.append((entry.name, entry.path, stat.st_size, stat.st_mtime))
+
+        records = dedup.records() if dedup is not None else {}
+        if changed:
+            # El hash del índice de duplicados vale si es del mismo tamaño y fecha; si no, hay que leer el fichero
+            hashes = []
+            for name, _, size, mtime in changed:
+                record = records.get(name)
+                hashes.append(record[2] if record and record[:2] == (size, mtime) else None)
+            # Leer cabeceras y hashear es E/S: los hilos solapan las lecturas de los ficheros nuevos
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                described = list(executor.map(lambda item, sha256: _describe(item[1], sha256), changed, hashes))
+            self._conn.executemany(
+                "INSERT INTO images (filename, product_code, size, mtime, width, height, sha256) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(filename) DO UPDATE SET size = excluded.size, mtime = excluded.mtime, "
+                "width = excluded.width, height = excluded.height, sha256 = excluded.sha256",
+                [
+                    (name, product_code(name), size, mtime, width, height, sha256)
+                    for (name, _, size, mtime), (sha256, width, height) in zip(changed, described)
+                ],
+            )
+        removed = [name for name in known if name not in seen]
+        self._conn.executemany("DELETE FROM images WHERE filename = ?", [(name,) for name in removed])
+
+        if dedup is not None:
+            # Sólo se escriben los originales que cambian: sin cambios en la carpeta no hay escrituras
+            updates = []
+            for name, current in self._conn.execute("SELECT filename, duplicate_of FROM images").fetchall():
+                original = records[name][3] if name in records else None
+                if original != current:
+                    updates.append((original, name))
+            self._conn.executemany("UPDATE images SET duplicate_of = ? WHERE filename = ?", updates)
+        if videos_dir is not None:
+            self._refresh_video_status(videos_dir)
+        self._conn.commit()
+        return {'indexed': len(seen), 'updated': len(changed), 'removed': len(removed)}
+
+    def _refresh_video_status(self, videos_dir: str) -> None:
+        """Estado del video de cada imagen: 'done' si existe el MP4; si no, el del diario de Veo"""
+        videos = set()
+        if os.path.isdir(videos_dir):
+            with os.scandir(videos_dir) as entries:
+                videos = {e.name[:-4] for e in entries if e.name.endswith('.mp4') and e.is_file()}
+        states = {}
+        if os.path.exists(os.path.join(videos_dir, JOURNAL_FILENAME)):
+            journal = VeoJobJournal(videos_dir)
+            try:
+                states = journal.latest_states()
+            finally:
+                journal.close()
+        folder = os.path.abspath(self.folder)
+        updates = []
+        for name, current in self._conn.execute("SELECT filename, video_status FROM images").fetchall():
+            if os.path.splitext(name)[0] in videos:
+                status = 'done'
+            else:
+                state = states.get(os.path.join(folder, name))
+                status = 'pending' if state in ('pending', 'done') else 'failed' if state == 'failed' else 'none'
+            if status != current:
+                updates.append((status, name))
+        self._conn.executemany("UPDATE images SET video_status = ? WHERE filename = ?", updates)
+
+    def query(
+            self,
+            *,
+            video_status: Optional[str] = None,
+            min_width: int = 0,
+            min_height: int = 0,
+            min_edge: int = 0,
+            product_code: Optional[str] = None,
+            name_contains: Optional[str] = None,
+            include_duplicates: bool = False,
+            order_by: str = 'filename',
+            descending: bool = False,
+            limit: int = 100,
+            offset: int = 0,
+    ) -> dict[str, object]:
+        """Consulta filtrada, ordenada y paginada del catálogo
+
+        Args:
+            video_status (Optional[str], optional): Uno de VIDEO_STATUSES. Defaults to None (todos).
+            min_width (int, optional): Ancho mínimo en píxeles. Defaults to 0.
+            min_height (int, optional): Alto mínimo en píxeles. Defaults to 0.
+            min_edge (int, optional): Lado largo mínimo en píxeles. Defaults to 0.
+            product_code (Optional[str], optional): Código de producto (se admite el prefijo). Defaults to None.
+            name_contains (Optional[str], optional): Texto contenido en el nombre (sin distinguir mayúsculas). Defaults to None.
+            include_duplicates (bool, optional): Incluye las imágenes duplicadas de otra. Defaults to False.
+            order_by (str, optional): Columna de SORT_COLUMNS. Defaults to 'filename'.
+            descending (bool, optional): Orden descendente. Defaults to False.
+            limit (int, optional): Tamaño de página (máximo MAX_PAGE_SIZE). Defaults to 100.
+            offset (int, optional): Elementos a saltar. Defaults to 0.
+
+        Raises:
+            ValueError: Si order_by o video_status no son válidos
+
+        Returns:
+            dict[str, object]: 'total' (sin paginar) e 'items' con los datos de cada imagen
+        """
+        if order_by not in SORT_COLUMNS:
+            raise ValueError(f"Orden no válido: {order_by}. Opciones: {', '.join(SORT_COLUMNS)}")
+        if video_status is not None and video_status not in VIDEO_STATUSES:
+            raise ValueError(f"Estado de video no válido: {video_status}. Opciones: {', '.join(VIDEO_STATUSES)}")
+        clauses, params = [], []
+        if video_status is not None:
+            clauses.append("video_status = ?")
+            params.append(video_status)
+        if min_width:
+            clauses.append("width >= ?")
+            params.append(min_width)
+        if min_height:
+            clauses.append("height >= ?")
+            params.append(min_height)
+        if min_edge:
+            clauses.append("MAX(width, height) >= ?")
+            params.append(min_edge)
+        if product_code:
+            clauses.append("product_code LIKE ? ESCAPE '\\'")
+            params.append(_escape_like(product_code) + '%')
+        if name_contains:
+            clauses.append("filename LIKE ? ESCAPE '\\'")
+            params.append('%' + _escape_like(name_contains) + '%')
+        if not include_duplicates:
+            clauses.append("duplicate_of IS NULL")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        total = self._conn.execute(f"SELECT COUNT(*) FROM images {where}", params).fetchone()[0]
+        direction = 'DESC' if descending else 'ASC'
+        rows = self._conn.execute(
+            "SELECT filename, product_code, size, width, height, mtime, sha256, duplicate_of, video_status "
+            f"FROM images {where} ORDER BY {order_by} {direction}, filename {direction} LIMIT ? OFFSET ?",
+            [*params, max(1, min(limit, MAX_PAGE_SIZE)), max(0, offset)],
+        ).fetchall()
+        keys = ('filename', 'product_code', 'size', 'width', 'height', 'mtime', 'sha256', 'duplicate_of', 'video_status')
+        return {'total': total, 'items': [dict(zip(keys, row)) for row in rows]}
+
+    def filenames(self, include_duplicates: bool = True) -> list[str]:
+        """Nombres de todas las imágenes del catálogo, ordenados
+
+        Args:
+            include_duplicates (bool, optional): Incluye las imágenes duplicadas de otra. Defaults to True.
+
+        Returns:
+            list[str]: Nombres de fichero
+        """
+        where = "" if include_duplicates else "WHERE duplicate_of IS NULL"
+        return [row[0] for row in self._conn.execute(f"SELECT filename FROM images {where} ORDER BY filename")]
+
+    def close(self) -> None:
+        """Cierra la conexión con la base de datos"""
+        self._conn.close()
+
+def _escape_like(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
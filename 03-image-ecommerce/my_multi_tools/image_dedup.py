@@ -0,0 +1,279 @@
+import hashlib
+import os
+import sqlite3
+from typing import Optional
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow es una dependencia; si falta se avisa y sólo se detectan copias exactas
+    Image = None
+
+DEDUP_INDEX_FILENAME = '.dedup_index.sqlite'
+SUPPORTED_EXTS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+PHASH_SIZE = 16
+
+_pillow_warnings: set[str] = set()
+
+def warn_without_pillow(consequence: str) -> None:
+    """Avisa (una vez por proceso y consecuencia) de que falta Pillow y qué deja de funcionar
+
+    Args:
+        consequence (str): Lo que se degrada sin Pillow (ej: 'no se detectan casi duplicados')
+    """
+    if consequence not in _pillow_warnings:
+        _pillow_warnings.add(consequence)
+        print(f"[!] Pillow no está instalado (pip install pillow): {consequence}")
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Calcula el SHA-256 de un fichero leyéndolo por bloques
+
+    Args:
+        path (str): Ruta del fichero
+        chunk_size (int, optional): Tamaño de bloque de lectura. Defaults to 1 MB.
+
+    Returns:
+        str: El hash en hexadecimal
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def perceptual_hash(path: str, hash_size: int = PHASH_SIZE) -> Optional[int]:
+    """Calcula un hash perceptual (dHash) resistente a redimensionados y recompresiones
+
+    Con fondos de estudio uniformes un dHash de 64 bits confunde productos distintos,
+    por eso se usa una rejilla de 16x16 (256 bits).
+
+    Args:
+        path (str): Ruta de la imagen
+        hash_size (int, optional): Lado de la rejilla de comparación. Defaults to PHASH_SIZE.
+
+    Returns:
+        Optional[int]: El hash o None si Pillow no está disponible o la imagen no se puede leer
+    """
+    if Image is None:
+        warn_without_pillow("no se detectan casi duplicados, sólo copias exactas")
+        return None
+    try:
+        with Image.open(path) as img:
+            img.draft('L', (hash_size * 8, hash_size * 8))  # Decodificación reducida en JPEG: mucho más rápido en originales grandes
+            small = img.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+            pixels = small.tobytes()
+    except Exception as e:
+        print(f"[!] No se pudo calcular el hash perceptual de {path}: {e}")
+        return None
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+def _hash_blocks(bits: int, count: int) -> list[tuple[int, int]]:
+    """Parte un hash de bits bits en count bloques casi iguales: (desplazamiento, máscara) de cada uno"""
+    count = max(1, min(count, bits))
+    edges = [bits * i // count for i in range(count + 1)]
+    return [(edges[i], (1 << (edges[i + 1] - edges[i])) - 1) for i in range(count)]
+
+class ImageDedupIndex:
+    """
+    Índice de duplicados de una carpeta de imágenes.
+
+    Detecta copias exactas (SHA-256) y casi duplicados redimensionados o recomprimidos
+    (hash perceptual con distancia de Hamming). El índice se guarda en SQLite dentro de la
+    carpeta y sólo se recalculan los ficheros cuyo tamaño o fecha de modificación cambian;
+    si no cambia ninguno, tampoco se vuelven a asignar los originales.
+    """
+    def __init__(self, folder: str, max_distance: int = 10, filename: str = DEDUP_INDEX_FILENAME):
+        """
+        Abre (o crea) el índice de una carpeta
+
+        Args:
+            folder (str): Carpeta de imágenes
+            max_distance (int, optional): Distancia de Hamming máxima (sobre 256 bits) para considerar dos imágenes iguales. Defaults to 10.
+            filename (str, optional): Nombre del fichero SQLite. Defaults to DEDUP_INDEX_FILENAME.
+        """
+        self.folder = folder
+        self.max_distance = max_distance
+        self._conn = sqlite3.connect(os.path.join(folder, filename))
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS images (
+                filename TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                sha256 TEXT NOT NULL,
+                phash TEXT,
+                canonical TEXT
+            );
+            CREATE TABLE IF NOT EXISTS index_state (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            """
+        )
+        self._conn.commit()
+
+    def refresh(self, link_exact: bool = False) -> dict[str, int]:
+        """Actualiza el índice de forma incremental y recalcula los duplicados
+
+        Args:
+            link_exact (bool, optional): Sustituye las copias exactas por enlaces duros al original,
+                de modo que el contenido se guarda una sola vez. Defaults to False.
+
+        Returns:
+            dict[str, int]: Contadores de ficheros indexados, recalculados y duplicados
+        """
+        known = {
+            row[0]: (row[1], row[2])
+            for row in self._conn.execute("SELECT filename, size, mtime FROM images")
+        }
+        seen = set()
+        hashed = 0
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if not entry.is_file() or os.path.splitext(entry.name)[1].lower() not in SUPPORTED_EXTS:
+                    continue
+                seen.add(entry.name)
+                stat = entry.stat()
+                if known.get(entry.name) == (stat.st_size, stat.st_mtime):
+                    continue
+                phash = perceptual_hash(entry.path)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO images (filename, size, mtime, sha256, phash, canonical) "
+                    "VALUES (?, ?, ?, ?, ?, NULL)",
+                    (
+                        entry.name,
+                        stat.st_size,
+                        stat.st_mtime,
+                        file_sha256(entry.path),
+                        f"{phash:064x}" if phash is not None else None,
+                    ),
+                )
+                hashed += 1
+        removed = [name for name in known if name not in seen]
+        self._conn.executemany("DELETE FROM images WHERE filename = ?", [(name,) for name in removed])
+
+        state = self._conn.execute("SELECT value FROM index_state WHERE key = 'max_distance'").fetchone()
+        if hashed or removed or state is None or state[0] != str(self.max_distance):
+            duplicates = self._assign_canonicals()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO index_state (key, value) VALUES ('max_distance', ?)", (str(self.max_distance),)
+            )
+        else:
+            # Sin ficheros nuevos, modificados ni borrados los originales no cambian
+            duplicates = self._conn.execute("SELECT COUNT(*) FROM images WHERE canonical IS NOT NULL").fetchone()[0]
+        self._conn.commit()
+        if link_exact:
+            self._link_exact_duplicates()
+        return {'indexed': len(seen), 'hashed': hashed, 'duplicates': duplicates}
+
+    def _assign_canonicals(self) -> int:
+        """Marca cada imagen con su original; el original es el de nombre más corto
+
+        Los casi duplicados se buscan con un índice multibloque: el hash se parte en
+        max_distance + 1 bloques y dos hashes a esa distancia o menos coinciden al menos en uno
+        (principio del palomar), así que cada imagen sólo se compara con los originales que
+        comparten algún bloque con ella y no con todos. Sólo se escriben las filas cuyo original
+        cambia: sin cambios en la carpeta no hay escrituras.
+
+        Returns:
+            int: Número de duplicados encontrados
+        """
+        rows = self._conn.execute("SELECT filename, sha256, phash, canonical FROM images").fetchall()
+        rows.sort(key=lambda r: (len(r[0]), r[0]))
+        by_sha: dict[str, str] = {}
+        originals: list[tuple[str, int]] = []
+        blocks = _hash_blocks(PHASH_SIZE * PHASH_SIZE, self.max_distance + 1)
+        by_block: dict[tuple[int, int], list[int]] = {}
+        duplicates = 0
+        updates = []
+        for filename, sha256, phash_hex, current in rows:
+            canonical = by_sha.get(sha256)
+            phash = int(phash_hex, 16) if phash_hex else None
+            if canonical is None and phash is not None:
+                # El primer original (en el orden de rows) a distancia suficiente, como en una búsqueda lineal
+                best = None
+                for block, (shift, mask) in enumerate(blocks):
+                    for position in by_block.get((block, (phash >> shift) & mask), ()):
+                        if best is not None and position >= best:
+                            break
+                        if (phash ^ originals[position][1]).bit_count() <= self.max_distance:
+                            best = position
+                            break
+                if best is not None:
+                    canonical = originals[best][0]
+            if canonical is None:
+                by_sha[sha256] = filename
+                if phash is not None:
+                    for block, (shift, mask) in enumerate(blocks):
+                        by_block.setdefault((block, (phash >> shift) & mask), []).append(len(originals))
+                    originals.append((filename, phash))
+            if canonical:
+                duplicates += 1
+            if canonical != current:
+                updates.append((canonical, filename))
+        self._conn.executemany("UPDATE images SET canonical = ? WHERE filename = ?", updates)
+        return duplicates
+
+    def _link_exact_duplicates(self) -> None:
+        """Sustituye las copias exactas por enlaces duros a su original"""
+        rows = self._conn.execute(
+            "SELECT d.filename, d.canonical FROM images d JOIN images o "
+            "ON o.filename = d.canonical AND o.sha256 = d.sha256"
+        ).fetchall()
+        for filename, canonical in rows:
+            path = os.path.join(self.folder, filename)
+            original = os.path.join(self.folder, canonical)
+            try:
+                if os.path.samefile(path, original):
+                    continue
+                tmp_path = f"{path}.link"
+                os.link(original, tmp_path)
+                os.replace(tmp_path, path)
+                stat = os.stat(path)
+                self._conn.execute(
+                    "UPDATE images SET size = ?, mtime = ? WHERE filename = ?",
+                    (stat.st_size, stat.st_mtime, filename),
+                )
+            except OSError as e:
+                print(f"[!] No se pudo enlazar {filename} con {canonical}: {e}")
+        self._conn.commit()
+
+    def duplicates(self) -> dict[str, str]:
+        """Devuelve los duplicados del índice
+
+        Returns:
+            dict[str, str]: Nombre del duplicado -> nombre del original
+        """
+        return dict(self._conn.execute(
+            "SELECT filename, canonical FROM images WHERE canonical IS NOT NULL"
+        ).fetchall())
+
+    def records(self) -> dict[str, tuple[int, float, str, Optional[str]]]:
+        """Devuelve los datos ya calculados de cada imagen, para reutilizarlos sin volver a leer los ficheros
+
+        Returns:
+            dict[str, tuple[int, float, str, Optional[str]]]: Nombre -> (tamaño, fecha, sha256, original o None)
+        """
+        return {
+            row[0]: tuple(row[1:])
+            for row in self._conn.execute("SELECT filename, size, mtime, sha256, canonical FROM images")
+        }
+
+    def unique_files(self) -> list[str]:
+        """Devuelve las imágenes originales (sin duplicados), ordenadas por nombre
+
+        Returns:
+            list[str]: Nombres de fichero
+        """
+        return [row[0] for row in self._conn.execute(
+            "SELECT filename FROM images WHERE canonical IS NULL ORDER BY filename"
+        )]
+
+    def close(self) -> None:
+        """Cierra la conexión con la base de datos"""
+        self._conn.close()
@@ -0,0 +1,211 @@
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from typing import Optional
+
+from .image_dedup import SUPPORTED_EXTS
+
+MATCH_TYPES = ('exact', 'case', 'prefix', 'contains', 'fuzzy')
+
+def normalize_name(name: str) -> str:
+    """Forma comparable de un nombre: sin ruta, extensión, acentos ni mayúsculas, con guiones
+
+    Args:
+        name (str): Nombre o ruta de la imagen ('Judit 1.JPG' -> 'judit-1')
+
+    Returns:
+        str: El nombre normalizado
+    """
+    stem = os.path.basename(name.strip().strip("'\"").replace('\\', '/'))
+    root, ext = os.path.splitext(stem)
+    if ext.lower() in SUPPORTED_EXTS:
+        stem = root
+    stem = unicodedata.normalize('NFKD', stem).encode('ascii', 'ignore').decode('ascii').lower()
+    return re.sub(r'[\s_\-.]+', '-', stem).strip('-')
+
+def edit_distance(a: str, b: str, max_distance: int) -> Optional[int]:
+    """Distancia de Levenshtein con corte: None si supera max_distance
+
+    Usa el algoritmo de vectores de bits de Myers (variante de Hyyrö): cada carácter de b
+    actualiza una columna entera de la matriz con unas pocas operaciones sobre enteros.
+    """
+    return _DistanceQuery(a).distance(b, max_distance)
+
+class _DistanceQuery:
+    """Tabla de bits de un texto fijo para compararlo con muchos otros (ver edit_distance)"""
+    def __init__(self, pattern: str):
+        self.length = len(pattern)
+        self.peq: dict[str, int] = {}
+        for i, char in enumerate(pattern):
+            self.peq[char] = self.peq.get(char, 0) | (1 << i)
+        self.mask = (1 << self.length) - 1
+        self.last = 1 << (self.length - 1) if pattern else 0
+
+    def distance(self, text: str, max_distance: int) -> Optional[int]:
+        if abs(self.length - len(text)) > max_distance:
+            return None
+        if not self.length or not text:
+            return max(self.length, len(text))
+        peq, mask, last = self.peq, self.mask, self.last
+        pv, mv, score = mask, 0, self.length
+        remaining = len(text)
+        for char in text:
+            eq = peq.get(char, 0)
+            xv = eq | mv
+            xh = (((eq & pv) + pv) ^ pv) | eq
+            ph = (mv | ~(xh | pv)) & mask
+            mh = pv & xh
+            if ph & last:
+                score += 1
+            elif mh & last:
+                score -= 1
+            remaining -= 1
+            # La distancia final baja como mucho uno por cada carácter que queda
+            if score - remaining > max_distance:
+                return None
+            ph = ((ph << 1) | 1) & mask
+            mh = (mh << 1) & mask
+            pv = (mh | ~(xv | ph)) & mask
+            mv = ph & xv
+        return score if score <= max_distance else None
+
+class ImageNameIndex:
+    """
+    Índice en memoria de los nombres de imagen de una carpeta para resolver nombres aproximados.
+
+    Se prueba, por orden, la coincidencia exacta, sin distinguir mayúsculas ni extensión, por
+    prefijo, por contenido y por distancia de edición. Sólo se acepta una coincidencia si es
+    única en su nivel (o, en la difusa, claramente mejor que la siguiente); en otro caso se
+    devuelven los candidatos ordenados para que el agente elija sin volver a preguntar.
+    """
+    def __init__(self, folder: str, filenames: Optional[list[str]] = None):
+        """
+        Construye el índice
+
+        Args:
+            folder (str): Carpeta de imágenes
+            filenames (Optional[list[str]], optional): Nombres de fichero. Defaults to None (se lee la carpeta).
+        """
+        self.folder = folder
+        if filenames is None:
+            filenames = _scan(folder)
+        self.filenames = sorted(filenames)
+        self._exact = set(self.filenames)
+        self._by_normalized: dict[str, list[str]] = {}
+        for filename in self.filenames:
+            self._by_normalized.setdefault(normalize_name(filename), []).append(filename)
+        self._normalized = sorted(self._by_normalized)
+        self._bigrams: Optional[dict[str, list[int]]] = None
+        # Cada índice guarda su propia caché: se descarta con él al cambiar la carpeta
+        self.resolve = lru_cache(maxsize=4096)(self._resolve)
+
+    def _resolve(self, name: str, limit: int = 5) -> dict[str, object]:
+        """Resuelve un nombre aproximado
+
+        Args:
+            name (str): Nombre (o ruta) que ha dado el usuario o el modelo
+            limit (int, optional): Candidatos a devolver. Defaults to 5.
+
+        Returns:
+            dict[str, object]: 'query', 'match' (nombre de fichero o None), 'match_type' (de MATCH_TYPES o None)
+                y 'candidates' con 'file', 'match_type' y 'distance' (sólo en los difusos)
+        """
+        base = os.path.basename(name.strip().strip("'\"").replace('\\', '/'))
+        if base in self._exact:
+            return _result(name, base, 'exact', [{'file': base, 'match_type': 'exact'}])
+
+        query = normalize_name(base)
+        if not query:
+            return _result(name, None, None, [])
+        same = self._by_normalized.get(query, [])
+        if same:
+            candidates = [{'file': f, 'match_type': 'case'} for f in same]
+            return _result(name, same[0] if len(same) == 1 else None, 'case', candidates[:limit])
+
+        for match_type, test in (('prefix', str.startswith), ('contains', str.__contains__)):
+            found = [n for n in self._normalized if test(n, query)]
+            if found:
+                found.sort(key=lambda n: (len(n), n))
+                files = [f for n in found for f in self._by_normalized[n]]
+                candidates = [{'file': f, 'match_type': match_type} for f in files[:limit]]
+                return _result(name, files[0] if len(files) == 1 else None, match_type, candidates)
+
+        max_distance = max(1, min(3, len(query) // 4))
+        scored = []
+        distance_query = _DistanceQuery(query)
+        for normalized in self._fuzzy_candidates(query, max_distance):
+            distance = distance_query.distance(normalized, max_distance)
+            if distance is not None:
+                scored.append((distance, normalized))
+        scored.sort()
+        candidates = [
+            {'file': f, 'match_type': 'fuzzy', 'distance': distance}
+            for distance, normalized in scored for f in self._by_normalized[normalized]
+        ][:limit]
+        # Sólo se acepta si el mejor es único y está más cerca que el segundo
+        unique = candidates and (len(candidates) == 1 or candidates[0]['distance'] < candidates[1]['distance'])
+        return _result(name, candidates[0]['file'] if unique else None, 'fuzzy' if candidates else None, candidates)
+
+    def _fuzzy_candidates(self, query: str, max_distance: int) -> list[str]:
+        """Nombres que pueden estar a max_distance o menos de query
+
+        Cada edición destruye como mucho dos bigramas, así que un nombre a distancia k comparte
+        al menos (bigramas distintos de query) - 2k bigramas con ella: el índice invertido
+        descarta casi todos los nombres sin calcular la distancia de edición.
+        """
+        if self._bigrams is None:
+            bigrams: dict[str, list[int]] = {}
+            for position, normalized in enumerate(self._normalized):
+                for gram in _bigrams(normalized):
+                    bigrams.setdefault(gram, []).append(position)
+            self._bigrams = bigrams
+        query_grams = _bigrams(query)
+        needed = len(query_grams) - 2 * max_distance
+        if needed <= 0:
+            return [n for n in self._normalized if abs(len(n) - len(query)) <= max_distance]
+        shared = Counter(position for gram in query_grams for position in self._bigrams.get(gram, ()))
+        return [
+            self._normalized[position] for position, count in shared.items()
+            if count >= needed and abs(len(self._normalized[position]) - len(query)) <= max_distance
+        ]
+
+    def resolve_many(self, names: list[str], limit: int = 5) -> list[dict[str, object]]:
+        """Resuelve varios nombres de una vez (ver resolve)"""
+        return [self.resolve(name, limit) for name in names]
+
+def _bigrams(text: str) -> set[str]:
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+def _result(query: str, match: Optional[str], match_type: Optional[str], candidates: list[dict]) -> dict[str, object]:
+    return {'query': query, 'match': match, 'match_type': match_type if match or candidates else None, 'candidates': candidates}
+
+def _scan(folder: str) -> list[str]:
+    if not os.path.isdir(folder):
+        return []
+    with os.scandir(folder) as entries:
+        return [e.name for e in entries if e.is_file() and os.path.splitext(e.name)[1].lower() in SUPPORTED_EXTS]
+
+_indexes: dict[str, tuple[tuple[str, ...], ImageNameIndex]] = {}
+_indexes_lock = threading.Lock()
+
+def name_index(folder: str) -> ImageNameIndex:
+    """Índice de nombres de una carpeta, reutilizado mientras no cambien sus imágenes
+
+    La versión es la lista ordenada de nombres de imagen: la fecha del directorio no sirve
+    porque el catálogo y el índice de duplicados escriben sus SQLite en la misma carpeta.
+    Un scandir es mucho más barato que reconstruir el índice.
+    """
+    folder = os.path.abspath(folder)
+    filenames = _scan(folder)
+    version = tuple(sorted(filenames))
+    with _indexes_lock:
+        cached = _indexes.get(folder)
+        if cached and cached[0] == version:
+            return cached[1]
+    index = ImageNameIndex(folder, filenames)
+    with _indexes_lock:
+        _indexes[folder] = (version, index)
+    return index
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Optional
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow es una dependencia; si falta se avisa y se envía la imagen original
+    Image = None
+
+from .image_dedup import file_sha256, warn_without_pillow
+
+PREPROCESS_DIRNAME = '.veo_inputs'
+FIT_MODES = ('letterbox', 'crop')
+# Por debajo de este número de imágenes arrancar procesos cuesta más que prepararlas aquí
+PROCESS_POOL_MIN_IMAGES = 8
+
+def preprocess_options() -> dict:
+    """Opciones de preprocesado desde el entorno (VEO_ASPECT_RATIO, VEO_IMAGE_MAX_EDGE, VEO_IMAGE_FIT)."""
+    fit = os.getenv("VEO_IMAGE_FIT", "letterbox").lower()
+    try:
+        max_edge = int(os.getenv("VEO_IMAGE_MAX_EDGE", "1280"))
+    except ValueError:
+        max_edge = 1280
+    return {
+        'aspect_ratio': os.getenv("VEO_ASPECT_RATIO", "16:9"),
+        'max_edge': max_edge,
+        'fit': fit if fit in FIT_MODES else 'letterbox',
+        'quality': 88,
+    }
+
+def prepare_image(
+        src_path: str,
+        dest_dir: str,
+        *,
+        aspect_ratio: str = '16:9',
+        max_edge: int = 1280,
+        fit: str = 'letterbox',
+        quality: int = 88,
+        background: tuple = (255, 255, 255),
+) -> str:
+    """Adapta una imagen al encuadre de Veo y la recomprime en JPEG
+
+    El resultado se guarda en dest_dir con el hash del contenido y de las opciones en el
+    nombre, así que cada imagen se procesa una sola vez aunque cambie de nombre.
+
+    Args:
+        src_path (str): Ruta de la imagen original
+        dest_dir (str): Carpeta de las imágenes preparadas
+        aspect_ratio (str, optional): Proporción de destino ('16:9' o '9:16'). Defaults to '16:9'.
+        max_edge (int, optional): Lado largo máximo en píxeles. Defaults to 1280.
+        fit (str, optional): 'letterbox' añade bandas, 'crop' recorta al centro. Defaults to 'letterbox'.
+        quality (int, optional): Calidad JPEG. Defaults to 88.
+        background (tuple, optional): Color de las bandas y de la transparencia. Defaults to blanco.
+
+    Returns:
+        str: Ruta de la imagen preparada, o la original si no hay Pillow o no se puede abrir
+    """
+    if Image is None:
+        warn_without_pillow("las imágenes se envían a Veo sin preparar")
+        return src_path
+    options = {'aspect_ratio': aspect_ratio, 'max_edge': max_edge, 'fit': fit, 'quality': quality, 'background': list(background)}
+    digest = hashlib.sha256(f"{file_sha256(src_path)}:{json.dumps(options, sort_keys=True)}".encode()).hexdigest()
+    dest_path = os.path.join(dest_dir, f"{digest[:32]}.jpg")
+    if os.path.exists(dest_path):
+        return dest_path
+
+    try:
+        target_w, target_h = _target_size(aspect_ratio, max_edge)
+        with Image.open(src_path) as img:
+            img.draft('RGB', (target_w, target_h))
+            img = _flatten(img, background)
+            if fit == 'crop':
+                scale = max(target_w / img.width, target_h / img.height)
+                resized = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.LANCZOS)
+                left = (resized.width - target_w) // 2
+                top = (resized.height - target_h) // 2
+                canvas = resized.crop((left, top, left + target_w, top + target_h))
+            else:
+                scale = min(target_w / img.width, target_h / img.height)
+                resized = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.LANCZOS)
+                canvas = Image.new('RGB', (target_w, target_h), background)
+                canvas.paste(resized, ((target_w - resized.width) // 2, (target_h - resized.height) // 2))
+        os.makedirs(dest_dir, exist_ok=True)
+        tmp_path = f"{dest_path}.{os.getpid()}.part"
+        canvas.save(tmp_path, 'JPEG', quality=quality, optimize=True, progressive=True)
+        os.replace(tmp_path, dest_path)
+        return dest_path
+    except (OSError, ValueError) as e:
+        print(f"[!] No se pudo preparar {src_path}, se enviará la original: {e}")
+        return src_path
+
+def prepare_images(paths: Iterable[str], dest_dir: str, max_workers: Optional[int] = None, **options) -> dict[str, str]:
+    """Prepara varias imágenes en paralelo en un pool de procesos
+
+    Los lotes pequeños (menos de PROCESS_POOL_MIN_IMAGES) se preparan en el propio proceso. El pool
+    usa 'spawn': las herramientas se ejecutan en hilos del servidor de ADK y hacer fork de un
+    proceso con hilos puede dejar bloqueos heredados en el hijo.
+
+    Args:
+        paths (Iterable[str]): Rutas de las imágenes originales
+        dest_dir (str): Carpeta de las imágenes preparadas
+        max_workers (Optional[int], optional): Número de procesos. Defaults to None (núcleos disponibles).
+        **options: Opciones de prepare_image
+
+    Returns:
+        dict[str, str]: Ruta preparada por cada ruta original
+    """
+    paths = [p for p in dict.fromkeys(paths) if os.path.isfile(p)]
+    if Image is None or not paths:
+        if paths:
+            warn_without_pillow("las imágenes se envían a Veo sin preparar")
+        return {p: p for p in paths}
+    if len(paths) < PROCESS_POOL_MIN_IMAGES:
+        return {p: prepare_image(p, dest_dir, **options) for p in paths}
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = {p: executor.submit(prepare_image, p, dest_dir, **options) for p in paths}
+    prepared = {}
+    for path, future in futures.items():
+        try:
+            prepared[path] = future.result()
+        except Exception as e:
+            print(f"[!] Error preparando {path}: {e}")
+            prepared[path] = path
+    return prepared
+
+def _target_size(aspect_ratio: str, max_edge: int) -> tuple[int, int]:
+    """Tamaño de destino para una proporción 'ancho:alto' con el lado largo en max_edge"""
+    try:
+        w, h = (float(x) for x in aspect_ratio.split(':'))
+    except ValueError:
+        raise ValueError(f"Proporción no válida: {aspect_ratio}")
+    if w >= h:
+        return max_edge, max(1, round(max_edge * h / w))
+    return max(1, round(max_edge * w / h)), max_edge
+
+def _flatten(img, background: tuple):
+    """Convierte a RGB componiendo la transparencia sobre el color de fondo"""
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        rgba = img.convert('RGBA')
+        flat = Image.new('RGB', rgba.size, background)
+        flat.paste(rgba, mask=rgba.getchannel('A'))
+        return flat
+    return img.convert('RGB')
@@ -0,0 +1,147 @@
+import re
+from collections import Counter
+from typing import Callable, Iterable, Optional
+
+DEFAULT_EXCLUDE_KEYWORDS = ['screenshot', 'elementor', 'logo', 'icon', 'banner', 'filtros', 'background']
+
+class MediaFilterPipeline:
+    """
+    Filtros declarativos para decidir qué elementos de medios son fotos de producto.
+
+    Las reglas se construyen una sola vez (las palabras clave se compilan en una única
+    expresión regular) y se evalúan por páginas completas. En lugar de imprimir cada
+    rechazo, se lleva un contador por regla que se puede consultar o resumir al final.
+    """
+    def __init__(
+            self,
+            exclude_keywords: Optional[Iterable[str]] = None,
+            min_dimension: int = 300,
+            max_dimension: int = 0,
+            min_aspect_ratio: float = 0.0,
+            max_aspect_ratio: float = 0.0,
+            mime_types: Optional[Iterable[str]] = None,
+            min_bytes: int = 0,
+            max_bytes: int = 0,
+            exclude_url_patterns: Optional[Iterable[str]] = None,
+            exclude_alt_keywords: Optional[Iterable[str]] = None,
+    ):
+        """
+        Construye las reglas activas
+
+        Args:
+            exclude_keywords (Optional[Iterable[str]], optional): Palabras que descartan la imagen si aparecen en la URL. Defaults to DEFAULT_EXCLUDE_KEYWORDS.
+            min_dimension (int, optional): Ancho y alto mínimos en píxeles. Defaults to 300.
+            max_dimension (int, optional): Ancho y alto máximos en píxeles. 0 sin límite. Defaults to 0.
+            min_aspect_ratio (float, optional): Proporción ancho/alto mínima. 0 sin límite. Defaults to 0.0.
+            max_aspect_ratio (float, optional): Proporción ancho/alto máxima. 0 sin límite. Defaults to 0.0.
+            mime_types (Optional[Iterable[str]], optional): MIME types admitidos (ej: 'image/jpeg'). Defaults to None (todos).
+            min_bytes (int, optional): Tamaño mínimo del fichero (media_details.filesize). 0 sin límite. Defaults to 0.
+            max_bytes (int, optional): Tamaño máximo del fichero (media_details.filesize). 0 sin límite. Defaults to 0.
+            exclude_url_patterns (Optional[Iterable[str]], optional): Expresiones regulares que descartan la URL. Defaults to None.
+            exclude_alt_keywords (Optional[Iterable[str]], optional): Palabras que descartan la imagen si aparecen en el texto alternativo. Defaults to None.
+        """
+        keywords = DEFAULT_EXCLUDE_KEYWORDS if exclude_keywords is None else list(exclude_keywords)
+        self.exclude_keywords = list(keywords)
+        self.rejections: Counter = Counter()
+        self.accepted = 0
+
+        # Reglas en orden de coste: primero las comprobaciones baratas
+        self._rules: list[tuple[str, Callable[[dict, str, dict], bool]]] = [
+            ('media_type', lambda item, url, details: item.get('media_type') == 'image'),
+            ('source_url', lambda item, url, details: bool(url)),
+        ]
+        if mime_types:
+            allowed = {m.lower() for m in mime_types}
+            self._rules.append(('mime_type', lambda item, url, details: (item.get('mime_type') or '').lower() in allowed))
+        if self.exclude_keywords:
+            keyword_re = _compile_any(self.exclude_keywords)
+            self._rules.append(('keyword', lambda item, url, details: not keyword_re.search(url)))
+        if exclude_url_patterns:
+            url_re = re.compile('|'.join(f'(?:{p})' for p in exclude_url_patterns), re.IGNORECASE)
+            self._rules.append(('url_pattern', lambda item, url, details: not url_re.search(url)))
+        if exclude_alt_keywords:
+            alt_re = _compile_any(exclude_alt_keywords)
+            self._rules.append(('alt_text', lambda item, url, details: not alt_re.search((item.get('alt_text') or '').lower())))
+        if min_dimension:
+            self._rules.append(('min_dimension', lambda item, url, details: (
+                (details.get('width') or 0) >= min_dimension and (details.get('height') or 0) >= min_dimension
+            )))
+        if max_dimension:
+            self._rules.append(('max_dimension', lambda item, url, details: (
+                (details.get('width') or 0) <= max_dimension and (details.get('height') or 0) <= max_dimension
+            )))
+        if min_aspect_ratio or max_aspect_ratio:
+            self._rules.append(('aspect_ratio', lambda item, url, details: _aspect_in_range(
+                details, min_aspect_ratio, max_aspect_ratio
+            )))
+        if min_bytes or max_bytes:
+            self._rules.append(('filesize', lambda item, url, details: _filesize_in_range(
+                details, min_bytes, max_bytes
+            )))
+
+    def evaluate(self, media_item: dict) -> Optional[str]:
+        """Evalúa un elemento y devuelve la regla que lo rechaza
+
+        Args:
+            media_item (dict): El elemento de medios a evaluar
+
+        Returns:
+            Optional[str]: El nombre de la regla que lo descarta o None si pasa todos los filtros
+        """
+        url = (media_item.get('source_url') or '').lower()
+        details = media_item.get('media_details') or {}
+        for name, rule in self._rules:
+            if not rule(media_item, url, details):
+                return name
+        return None
+
+    def filter_page(self, media_items: list[dict]) -> list[dict]:
+        """Filtra una página completa de elementos actualizando los contadores
+
+        Args:
+            media_items (list[dict]): Los elementos de la página
+
+        Returns:
+            list[dict]: Los elementos que pasan todos los filtros, en el mismo orden
+        """
+        accepted = []
+        for item in media_items:
+            rejected_by = self.evaluate(item)
+            if rejected_by is None:
+                accepted.append(item)
+            else:
+                self.rejections[rejected_by] += 1
+        self.accepted += len(accepted)
+        return accepted
+
+    def summary(self) -> str:
+        """Resumen de aceptados y rechazos por regla
+
+        Returns:
+            str: El resumen en una línea
+        """
+        if not self.rejections:
+            return f"Filtros: {self.accepted} aceptadas, ninguna descartada."
+        detail = ', '.join(f"{name}={count}" for name, count in self.rejections.most_common())
+        return f"Filtros: {self.accepted} aceptadas, {sum(self.rejections.values())} descartadas ({detail})."
+
+def _compile_any(keywords: Iterable[str]) -> re.Pattern:
+    """Compila una lista de palabras en una única expresión regular (alternativas literales)"""
+    # Las alternativas más largas primero para que el motor no se quede con un prefijo
+    escaped = sorted((re.escape(k.lower()) for k in keywords if k), key=len, reverse=True)
+    return re.compile('|'.join(escaped))
+
+def _aspect_in_range(details: dict, min_ratio: float, max_ratio: float) -> bool:
+    width = details.get('width') or 0
+    height = details.get('height') or 0
+    if not width or not height:
+        return False
+    ratio = width / height
+    return (not min_ratio or ratio >= min_ratio) and (not max_ratio or ratio <= max_ratio)
+
+def _filesize_in_range(details: dict, min_bytes: int, max_bytes: int) -> bool:
+    filesize = details.get('filesize')
+    if filesize is None:
+        # WordPress < 6.0 no informa del tamaño: no se descarta por falta de datos
+        return True
+    return (not min_bytes or filesize >= min_bytes) and (not max_bytes or filesize <= max_bytes)
@@ -0,0 +1,153 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+MANIFEST_FILENAME = '.media_manifest.sqlite'
+
+class MediaManifest:
+    """
+    Manifiesto persistente (SQLite) de los medios sincronizados desde un CMS.
+
+    Guarda por cada elemento su id, la fecha de modificación en el CMS, las cabeceras
+    ETag/Last-Modified de la última descarga y la ruta local, para que las siguientes
+    ejecuciones sólo listen lo modificado y descarguen con peticiones condicionales.
+    La marca de sincronización (high_water_mark) sólo avanza tras una ejecución completa.
+    """
+    def __init__(self, folder: str, filename: str = MANIFEST_FILENAME):
+        """
+        Abre (o crea) el manifiesto dentro de la carpeta de destino
+
+        Args:
+            folder (str): Carpeta donde se guardan las imágenes sincronizadas
+            filename (str, optional): Nombre del fichero SQLite. Defaults to MANIFEST_FILENAME.
+        """
+        os.makedirs(folder, exist_ok=True)
+        self.path = os.path.join(folder, filename)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS media (
+                media_id INTEGER PRIMARY KEY,
+                source_url TEXT NOT NULL,
+                modified_gmt TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                local_path TEXT,
+                synced_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS sync_state (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            """
+        )
+        self._conn.commit()
+
+    def get(self, media_id: Optional[int]) -> Optional[dict]:
+        """Devuelve la entrada de un elemento o None si no está en el manifiesto
+
+        Args:
+            media_id (Optional[int]): El id del elemento en el CMS
+
+        Returns:
+            Optional[dict]: La entrada guardada
+        """
+        if media_id is None:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT media_id, source_url, modified_gmt, etag, last_modified, local_path "
+                "FROM media WHERE media_id = ?",
+                (media_id,),
+            ).fetchone()
+        if not row:
+            return None
+        keys = ('media_id', 'source_url', 'modified_gmt', 'etag', 'last_modified', 'local_path')
+        return dict(zip(keys, row))
+
+    def record(
+            self,
+            media_id: Optional[int],
+            *,
+            source_url: str,
+            modified_gmt: Optional[str],
+            etag: Optional[str],
+            last_modified: Optional[str],
+            local_path: str,
+    ) -> None:
+        """Guarda o actualiza la entrada de un elemento sincronizado
+
+        Args:
+            media_id (Optional[int]): El id del elemento en el CMS; sin id no se registra
+            source_url (str): URL descargada
+            modified_gmt (Optional[str]): Fecha de modificación en el CMS
+            etag (Optional[str]): Cabecera ETag de la respuesta
+            last_modified (Optional[str]): Cabecera Last-Modified de la respuesta
+            local_path (str): Ruta local del fichero
+        """
+        if media_id is None:
+            return
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO media (media_id, source_url, modified_gmt, etag, last_modified, local_path, synced_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(media_id) DO UPDATE SET
+                    source_url = excluded.source_url,
+                    modified_gmt = COALESCE(excluded.modified_gmt, media.modified_gmt),
+                    etag = COALESCE(excluded.etag, media.etag),
+                    last_modified = COALESCE(excluded.last_modified, media.last_modified),
+                    local_path = excluded.local_path,
+                    synced_at = excluded.synced_at
+                """,
+                (media_id, source_url, modified_gmt, etag, last_modified, local_path, time.time()),
+            )
+            self._conn.commit()
+
+    def high_water_mark(self) -> Optional[str]:
+        """Fecha hasta la que la última sincronización completa lo descargó todo
+
+        Returns:
+            Optional[str]: Fecha ISO 8601 o None si nunca se completó una sincronización
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM sync_state WHERE key = 'high_water_mark'").fetchone()
+        return row[0] if row else None
+
+    def set_high_water_mark(self, value: Optional[str]) -> None:
+        """Guarda la marca de sincronización; sólo debe llamarse tras una ejecución completa y sin fallos
+
+        Args:
+            value (Optional[str]): Fecha ISO 8601 (normalmente last_modified_gmt()). None no cambia nada.
+        """
+        if not value:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sync_state (key, value) VALUES ('high_water_mark', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (value,),
+            )
+            self._conn.commit()
+
+    def last_modified_gmt(self) -> Optional[str]:
+        """Devuelve la fecha de modificación más reciente ya sincronizada
+
+        Returns:
+            Optional[str]: Fecha ISO 8601 (GMT) o None si el manifiesto está vacío
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(modified_gmt) FROM media").fetchone()
+        return row[0] if row else None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM media").fetchone()[0]
+
+    def close(self) -> None:
+        """Cierra la conexión con la base de datos"""
+        with self._lock:
+            self._conn.close()
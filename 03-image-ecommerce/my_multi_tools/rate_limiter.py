@@ -0,0 +1,196 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from urllib.parse import urlparse
+
+import requests
+
+THROTTLE_STATUS = {429, 503}
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Interpreta la cabecera Retry-After (segundos o fecha HTTP)
+
+    Args:
+        value (Optional[str]): Valor de la cabecera
+
+    Returns:
+        Optional[float]: Segundos a esperar o None si no viene o no es válida
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket con ajuste AIMD (aumento aditivo, disminución multiplicativa).
+
+    Mientras las respuestas son correctas la tasa sube poco a poco hasta max_rate;
+    ante un 429/503 se reduce a la mitad y, si el servidor envía Retry-After, se
+    bloquea el bucket hasta que haya pasado ese tiempo.
+    """
+    def __init__(
+            self,
+            rate: float = 4.0,
+            min_rate: float = 0.5,
+            max_rate: float = 50.0,
+            increase_step: float = 0.5,
+            decrease_factor: float = 0.5,
+    ):
+        """
+        Inicializa el limitador
+
+        Args:
+            rate (float, optional): Peticiones por segundo iniciales. Defaults to 4.0.
+            min_rate (float, optional): Tasa mínima tras las reducciones. Defaults to 0.5.
+            max_rate (float, optional): Tasa máxima alcanzable. Defaults to 50.0.
+            increase_step (float, optional): Peticiones por segundo que se suman por cada respuesta correcta. Defaults to 0.5.
+            decrease_factor (float, optional): Factor que se aplica a la tasa ante un 429/503. Defaults to 0.5.
+        """
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, min_rate)
+        self.rate = min(max(rate, self.min_rate), self.max_rate)
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        burst = max(1.0, self.rate)
+        self._tokens = min(burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> None:
+        """Espera hasta que haya un token disponible y lo consume"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self._blocked_until:
+                    self._refill(now)
+                    if self._tokens >= 1.0:
+                        self._tokens -= 1.0
+                        return
+                    wait = (1.0 - self._tokens) / self.rate
+                else:
+                    wait = self._blocked_until - now
+            time.sleep(wait)
+
+    def on_success(self) -> None:
+        """Aumento aditivo de la tasa tras una respuesta correcta"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        """Disminución multiplicativa de la tasa tras un 429/503
+
+        Args:
+            retry_after (Optional[float], optional): Segundos indicados por Retry-After. Defaults to None.
+        """
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            self._tokens = min(self._tokens, 0.0)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+
+class HostRateLimiters:
+    """
+    Registro de limitadores por host, con tasas configurables para cada uno.
+    """
+    def __init__(self, default_rate: float = 4.0, host_rates: Optional[dict[str, float]] = None, **limiter_kwargs):
+        """
+        Inicializa el registro
+
+        Args:
+            default_rate (float, optional): Tasa inicial para los hosts sin configuración. Defaults to 4.0.
+            host_rates (Optional[dict[str, float]], optional): Tasa inicial por host (ej: {'cdn.misitio.com': 20}). Defaults to None.
+            **limiter_kwargs: Parámetros adicionales para cada AdaptiveRateLimiter
+        """
+        self.default_rate = default_rate
+        self.host_rates = {host.lower(): rate for host, rate in (host_rates or {}).items()}
+        self.limiter_kwargs = limiter_kwargs
+        self._limiters: dict[str, AdaptiveRateLimiter] = {}
+        self._lock = threading.Lock()
+
+    def for_url(self, url: str) -> AdaptiveRateLimiter:
+        """Devuelve el limitador del host de la URL, creándolo si no existe
+
+        Args:
+            url (str): La URL de la petición
+
+        Returns:
+            AdaptiveRateLimiter: El limitador del host
+        """
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            if host not in self._limiters:
+                rate = self.host_rates.get(host, self.default_rate)
+                self._limiters[host] = AdaptiveRateLimiter(rate=rate, **self.limiter_kwargs)
+            return self._limiters[host]
+
+def request_with_retry(
+        session: requests.Session,
+        method: str,
+        url: str,
+        limiters: HostRateLimiters,
+        *,
+        max_retries: int = 4,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        **kwargs,
+) -> requests.Response:
+    """Hace una petición respetando el limitador del host y reintentando con backoff exponencial
+
+    Se reintentan los 429/503 y los errores de conexión o timeout. La espera entre intentos es
+    exponencial con jitter completo, salvo que el servidor indique Retry-After.
+
+    Args:
+        session (requests.Session): Sesión HTTP compartida
+        method (str): Método HTTP
+        url (str): URL de la petición
+        limiters (HostRateLimiters): Registro de limitadores por host
+        max_retries (int, optional): Número máximo de reintentos. Defaults to 4.
+        base_delay (float, optional): Espera base del backoff en segundos. Defaults to 1.0.
+        max_delay (float, optional): Espera máxima entre intentos en segundos. Defaults to 60.0.
+        **kwargs: Argumentos para session.request
+
+    Returns:
+        requests.Response: La última respuesta recibida (puede ser un 429/503 si se agotan los reintentos)
+    """
+    limiter = limiters.for_url(url)
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if attempt >= max_retries:
+                raise
+            limiter.on_throttle()
+            time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+            continue
+
+        if response.status_code not in THROTTLE_STATUS:
+            limiter.on_success()
+            return response
+
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        if retry_after is not None:
+            retry_after = min(retry_after, max_delay)
+        limiter.on_throttle(retry_after)
+        if attempt >= max_retries:
+            return response
+        response.close()
+        # Con Retry-After la espera la impone el propio limitador (bloquea el host para todos los hilos)
+        delay = retry_after if retry_after is not None else random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+        print(f"[!] {response.status_code} en {url}. Reintento {attempt + 1}/{max_retries} en {delay:.1f}s")
+        if retry_after is None:
+            time.sleep(delay)
+    return response
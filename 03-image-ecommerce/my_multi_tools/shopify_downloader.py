@@ -0,0 +1,320 @@
+import json
+import math
+import os
+import time
+from typing import Iterator, Optional
+
+import requests
+
+from .cms_connectors import CMSMediaDownload
+
+SHOPIFY_API_VERSION = '2024-10'
+
+# Coste aproximado por página: first + first * 50 (medios por producto), por debajo del límite de 1000 por consulta
+PRODUCT_MEDIA_QUERY = """
+query ProductMedia($first: Int!, $after: String, $query: String) {
+  products(first: $first, after: $after, query: $query, sortKey: UPDATED_AT) {
+    pageInfo { hasNextPage endCursor }
+    nodes {
+      id
+      updatedAt
+      media(first: 50) {
+        nodes {
+          ... on MediaImage { id mimeType image { url width height altText } }
+        }
+      }
+    }
+  }
+}
+"""
+
+BULK_PRODUCT_MEDIA_QUERY = """
+{
+  products%s {
+    edges {
+      node {
+        id
+        updatedAt
+        media {
+          edges {
+            node {
+              ... on MediaImage { id mimeType image { url width height altText } }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+BULK_RUN_MUTATION = """
+mutation RunBulk($query: String!) {
+  bulkOperationRunQuery(query: $query) {
+    bulkOperation { id status }
+    userErrors { field message }
+  }
+}
+"""
+
+BULK_STATUS_QUERY = """
+{ currentBulkOperation { id status errorCode objectCount url } }
+"""
+
+class ShopifyMediaDownload(CMSMediaDownload):
+    """
+    Descarga las imágenes de producto de una tienda Shopify a través de la Admin GraphQL API.
+
+    Para catálogos normales pagina con cursores; con bulk=True lanza una operación masiva y
+    procesa el JSONL resultante línea a línea, en memoria constante. El ritmo se ajusta al
+    cubo de coste de GraphQL que Shopify informa en cada respuesta.
+    """
+    platform_name = 'Shopify'
+
+    def __init__(
+            self,
+            shop_url: str,
+            access_token: Optional[str] = None,
+            api_version: str = SHOPIFY_API_VERSION,
+            bulk: bool = False,
+            products_per_page: int = 15,
+            **kwargs,
+    ):
+        """
+        Inicializa el descargador con la URL de la tienda
+
+        Args:
+            shop_url (str): La URL de la tienda (ej: 'https://mitienda.myshopify.com')
+            access_token (Optional[str], optional): Token de la Admin API. Defaults to SHOPIFY_ACCESS_TOKEN del entorno.
+            api_version (str, optional): Versión de la Admin API. Defaults to SHOPIFY_API_VERSION.
+            bulk (bool, optional): Usa una operación masiva en lugar de paginar. Recomendado en tiendas grandes. Defaults to False.
+            products_per_page (int, optional): Productos por página en modo paginado. Defaults to 15.
+            **kwargs: Opciones del motor de descarga (ver CMSMediaDownload)
+        """
+        if not shop_url.startswith(("http://", "https://")):
+            raise ValueError("La URL de Shopify debe comenzar con http:// o https://")
+        access_token = access_token or os.getenv("SHOPIFY_ACCESS_TOKEN")
+        if not access_token:
+            raise ValueError("Falta el token de la Admin API de Shopify (SHOPIFY_ACCESS_TOKEN)")
+        super().__init__(**kwargs)
+        self.base_url = shop_url.rstrip('/')
+        self.api_endpoint = f"{self.base_url}/admin/api/{api_version}/graphql.json"
+        self.bulk = bulk
+        self.products_per_page = max(1, min(products_per_page, 250))
+        self._headers = {
+            'X-Shopify-Access-Token': access_token,
+            'Content-Type': 'application/json',
+        }
+
+    def _graphql(self, query: str, variables: Optional[dict] = None, max_retries: int = 5) -> dict:
+        """Ejecuta una consulta GraphQL respetando el cubo de coste de Shopify
+
+        Args:
+            query (str): La consulta o mutación
+            variables (Optional[dict], optional): Variables de la consulta. Defaults to None.
+            max_retries (int, optional): Reintentos ante THROTTLED. Defaults to 5.
+
+        Returns:
+            dict: El campo 'data' de la respuesta
+        """
+        payload = {'query': query, 'variables': variables or {}}
+        for attempt in range(max_retries + 1):
+            with self.transport.host_slot(self.api_endpoint):
+                response = self.transport.request(
+                    'POST', self.api_endpoint, data=json.dumps(payload), headers=self._headers, timeout=30
+                )
+            response.raise_for_status()
+            body = response.json()
+            cost = (body.get('extensions') or {}).get('cost') or {}
+            errors = body.get('errors') or []
+            throttled = any((e.get('extensions') or {}).get('code') == 'THROTTLED' for e in errors)
+            wait = _throttle_wait(cost)
+            if throttled and attempt < max_retries:
+                print(f"[!] Shopify THROTTLED. Esperando {wait:.1f}s")
+                time.sleep(max(wait, 1.0))
+                continue
+            if errors:
+                raise RuntimeError(f"Error GraphQL de Shopify: {errors[0].get('message', errors)}")
+            if wait:
+                # Se espera lo justo para que la siguiente consulta del mismo coste no sea rechazada
+                time.sleep(wait)
+            return body.get('data') or {}
+        raise RuntimeError("Shopify sigue limitando las peticiones tras varios reintentos")
+
+    def _select_rendition(self, media_item: dict) -> str:
+        """Pide al CDN de Shopify la imagen escalada al lado corto min_edge
+
+        Args:
+            media_item (dict): El elemento de medios
+
+        Returns:
+            str: La URL a descargar
+        """
+        source_url = media_item['source_url']
+        details = media_item.get('media_details') or {}
+        width = details.get('width') or 0
+        height = details.get('height') or 0
+        if not self.min_edge or not width or not height or min(width, height) <= self.min_edge:
+            return source_url
+        target_width = math.ceil(width * self.min_edge / min(width, height))
+        return f"{source_url}{'&' if '?' in source_url else '?'}width={target_width}"
+
+    def iter_media_items(
+            self,
+            max_images: int = 0,
+            modified_after: Optional[str] = None,
+            **kwargs,
+    ) -> Iterator[dict]:
+        """
+        Genera las imágenes de producto que pasan los filtros a medida que llegan de Shopify.
+
+        Args:
+            max_images (int, optional): Número máximo de imágenes. 0 para ilimitado. Defaults to 0.
+            modified_after (Optional[str], optional): Sólo productos actualizados después de esta fecha ISO 8601. Defaults to None.
+
+        Yields:
+            dict: Las imágenes normalizadas al formato de medios de WordPress
+        """
+        query_filter = f"updated_at:>'{modified_after}'" if modified_after else None
+        source = self._iter_bulk(query_filter) if self.bulk else self._iter_pages(query_filter)
+        print(f"Inicializando la obtención de imágenes desde {self.api_endpoint}{' (operación masiva)' if self.bulk else ''}")
+        yielded = 0
+        try:
+            for batch in source:
+                for item in self.filters.filter_page(batch):
+                    yield item
+                    yielded += 1
+                    if max_images > 0 and yielded >= max_images:
+                        return
+        except requests.exceptions.RequestException as e:
+            self.listing_failed = True
+            print(f"Error al conectarse a la API de Shopify: {e}")
+        except (RuntimeError, json.JSONDecodeError) as e:
+            self.listing_failed = True
+            print(f"Error en la respuesta de la API de Shopify: {e}")
+        finally:
+            print(self.filters.summary())
+
+    def _iter_pages(self, query_filter: Optional[str]) -> Iterator[list[dict]]:
+        """Recorre los productos con paginación por cursor
+
+        Args:
+            query_filter (Optional[str]): Filtro de búsqueda de productos
+
+        Yields:
+            list[dict]: Las imágenes normalizadas de cada página de productos
+        """
+        cursor = None
+        page = 0
+        while True:
+            page += 1
+            data = self._graphql(PRODUCT_MEDIA_QUERY, {
+                'first': self.products_per_page,
+                'after': cursor,
+                'query': query_filter,
+            })
+            products = data.get('products') or {}
+            batch = []
+            for product in products.get('nodes') or []:
+                for media in (product.get('media') or {}).get('nodes') or []:
+                    item = _normalize_media(media, product.get('updatedAt'))
+                    if item:
+                        batch.append(item)
+            print(f"Página {page}: Obtenidas {len(batch)} imágenes de producto.")
+            yield batch
+            page_info = products.get('pageInfo') or {}
+            if not page_info.get('hasNextPage'):
+                break
+            cursor = page_info.get('endCursor')
+
+    def _iter_bulk(self, query_filter: Optional[str], poll_max_sec: float = 10.0) -> Iterator[list[dict]]:
+        """Lanza una operación masiva y procesa su JSONL en streaming
+
+        Args:
+            query_filter (Optional[str]): Filtro de búsqueda de productos
+            poll_max_sec (float, optional): Intervalo máximo entre consultas de estado. Defaults to 10.0.
+
+        Yields:
+            list[dict]: Lotes de imágenes normalizadas
+        """
+        products_args = f'(query: {json.dumps(query_filter)})' if query_filter else ''
+        data = self._graphql(BULK_RUN_MUTATION, {'query': BULK_PRODUCT_MEDIA_QUERY % products_args})
+        result = data.get('bulkOperationRunQuery') or {}
+        if result.get('userErrors'):
+            raise RuntimeError(f"No se pudo lanzar la operación masiva: {result['userErrors']}")
+
+        interval = 1.0
+        while True:
+            operation = self._graphql(BULK_STATUS_QUERY).get('currentBulkOperation') or {}
+            status = operation.get('status')
+            if status == 'COMPLETED':
+                break
+            if status in ('FAILED', 'CANCELED', 'EXPIRED'):
+                raise RuntimeError(f"La operación masiva terminó en {status}: {operation.get('errorCode')}")
+            print(f"[!] Operación masiva {status}: {operation.get('objectCount', 0)} objetos")
+            time.sleep(interval)
+            interval = min(poll_max_sec, interval * 2)
+
+        url = operation.get('url')
+        if not url:
+            return
+
+        # Shopify escribe cada producto antes que sus medios: basta con recordar el último
+        batch: list[dict] = []
+        current_product, current_updated = None, None
+        with self.transport.request('GET', url, stream=True, timeout=60) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                node = json.loads(line)
+                if '__parentId' not in node:
+                    current_product, current_updated = node.get('id'), node.get('updatedAt')
+                    continue
+                updated = current_updated if node['__parentId'] == current_product else None
+                item = _normalize_media(node, updated)
+                if item:
+                    batch.append(item)
+                if len(batch) >= 250:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+def _throttle_wait(cost: dict) -> float:
+    """Segundos a esperar para que el cubo de coste recupere lo consumido por la última consulta"""
+    status = cost.get('throttleStatus') or {}
+    available = status.get('currentlyAvailable')
+    restore_rate = status.get('restoreRate') or 0
+    needed = cost.get('requestedQueryCost') or 0
+    if available is None or not restore_rate or available >= needed:
+        return 0.0
+    return (needed - available) / restore_rate
+
+def _normalize_media(media: dict, updated_at: Optional[str]) -> Optional[dict]:
+    """Convierte un MediaImage de Shopify al formato de medios de WordPress
+
+    Args:
+        media (dict): El nodo MediaImage
+        updated_at (Optional[str]): Fecha de actualización del producto
+
+    Returns:
+        Optional[dict]: El elemento normalizado o None si no es una imagen
+    """
+    image = media.get('image') or {}
+    if not image.get('url'):
+        return None
+    gid = media.get('id') or ''
+    media_id = gid.rsplit('/', 1)[-1]
+    return {
+        'id': int(media_id) if media_id.isdigit() else None,
+        'source_url': image['url'],
+        'media_type': 'image',
+        'mime_type': media.get('mimeType'),
+        'alt_text': image.get('altText') or '',
+        'modified_gmt': updated_at,
+        'media_details': {
+            'width': image.get('width') or 0,
+            'height': image.get('height') or 0,
+        },
+    }
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from .image_dedup import file_sha256
+
+CACHE_DIRNAME = '.veo_cache'
+CACHE_INDEX_FILENAME = 'index.sqlite'
+DEFAULT_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+def result_key(image_path: str, prompt: str, model: str, config: Optional[dict] = None) -> str:
+    """Clave de contenido de un video: hash de la imagen, el prompt, el modelo y la configuración
+
+    Args:
+        image_path (str): Ruta de la imagen fuente
+        prompt (str): El prompt del video
+        model (str): El modelo de Veo
+        config (Optional[dict], optional): Parámetros de GenerateVideosConfig. Defaults to None.
+
+    Returns:
+        str: La clave en hexadecimal
+    """
+    payload = json.dumps({
+        'image': file_sha256(image_path),
+        'prompt': prompt,
+        'model': model,
+        'config': config or {},
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class VeoResultCache:
+    """
+    Caché de videos generados direccionada por contenido.
+
+    Cada video se guarda una vez bajo su clave (ver result_key), así que la misma imagen
+    con otro nombre reutiliza el resultado y un prompt nuevo no devuelve el video antiguo.
+    El índice SQLite recuerda además qué clave se escribió en cada ruta de salida y
+    cuándo se usó cada entrada, para expulsar las menos usadas al superar max_bytes.
+    """
+    def __init__(self, folder: str, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        """
+        Abre (o crea) la caché dentro de la carpeta de videos
+
+        Args:
+            folder (str): Carpeta de videos; la caché vive en su subcarpeta CACHE_DIRNAME
+            max_bytes (int, optional): Tamaño máximo de la caché. 0 sin límite. Defaults to DEFAULT_CACHE_MAX_BYTES.
+        """
+        self.dir = os.path.join(folder, CACHE_DIRNAME)
+        os.makedirs(self.dir, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(self.dir, CACHE_INDEX_FILENAME), check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                model TEXT,
+                prompt_hash TEXT,
+                created_at REAL,
+                last_used REAL
+            );
+            CREATE TABLE IF NOT EXISTS outputs (
+                video_path TEXT PRIMARY KEY,
+                key TEXT NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+    def _blob_path(self, key: str) -> str:
+        return os.path.join(self.dir, f"{key}.mp4")
+
+    def get(self, key: str) -> Optional[str]:
+        """Devuelve la ruta del video en caché para una clave
+
+        Args:
+            key (str): La clave del resultado
+
+        Returns:
+            Optional[str]: La ruta del video o None si no está en caché
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT key FROM entries WHERE key = ?", (key,)).fetchone()
+            if not row:
+                return None
+            path = self._blob_path(key)
+            if not os.path.exists(path):
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return path
+
+    def contains(self, key: str) -> bool:
+        """Indica si hay un video en caché para una clave, sin marcarlo como usado"""
+        with self._lock:
+            row = self._conn.execute("SELECT key FROM entries WHERE key = ?", (key,)).fetchone()
+        return bool(row) and os.path.exists(self._blob_path(key))
+
+    def put(self, key: str, video_path: str, *, model: Optional[str] = None, prompt: Optional[str] = None) -> str:
+        """Copia un video a la caché bajo su clave y expulsa las entradas menos usadas si hace falta
+
+        Args:
+            key (str): La clave del resultado
+            video_path (str): El video ya guardado en disco
+            model (Optional[str], optional): El modelo, como metadato. Defaults to None.
+            prompt (Optional[str], optional): El prompt; se guarda sólo su hash. Defaults to None.
+
+        Returns:
+            str: La ruta del video en caché
+        """
+        path = self._blob_path(key)
+        _atomic_copy(video_path, path)
+        size = os.path.getsize(path)
+        now = time.time()
+        prompt_digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest() if prompt else None
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO entries (key, size, model, prompt_hash, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET size = excluded.size, last_used = excluded.last_used
+                """,
+                (key, size, model, prompt_digest, now, now),
+            )
+            self._conn.commit()
+            self._evict(keep=key)
+        return path
+
+    def restore(self, key: str, out_path: str) -> Optional[int]:
+        """Copia el video en caché de una clave a una ruta de salida
+
+        Args:
+            key (str): La clave del resultado
+            out_path (str): Ruta de destino
+
+        Returns:
+            Optional[int]: Bytes copiados o None si la clave no está en caché
+        """
+        path = self.get(key)
+        if not path:
+            return None
+        _atomic_copy(path, out_path)
+        self.record_output(out_path, key)
+        return os.path.getsize(out_path)
+
+    def record_output(self, video_path: str, key: str) -> None:
+        """Apunta qué resultado se escribió en una ruta de salida"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO outputs (video_path, key) VALUES (?, ?) "
+                "ON CONFLICT(video_path) DO UPDATE SET key = excluded.key",
+                (os.path.abspath(video_path), key),
+            )
+            self._conn.commit()
+
+    def output_key(self, video_path: str) -> Optional[str]:
+        """Clave del resultado escrito en una ruta de salida
+
+        Returns:
+            Optional[str]: La clave o None si el video no se generó con la caché (videos anteriores)
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key FROM outputs WHERE video_path = ?", (os.path.abspath(video_path),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """Expulsa las entradas usadas hace más tiempo hasta quedar por debajo de max_bytes"""
+        if not self.max_bytes:
+            return
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                os.remove(self._blob_path(key))
+            except FileNotFoundError:
+                pass
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            print(f"[-] Caché de Veo: expulsado {key[:12]}… ({size / (1024 * 1024):.2f} MB)")
+        self._conn.commit()
+
+    def close(self) -> None:
+        """Cierra la conexión con la base de datos"""
+        with self._lock:
+            self._conn.close()
+
+def _atomic_copy(src: str, dest: str) -> None:
+    """Copia un fichero a través de un temporal para no dejar nunca el destino a medias"""
+    tmp_path = f"{dest}.{threading.get_ident()}.part"
+    try:
+        shutil.copyfile(src, tmp_path)
+        os.replace(tmp_path, dest)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def default_cache_max_bytes() -> int:
+    """Tamaño máximo de la caché (VEO_CACHE_MAX_MB)."""
+    try:
+        return int(float(os.getenv("VEO_CACHE_MAX_MB", "2048")) * 1024 * 1024)
+    except ValueError:
+        return DEFAULT_CACHE_MAX_BYTES
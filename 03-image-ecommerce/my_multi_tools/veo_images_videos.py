@@ -6,135 +6,449 @@ Costo aproximado: $0.10–0.50 por video en GCP (usa con cuidado).
 """
 import os
 import mimetypes
+import threading
 import time
-from typing import Optional, Tuple, List, Dict
-from google import genai
-from google.genai import types
+from concurrent.futures import as_completed
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Optional, Tuple, List, Dict
+from urllib.parse import quote
+import requests
 from dotenv import load_dotenv
+from .veo_operations import OperationPoller
+from .video_sink import CHUNK_SIZE, BufferSink, ChunkSink, VideoSink
+
+if TYPE_CHECKING:
+    # Como el cliente de Veo, el catálogo, la caché, el diario, las concesiones, el planificador
+    # y el preprocesado (SQLite, Pillow, multiprocessing) se importan en las funciones que los usan
+    from .veo_cache import VeoResultCache
+    from .veo_journal import VeoJobJournal
+    from .veo_leases import LeaseManager
+    from .veo_scheduler import VeoScheduler
 
 load_dotenv(override=True)
 
-# Credenciales
-credentials_filename = os.getenv('GCP_SERVICE_ACCOUNT_KEY', 'gcp-credentials.json')
-credentials_path = os.path.join(
-    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-    credentials_filename
-)
-os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = credentials_path
-print(f"[X] Usando credenciales: {os.path.abspath(credentials_path)}")
-if not os.path.exists(credentials_path):
-    print(f"[!] ERROR: Archivo de credenciales no encontrado en {credentials_path}")
-    exit(1)
-
-# Cliente Vertex AI (para Veo)
-try:
-    client = genai.Client(
-        vertexai=True,
-        project=os.getenv("GCP_PROJECT_ID"),
-        location=os.getenv("GCP_LOCATION", "us-central1"),
+SUPPORTED_EXTS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+VEO_MODEL = 'veo-2.0-generate-001'
+
+@lru_cache(maxsize=1)
+def preprocess_config() -> dict:
+    """Opciones de preprocesado del entorno (ver image_preprocess.preprocess_options), leídas con el primer video."""
+    from .image_preprocess import preprocess_options
+    return preprocess_options()
+
+def veo_config() -> dict:
+    """Configuración de generate_videos."""
+    return {'enhance_prompt': True, 'aspect_ratio': preprocess_config()['aspect_ratio']}
+
+def cache_config() -> dict:
+    """Configuración de la clave de la caché de resultados: incluye el preprocesado porque cambia lo que recibe Veo."""
+    return {**veo_config(), 'preprocess': preprocess_config()}
+
+# El cliente de Veo y google.genai se cargan con la primera herramienta de video, no al importar
+_client = None
+_client_lock = threading.Lock()
+_poller: Optional[OperationPoller] = None
+_poller_lock = threading.Lock()
+# Videos que está generando algún lote de este proceso: otro lote simultáneo (otro usuario del
+# mismo servidor) no los retoma como huérfanos del diario ni los escribe a la vez
+_active_videos: set[str] = set()
+_active_videos_lock = threading.Lock()
+
+def resolve_credentials() -> str:
+    """Configura proyecto, región y credenciales de Vertex AI en el entorno.
+
+    Returns:
+        str: Ruta del fichero de credenciales
+
+    Raises:
+        RuntimeError: Si el fichero de credenciales no existe
+    """
+    project = os.getenv("GCP_PROJECT_ID") or os.getenv("GOOGLE_CLOUD_PROJECT") or "gdg-ponferrada"
+    location = os.getenv("GCP_LOCATION") or os.getenv("GOOGLE_CLOUD_LOCATION") or "us-central1"
+    os.environ["GOOGLE_CLOUD_PROJECT"] = project
+    os.environ["GOOGLE_CLOUD_LOCATION"] = location
+    # Algunas versiones del SDK también leen estas:
+    os.environ["GOOGLE_GENAI_PROJECT"] = project
+    os.environ["GOOGLE_GENAI_LOCATION"] = location
+
+    credentials_filename = os.getenv('GCP_SERVICE_ACCOUNT_KEY', 'gcp-credentials.json')
+    credentials_path = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        credentials_filename
     )
-    print(f"[X] Cliente GCP inicializado correctamente")
-    print(f"[X] Proyecto: {os.getenv('GCP_PROJECT_ID')}")
-    print(f"[X] Región: {os.getenv('GCP_LOCATION')}")
-except Exception as e:
-    print(f"[!] Error al inicializar cliente GCP: {e}")
-    exit(1)
+    if not os.path.exists(credentials_path):
+        raise RuntimeError(f"Archivo de credenciales no encontrado en {credentials_path}")
+    os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = credentials_path
+    print(f"[X] Usando credenciales: {os.path.abspath(credentials_path)}")
+    return credentials_path
 
-SUPPORTED_EXTS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+def get_client():
+    """Cliente Vertex AI (para Veo), creado en la primera llamada y reutilizado después.
+
+    Raises:
+        RuntimeError: Si faltan las credenciales o el cliente no se puede crear
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            resolve_credentials()
+            from google import genai
+            try:
+                _client = genai.Client(
+                    vertexai=True,
+                    project=os.environ["GOOGLE_CLOUD_PROJECT"],
+                    location=os.environ["GOOGLE_CLOUD_LOCATION"],
+                )
+            except Exception as e:
+                raise RuntimeError(f"Error al inicializar cliente GCP: {e}") from e
+            print(f"[X] Cliente GCP inicializado correctamente")
+            print(f"[X] Proyecto: {os.environ['GOOGLE_CLOUD_PROJECT']}")
+            print(f"[X] Región: {os.environ['GOOGLE_CLOUD_LOCATION']}")
+        return _client
+
+def set_client(client, *, poller: Optional[OperationPoller] = None) -> None:
+    """Sustituye el cliente de Veo (ej: un backend falso para pruebas y benchmarks).
+
+    El cliente sólo necesita lo que usa este módulo: models.generate_videos(model=, prompt=,
+    image=, config=) y operations.get(operation). Los videos gs:// se leen de Cloud Storage
+    (o de STORAGE_EMULATOR_HOST).
+
+    Args:
+        client: El cliente a usar; None vuelve a crear el de Vertex AI en la próxima llamada
+        poller (Optional[OperationPoller], optional): Sondeo a usar con él. Defaults to None
+            (uno nuevo con los intervalos por defecto).
+    """
+    global _client, _poller
+    with _client_lock:
+        _client = client
+    with _poller_lock:
+        _poller = poller
+
+def operation_poller() -> OperationPoller:
+    """Sondeo único compartido por todas las operaciones de Veo del proceso."""
+    global _poller
+    with _poller_lock:
+        if _poller is None:
+            _poller = OperationPoller(lambda operation: get_client().operations.get(operation))
+        return _poller
 
 def videos_output_dir() -> str:
-    """Devuelve la carpeta 'videos' junto a 'images' en image-ecommerce/."""
+    """Devuelve la carpeta 'videos' junto a 'images' en image-ecommerce/ (o VEO_VIDEOS_DIR)."""
     root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    videos_dir = os.path.join(root_dir, 'videos')
+    videos_dir = os.getenv("VEO_VIDEOS_DIR") or os.path.join(root_dir, 'videos')
     os.makedirs(videos_dir, exist_ok=True)
     return videos_dir
 
+def preprocessed_dir() -> str:
+    """Carpeta con las imágenes ya adaptadas al encuadre de Veo."""
+    from .image_preprocess import PREPROCESS_DIRNAME
+    return os.path.join(videos_output_dir(), PREPROCESS_DIRNAME)
+
+def default_max_concurrent() -> int:
+    """Trabajos de Veo simultáneos por defecto (VEO_MAX_CONCURRENT), según la cuota de Vertex."""
+    try:
+        return max(1, int(os.getenv("VEO_MAX_CONCURRENT", "4")))
+    except ValueError:
+        return 4
+
 def generate_videos_for_list(
         image_paths: List[str],
         *,
         prompt: str,
         overwrite: bool = False,
         timeout_sec: int = 1200,
+        max_concurrent: Optional[int] = None,
+        priorities: Optional[Dict[str, int]] = None,
+        scheduler_options: Optional[Dict[str, object]] = None,
+        distributed: Optional[bool] = None,
+        on_result: Optional[Callable[[Dict[str, object]], None]] = None,
     ) -> Dict[str, object]:
-    """Genera videos para una lista de rutas de imagen."""
-    print(f"[VEO] Procesando {len(image_paths)} imágenes")
+    """Genera videos para una lista de rutas de imagen.
+
+    Se mantienen hasta max_concurrent operaciones de Veo en curso a la vez; en cuanto una
+    termina se lanza la siguiente, así que el tiempo total se acerca al del trabajo más
+    lento y no a la suma de todos. Los resultados conservan el orden de image_paths.
+
+    Las operaciones se apuntan en el diario de la carpeta de videos: los trabajos que una
+    ejecución anterior dejó a medias se retoman (y sus resultados se añaden al final)
+    en lugar de volver a lanzarse; si su operación ya no existe se marcan como fallidos,
+    sin pagar otra por imágenes que no están en image_paths. Los videos de otro lote en marcha en este proceso no
+    se retoman y, si también están en image_paths, se saltan ('En curso en otro lote').
+
+    Los trabajos pasan por un VeoScheduler: se ejecutan por prioridad (priorities asigna
+    un valor por ruta, menor primero; los retomados van delante), respetan el presupuesto
+    (VEO_BUDGET_PER_RUN_USD/VEO_BUDGET_PER_DAY_USD), reducen la concurrencia ante errores
+    de cuota y pausan el lote entero si el modelo está sobrecargado. scheduler_options
+    permite ajustar el VeoScheduler (ej: base_delay o breaker en los benchmarks).
+
+    Con distributed (por defecto VEO_DISTRIBUTED) varios procesos o máquinas pueden procesar
+    la misma carpeta a la vez: cada trabajo se reclama con una concesión en la carpeta de
+    videos (ver LeaseManager). Los que tiene otro proceso se reintentan al vaciarse la cola,
+    cada ttl/3 de la concesión y durante timeout_sec como mucho: si el otro proceso termina
+    se cuentan como saltados ('Ya existe') y si su concesión caduca se generan aquí.
+
+    on_result se llama con la entrada de resultados de cada imagen en cuanto se conoce,
+    para informar del progreso de lotes largos.
+    """
+    from .image_preprocess import prepare_images
+    from .veo_cache import VeoResultCache, default_cache_max_bytes, result_key
+    from .veo_journal import VeoJobJournal
+    from .veo_leases import LeaseManager, distributed_enabled
+    from .veo_scheduler import BudgetExceeded, CostBudget, RetryLater, VeoScheduler
+    if max_concurrent is None:
+        max_concurrent = default_max_concurrent()
+    max_concurrent = max(1, max_concurrent)
+    print(f"[VEO] Procesando {len(image_paths)} imágenes ({max_concurrent} trabajos simultáneos)")
     for img_path in image_paths:
         print(f"[VEO] Imagen: {img_path}, existe={os.path.isfile(img_path)}")
     
     out_dir = videos_output_dir()
-    processed = 0
-    skipped = 0
-    failed = 0
-    results: List[Dict[str, str]] = []
-
-    for idx, src_path in enumerate(image_paths, start=1):
-        if not os.path.isfile(src_path):
-            print(f"[x] La imagen fuente no existe: {src_path}")
-            failed += 1
-            results.append({
-                'image': src_path, 
-                'status': 'failed', 
-                'message': 'Imagen fuente no existe'
-            })
-            continue
-
-        base = os.path.splitext(os.path.basename(src_path))[0]
-        out_path = os.path.join(out_dir, f"{base}.mp4")
-        print(f"[VEO] Guardando en: {out_path}")
-        
-        if os.path.exists(out_path) and not overwrite:
-            print(f"[-] Ya existe, salto: {out_path}")
-            skipped += 1
-            results.append({
-                'image': src_path, 
-                'status': 'skipped', 
-                'message': 'Ya existe'
-            })
-            continue
-
-        video_bytes, err = generate_video_from_image(
-            src_path, 
-            prompt=prompt, 
-            timeout_sec=timeout_sec
-        )
-
-        if err:
-            print(f"[x] Error generando video: {err}")
-            failed += 1
-            results.append({
-                'image': src_path, 
-                'status': 'failed', 
-                'message': err
-            })
-            continue
+    results: List[Optional[Dict[str, object]]] = [None] * len(image_paths)
+    pending: List[Tuple[int, str, str, str]] = []
+    journal = VeoJobJournal(out_dir)
+    cache = VeoResultCache(out_dir, max_bytes=default_cache_max_bytes())
+    leases = LeaseManager(out_dir) if (distributed_enabled() if distributed is None else distributed) else None
+    if leases:
+        print(f"[VEO] Modo distribuido: worker {leases.worker_id}")
+    run_started = time.time()
+    owned: set[str] = set()
+
+    def report(idx: int, result: Dict[str, object]) -> None:
+        results[idx] = result
+        if on_result:
+            try:
+                on_result(result)
+            except Exception as callback_err:
+                print(f"[!] Error informando del progreso: {callback_err}")
 
-        try:
-            with open(out_path, 'wb') as f:
-                f.write(video_bytes)  # type: ignore[arg-type]
-            size_mb = (len(video_bytes) if video_bytes else 0) / (1024 * 1024)
-            print(f"[✔] Video guardado: {out_path} ({size_mb:.2f} MB)")
-            processed += 1
-            results.append({
+    try:
+        for idx, src_path in enumerate(image_paths):
+            if not os.path.isfile(src_path):
+                print(f"[x] La imagen fuente no existe: {src_path}")
+                report(idx, {
+                    'image': src_path, 
+                    'status': 'failed', 
+                    'message': 'Imagen fuente no existe'
+                })
+                continue
+
+            base = os.path.splitext(os.path.basename(src_path))[0]
+            out_path = os.path.join(out_dir, f"{base}.mp4")
+            
+            # Un video existente sólo vale si se generó con esta misma imagen, prompt y modelo
+            if os.path.exists(out_path) and not overwrite and _output_matches(cache, out_path, src_path, prompt):
+                print(f"[-] Ya existe, salto: {out_path}")
+                report(idx, {
+                    'image': src_path, 
+                    'status': 'skipped', 
+                    'message': 'Ya existe'
+                })
+                continue
+
+            pending.append((idx, src_path, out_path, prompt))
+
+        # Se reservan los videos del lote; con el registro bloqueado, para que dos lotes que
+        # empiezan a la vez no tomen los mismos trabajos del diario
+        with _active_videos_lock:
+            in_other_batch = [job for job in pending if job[2] in _active_videos]
+            pending = [job for job in pending if job[2] not in _active_videos]
+            owned = {out_path for _, _, out_path, _ in pending}
+            # Trabajos de ejecuciones anteriores que no forman parte de esta lista ni de otro lote vivo
+            for job in journal.resumable():
+                video_path = job['video_path']
+                if (not video_path or video_path in owned or video_path in _active_videos
+                        or not job['prompt'] or os.path.exists(video_path)):
+                    continue
+                print(f"[VEO] Retomando trabajo pendiente de {job['image']}: {job['operation_name']}")
+                results.append(None)
+                pending.append((len(results) - 1, job['image'], video_path, job['prompt']))
+                owned.add(video_path)
+            _active_videos.update(owned)
+        for idx, src_path, out_path, _ in in_other_batch:
+            print(f"[-] En curso en otro lote, salto: {out_path}")
+            report(idx, {'image': src_path, 'status': 'skipped', 'message': 'En curso en otro lote'})
+
+        if pending:
+            # Las imágenes se preparan antes en un pool de procesos; cada trabajo las lee de la caché.
+            # Las que ya tienen video en la caché de resultados no se envían a Veo y no se preparan.
+            # En modo distribuido cada worker prepara sólo las que consigue reclamar
+            if not leases:
+                misses = [
+                    src_path for _, src_path, _, job_prompt in pending
+                    if os.path.isfile(src_path)
+                    and not cache.contains(result_key(src_path, job_prompt, VEO_MODEL, cache_config()))
+                ]
+                prepare_images(misses, preprocessed_dir(), **preprocess_config())
+            started = time.time()
+            total_jobs = len(pending)
+            budget = CostBudget.from_env(out_dir)
+            with VeoScheduler(min(max_concurrent, len(pending)), budget=budget, **(scheduler_options or {})) as scheduler:
+                lease_deadline = None
+                while pending:
+                    futures = {}
+                    for job in pending:
+                        idx, src_path, out_path, job_prompt = job
+                        resumed = idx >= len(image_paths)
+                        priority = -1 if resumed else (priorities or {}).get(src_path, 0)
+                        if leases:
+                            future = scheduler.submit(
+                                _generate_with_lease, leases, run_started, overwrite,
+                                src_path, out_path, job_prompt, timeout_sec, journal, cache, scheduler,
+                                resume_only=resumed, priority=priority,
+                            )
+                        else:
+                            future = scheduler.submit(
+                                _generate_and_save, src_path, out_path, job_prompt, timeout_sec, journal, cache, scheduler,
+                                resume_only=resumed, priority=priority,
+                            )
+                        futures[future] = (job, resumed)
+                    busy = []
+                    for future in as_completed(futures):
+                        job, resumed = futures[future]
+                        idx, src_path = job[0], job[1]
+                        try:
+                            result = future.result()
+                        except (BudgetExceeded, RetryLater) as e:
+                            print(f"[x] {src_path}: {e}")
+                            result = {'image': src_path, 'status': 'failed', 'message': str(e)}
+                        if result.get('lease_busy') and (lease_deadline is None or time.monotonic() < lease_deadline):
+                            # Otro worker lo tiene: se revisa al vaciarse la cola por si termina o su concesión caduca
+                            busy.append(job)
+                            continue
+                        if resumed:
+                            result['resumed'] = True
+                        report(idx, result)
+                    pending = busy
+                    if pending:
+                        if lease_deadline is None:
+                            lease_deadline = time.monotonic() + timeout_sec
+                        wait = max(1.0, leases.ttl_sec / 3)
+                        print(f"[VEO] {len(pending)} videos en curso en otros workers: se revisan de nuevo en {wait:.0f}s")
+                        time.sleep(wait)
+            print(f"[VEO] {total_jobs} trabajos terminados en {time.time() - started:.0f}s "
+                  f"(gasto estimado {budget.run_spent:.2f} USD, {scheduler.stats['retried']} reintentos)")
+    finally:
+        with _active_videos_lock:
+            _active_videos.difference_update(owned)
+        if leases:
+            leases.close()
+        journal.close()
+        cache.close()
+
+    statuses = [r['status'] for r in results if r]
+    return {
+        'status': 'success',
+        'processed': statuses.count('processed'),
+        'skipped': statuses.count('skipped'),
+        'failed': statuses.count('failed'),
+        'cached': sum(1 for r in results if r and r.get('cached')),
+        'videos_dir': out_dir,
+        'results': results,
+    }
+
+def _output_matches(cache: 'VeoResultCache', out_path: str, src_path: str, prompt: str) -> bool:
+    """Indica si el video de out_path corresponde a esta imagen y prompt.
+
+    Los videos generados antes de existir la caché no tienen clave y se dan por buenos.
+    """
+    from .veo_cache import result_key
+    written = cache.output_key(out_path)
+    return written is None or written == result_key(src_path, prompt, VEO_MODEL, cache_config())
+
+def _generate_with_lease(
+        leases: 'LeaseManager',
+        run_started: float,
+        overwrite: bool,
+        src_path: str,
+        out_path: str,
+        prompt: str,
+        timeout_sec: int,
+        journal: Optional['VeoJobJournal'] = None,
+        cache: Optional['VeoResultCache'] = None,
+        scheduler: Optional['VeoScheduler'] = None,
+        resume_only: bool = False,
+    ) -> Dict[str, object]:
+    """Como _generate_and_save, pero sólo si este proceso consigue la concesión del video.
+
+    La concesión se renueva mientras se espera a Veo y se libera al terminar (también si el
+    trabajo vuelve a la cola). Un video que otro worker escribió desde el inicio de esta
+    ejecución, o que ya corresponde a la imagen y el prompt, no se vuelve a generar.
+    """
+    key = os.path.basename(out_path)
+    if not leases.claim(key):
+        print(f"[-] En curso en otro worker, salto: {out_path}")
+        return {'image': src_path, 'status': 'skipped', 'message': 'En curso en otro worker', 'lease_busy': True}
+    try:
+        if os.path.exists(out_path) and (
+                os.path.getmtime(out_path) >= run_started or
+                (not overwrite and _output_matches(cache, out_path, src_path, prompt))
+        ):
+            print(f"[-] Ya generado por otro worker, salto: {out_path}")
+            return {'image': src_path, 'status': 'skipped', 'message': 'Ya existe'}
+        return _generate_and_save(src_path, out_path, prompt, timeout_sec, journal, cache, scheduler, resume_only)
+    finally:
+        leases.release(key)
+
+def _generate_and_save(
+        src_path: str,
+        out_path: str,
+        prompt: str,
+        timeout_sec: int,
+        journal: Optional['VeoJobJournal'] = None,
+        cache: Optional['VeoResultCache'] = None,
+        scheduler: Optional['VeoScheduler'] = None,
+        resume_only: bool = False,
+    ) -> Dict[str, object]:
+    """Genera el video de una imagen y lo guarda en out_path; devuelve su entrada de resultados.
+
+    Con caché, un resultado ya generado para el mismo contenido se copia sin llamar a Veo.
+    Con resume_only (trabajos huérfanos del diario) sólo se retoma la operación apuntada.
+    """
+    from .veo_cache import result_key
+    print(f"[VEO] Guardando en: {out_path}")
+    key = result_key(src_path, prompt, VEO_MODEL, cache_config()) if cache and os.path.isfile(src_path) else None
+    if key:
+        restored = cache.restore(key, out_path)
+        if restored is not None:
+            print(f"[✔] Video recuperado de la caché: {out_path} ({restored / (1024 * 1024):.2f} MB)")
+            return {
                 'image': src_path,
                 'video_path': out_path,
                 'status': 'processed',
-            })
-        except Exception as e:
-            print(f"[x] Error guardando archivo: {e}")
-            failed += 1
-            results.append({
-                'image': src_path, 
-                'status': 'failed', 
-                'message': str(e)
-            })
+                'cached': True,
+            }
 
+    info, err = generate_video_to_file(
+        src_path,
+        out_path,
+        prompt=prompt, 
+        timeout_sec=timeout_sec,
+        journal=journal,
+        scheduler=scheduler,
+        resume_only=resume_only,
+    )
+
+    if err:
+        print(f"[x] Error generando video: {err}")
+        return {
+            'image': src_path, 
+            'status': 'failed', 
+            'message': err
+        }
+
+    print(f"[✔] Video guardado: {out_path} ({info['bytes'] / (1024 * 1024):.2f} MB, sha256 {info['sha256'][:12]}…)")
+    if key:
+        try:
+            cache.put(key, out_path, model=VEO_MODEL, prompt=prompt)
+            cache.record_output(out_path, key)
+        except OSError as e:
+            print(f"[!] No se pudo guardar el video en la caché: {e}")
     return {
-        'status': 'success',
-        'processed': processed,
-        'skipped': skipped,
-        'failed': failed,
-        'videos_dir': out_dir,
-        'results': results,
+        'image': src_path,
+        'video_path': out_path,
+        'status': 'processed',
+        'bytes': info['bytes'],
+        'sha256': info['sha256'],
     }
     
 def generate_videos_in_folder(
@@ -144,15 +458,41 @@ def generate_videos_in_folder(
         max_videos: int = 0,
         overwrite: bool = False,
         timeout_sec: int = 1200,
+        skip_duplicates: bool = True,
+        max_concurrent: Optional[int] = None,
+        distributed: Optional[bool] = None,
+        on_result: Optional[Callable[[Dict[str, object]], None]] = None,
 ) -> Dict[str, object]:
-    """Genera videos para todas las imágenes soportadas en una carpeta."""
+    """Genera videos para todas las imágenes soportadas en una carpeta.
+
+    Con skip_duplicates, las copias exactas o casi idénticas de otra imagen de la
+    carpeta (según el índice de duplicados) no se envían a Veo.
+    """
     if not os.path.isdir(images_dir):
         return {
             'status': 'error',
             'message': f"La carpeta de imágenes no existe: {images_dir}"
         }
     
-    all_files = sorted(os.listdir(images_dir))
+    if skip_duplicates:
+        from .image_dedup import ImageDedupIndex
+        index = ImageDedupIndex(images_dir)
+        try:
+            index.refresh()
+            all_files = index.unique_files()
+            duplicates = index.duplicates()
+        finally:
+            index.close()
+        if duplicates:
+            print(f"[-] Saltando {len(duplicates)} imágenes duplicadas")
+    else:
+        from .image_catalog import ImageCatalog
+        catalog = ImageCatalog(images_dir)
+        try:
+            catalog.refresh()
+            all_files = catalog.filenames()
+        finally:
+            catalog.close()
     paths = [
         os.path.join(images_dir, f)
         for f in all_files
@@ -167,6 +507,9 @@ def generate_videos_in_folder(
         prompt=prompt,
         overwrite=overwrite,
         timeout_sec=timeout_sec,
+        max_concurrent=max_concurrent,
+        distributed=distributed,
+        on_result=on_result,
     )
 
 def ensure_webp_mimetype() -> None:
@@ -185,119 +528,211 @@ def guess_mime_type(path: str) -> str:
         '.gif': 'image/gif', '.webp': 'image/webp',
     }.get(ext, 'image/jpeg')
 
-def generate_video_from_image(
-    image_path: str, 
-    *, 
-    prompt: str, 
-    timeout_sec: int = 1200,
-    model: str = 'veo-2.0-generate-001',
-    max_retries: int = 3,
-) -> Tuple[Optional[bytes], Optional[str]]:
-    """Genera un video desde una imagen usando Veo 2.
+def _reattach_operation(operation_name: str):
+    """Recupera una operación de Veo lanzada en una ejecución anterior.
+
+    Returns:
+        La operación actualizada o None si ya no existe en Vertex
+    """
+    print(f"[VEO] Retomando operación: {operation_name}")
+    try:
+        from google.genai import types
+        return get_client().operations.get(types.GenerateVideosOperation(name=operation_name))
+    except Exception as e:
+        print(f"[!] No se pudo retomar la operación {operation_name}: {e}")
+        return None
+
+def _collect_video(operation, sink: ChunkSink) -> Tuple[int, Optional[str]]:
+    """Escribe en el destino el video de una operación terminada, por bloques.
+
+    Los bytes en línea se escriben por bloques; las URI HTTP(S) y gs:// se descargan en
+    streaming con iter_content, así que el video no se retiene completo en memoria.
+    Devuelve el número de bytes escritos y el error, si lo hay.
+    """
+    response = getattr(operation, "response", None)
+    if not response:
+        return 0, "Operación sin respuesta"
     
-    Args:
-        image_path: Ruta a la imagen fuente
-        prompt: Descripción del video a generar
-        timeout_sec: Tiempo máximo de espera en segundos
-        model: Modelo de Veo a usar
-        max_retries: Número máximo de reintentos en caso de error 503
+    generated = getattr(response, "generated_videos", None)
+    if not generated:
+        return 0, "Operación sin videos generados"
+
+    first = generated[0]
+    video = getattr(first, "video", None)
+    if not video:
+        return 0, "Respuesta sin objeto video"
+
+    video_bytes = (
+        getattr(video, "video_bytes", None) or
+        getattr(video, "bytes", None) or
+        getattr(video, "data", None)
+    )
+    
+    if video_bytes:
+        sink.write_all(video_bytes)
+    elif getattr(video, "uri", None):
+        uri = video.uri
+        print(f"[VEO] Descargando video desde URI: {uri}")
+        try:
+            if uri.startswith(("http://", "https://")):
+                session, url, headers = requests, uri, _download_headers()
+            elif uri.startswith("gs://"):
+                session, url, headers = _storage_session(), _storage_media_url(uri), {}
+            else:
+                return 0, f"URI de video no soportada: {uri}"
+            with session.get(url, stream=True, timeout=60, headers=headers) as r:
+                r.raise_for_status()
+                sink.write_iter(r.iter_content(chunk_size=CHUNK_SIZE))
+        except Exception as download_err:
+            print(f"[!] Error descargando video desde URI: {download_err}")
+            return 0, f"Error descargando video: {download_err}"
+
+    written = sink.bytes_written
+    if not written:
+        return 0, "Video sin bytes/uri"
+
+    print(f"[VEO] Video generado exitosamente ({written / (1024 * 1024):.2f} MB)")
+    return written, None
+
+def _storage_media_url(uri: str) -> str:
+    """URL de descarga (API JSON de Cloud Storage) de un objeto gs://bucket/objeto.
+
+    Con STORAGE_EMULATOR_HOST (la variable del emulador de google-cloud-storage) se usa ese host.
     """
+    bucket, _, name = uri[len("gs://"):].partition("/")
+    emulator = os.getenv("STORAGE_EMULATOR_HOST", "").rstrip("/")
+    if emulator and not emulator.startswith(("http://", "https://")):
+        emulator = f"http://{emulator}"
+    base = emulator or "https://storage.googleapis.com"
+    return f"{base}/download/storage/v1/b/{quote(bucket, safe='')}/o/{quote(name, safe='')}?alt=media"
+
+_storage = None
+_storage_lock = threading.Lock()
+
+def _storage_session():
+    """Sesión autenticada con las credenciales de Vertex AI para leer de Cloud Storage (requests sin auth en el emulador)."""
+    global _storage
+    if os.getenv("STORAGE_EMULATOR_HOST"):
+        return requests
+    with _storage_lock:
+        if _storage is None:
+            import google.auth
+            from google.auth.transport.requests import AuthorizedSession
+            resolve_credentials()
+            credentials, _ = google.auth.default(scopes=["https://www.googleapis.com/auth/cloud-platform"])
+            _storage = AuthorizedSession(credentials)
+        return _storage
+
+def _download_headers() -> Dict[str, str]:
+    """Cabeceras para descargar el video de la Gemini API (la URI exige la API key)."""
+    api_key = os.getenv("GOOGLE_API_KEY")
+    return {'x-goog-api-key': api_key} if api_key else {}
+
+def _run_operation(
+    image_path: str,
+    *,
+    prompt: str,
+    timeout_sec: int,
+    model: str,
+    max_retries: int,
+    journal: Optional['VeoJobJournal'],
+    video_path: Optional[str],
+    scheduler: Optional['VeoScheduler'] = None,
+    resume_only: bool = False,
+):
+    """Lanza (o retoma) la operación de Veo de una imagen y espera a que termine.
+
+    Con planificador, los errores de sobrecarga o cuota al lanzar se propagan como
+    RetryLater para que sea él quien espere y reintente, y cada lanzamiento se descuenta
+    del presupuesto (BudgetExceeded si no queda).
+
+    Con resume_only nunca se lanza una operación nueva: si la apuntada en el diario no se
+    puede retomar, el trabajo se marca 'failed'. Es el caso de los huérfanos del diario,
+    imágenes que nadie ha pedido en esta llamada y por las que no se debe pagar otra vez.
+
+    Returns:
+        La operación terminada y None, o None y el mensaje de error
+    """
+    from .image_preprocess import prepare_image
+    from .veo_scheduler import BudgetExceeded, classify_error
     print(f"[VEO] Generando video desde: {image_path}")
     print(f"[VEO] Prompt: {prompt[:100]}...")
+    job = journal.get(image_path, prompt, model) if journal else None
+    image = None
     
     # Intentos con backoff exponencial para errores 503
     for attempt in range(max_retries):
+        reserved = False
         try:
             if attempt > 0:
                 wait_time = 2 ** attempt  # Backoff exponencial: 2, 4, 8 segundos
                 print(f"[VEO] Reintento {attempt + 1}/{max_retries} después de {wait_time}s...")
                 time.sleep(wait_time)
             
-            ensure_webp_mimetype()
-            mime_type = guess_mime_type(image_path)
-            print(f"[VEO] MIME type: {mime_type}")
-
-            with open(image_path, "rb") as f:
-                image_bytes_data = f.read()
-            image = types.Image(image_bytes=image_bytes_data, mime_type=mime_type)
-
-            print(f"[VEO] Iniciando generación de video para '{os.path.basename(image_path)}'…")
-
-            operation = client.models.generate_videos(
-                model=model,
-                prompt=prompt,
-                image=image,
-                config=types.GenerateVideosConfig(
-                    enhance_prompt=True,
-                ),
-            )
-
-            op_name = operation.name if hasattr(operation, 'name') else str(operation)
-            print(f"[VEO] Operación lanzada: {op_name}")
-
-            # Sondeo hasta completar
-            start_time = time.time()
-            last_min_logged = -1
-            
-            while not getattr(operation, "done", False):
-                elapsed = time.time() - start_time
-                elapsed_min = int(elapsed // 60)
-                if elapsed_min != last_min_logged:
-                    print(f"[!] Esperando… {elapsed_min}m")
-                    last_min_logged = elapsed_min
-                if elapsed >= timeout_sec:
-                    return None, f"Timeout tras {timeout_sec // 60} minutos"
-                time.sleep(15)
-                try:
-                    # refrescar con el objeto operación
-                    operation = client.operations.get(operation)
-                except Exception as refresh_err:
-                    print(f"[!] Error refrescando operación: {refresh_err}")
+            operation = None
+            if job and job['state'] in ('pending', 'done') and job['operation_name']:
+                operation = _reattach_operation(job['operation_name'])
+                # Sólo se intenta una vez: si falla, se lanza una operación nueva
+                job = None
+
+            if operation is None and resume_only:
+                msg = "No se pudo retomar la operación pendiente; no se lanza otra para un trabajo no pedido"
+                print(f"[x] {image_path}: {msg}")
+                if journal:
+                    journal.mark(image_path, prompt, model, 'failed', message=msg)
+                return None, msg
+
+            if operation is None:
+                from google.genai import types
+                if image is None:
+                    # Se prepara y se lee una sola vez para todos los reintentos
+                    upload_path = prepare_image(image_path, preprocessed_dir(), **preprocess_config())
+                    ensure_webp_mimetype()
+                    mime_type = guess_mime_type(upload_path)
+                    print(f"[VEO] MIME type: {mime_type}")
+
+                    with open(upload_path, "rb") as f:
+                        image_bytes_data = f.read()
+                    print(f"[VEO] Imagen a enviar: {len(image_bytes_data) / 1024:.0f} KB")
+                    image = types.Image(image_bytes=image_bytes_data, mime_type=mime_type)
+
+                print(f"[VEO] Iniciando generación de video para '{os.path.basename(image_path)}'…")
+
+                if scheduler:
+                    scheduler.before_submit()
+                    reserved = True
+                operation = get_client().models.generate_videos(
+                    model=model,
+                    prompt=prompt,
+                    image=image,
+                    config=types.GenerateVideosConfig(**veo_config()),
+                )
+
+                reserved = False
+                op_name = operation.name if hasattr(operation, 'name') else str(operation)
+                print(f"[VEO] Operación lanzada: {op_name}")
+                if journal:
+                    journal.record_submitted(image_path, prompt, model, op_name, video_path)
+
+            # El sondeo compartido detecta el final en segundos y el plazo vence en timeout_sec
+            try:
+                operation = operation_poller().wait(operation, timeout_sec)
+            except TimeoutError:
+                # La operación sigue apuntada como pendiente: la próxima ejecución la retoma
+                return None, f"Timeout tras {timeout_sec // 60} minutos"
                 
             print(f"[VEO] Operación completada")
-
-            response = getattr(operation, "response", None)
-            if not response:
-                return None, "Operación sin respuesta"
-            
-            generated = getattr(response, "generated_videos", None)
-            if not generated:
-                return None, "Operación sin videos generados"
-
-            first = generated[0]
-            video = getattr(first, "video", None)
-            if not video:
-                return None, "Respuesta sin objeto video"
-
-            video_bytes = (
-                getattr(video, "video_bytes", None) or
-                getattr(video, "bytes", None) or
-                getattr(video, "data", None)
-            )
-            
-            if not video_bytes and getattr(video, "uri", None):
-                uri = video.uri
-                print(f"[VEO] Descargando video desde URI: {uri}")
-                try:
-                    downloaded = client.files.download(name=uri)
-                    video_bytes = (
-                        getattr(downloaded, "video_bytes", None) or
-                        getattr(downloaded, "bytes", None) or
-                        getattr(downloaded, "data", None)
-                    )
-                except Exception as download_err:
-                    print(f"[!] Error descargando video desde URI: {download_err}")
-
-            if not video_bytes:
-                return None, "Video sin bytes/uri"
-
-            size_mb = len(video_bytes) / (1024 * 1024)
-            print(f"[VEO] Video generado exitosamente ({size_mb:.2f} MB)")
-            return video_bytes, None
+            return operation, None
         
+        except BudgetExceeded:
+            raise
         except Exception as e:
+            if reserved:
+                scheduler.submit_failed()  # type: ignore[union-attr]
             error_str = str(e)
             print(f"[VEO ERROR] Intento {attempt + 1}/{max_retries}: {type(e).__name__}: {e}")
+            if scheduler and (retry := classify_error(e)):
+                raise retry
             
             # Verificar si es un error 503 (UNAVAILABLE)
             if "503" in error_str or "UNAVAILABLE" in error_str or "overloaded" in error_str.lower():
@@ -325,11 +760,98 @@ def generate_video_from_image(
     # Si llegamos aquí, todos los intentos fallaron
     return None, "Todos los intentos fallaron debido a sobrecarga del modelo"
 
+
+def generate_video_from_image(
+    image_path: str, 
+    *, 
+    prompt: str, 
+    timeout_sec: int = 1200,
+    model: str = VEO_MODEL,
+    max_retries: int = 3,
+    journal: Optional['VeoJobJournal'] = None,
+    video_path: Optional[str] = None,
+) -> Tuple[Optional[bytes], Optional[str]]:
+    """Genera un video desde una imagen usando Veo 2 y lo devuelve en memoria.
+
+    Para lotes es preferible generate_video_to_file, que no retiene el video completo.
+    
+    Args:
+        image_path: Ruta a la imagen fuente
+        prompt: Descripción del video a generar
+        timeout_sec: Plazo máximo de la operación en segundos
+        model: Modelo de Veo a usar
+        max_retries: Número máximo de reintentos en caso de error 503
+        journal: Diario de trabajos; si ya hay una operación lanzada para esta imagen,
+            prompt y modelo se retoma en lugar de lanzar otra
+        video_path: Ruta donde se guardará el video (se apunta en el diario)
+    """
+    operation, err = _run_operation(
+        image_path, prompt=prompt, timeout_sec=timeout_sec, model=model,
+        max_retries=max_retries, journal=journal, video_path=video_path,
+    )
+    if err:
+        return None, err
+    buffer = BufferSink()
+    _, err = _collect_video(operation, buffer)
+    if journal:
+        journal.mark(image_path, prompt, model, 'failed' if err else 'done', message=err)
+    return (None, err) if err else (buffer.getvalue(), None)
+
+def generate_video_to_file(
+    image_path: str,
+    out_path: str,
+    *,
+    prompt: str,
+    timeout_sec: int = 1200,
+    model: str = VEO_MODEL,
+    max_retries: int = 3,
+    journal: Optional['VeoJobJournal'] = None,
+    scheduler: Optional['VeoScheduler'] = None,
+    resume_only: bool = False,
+) -> Tuple[Optional[Dict[str, object]], Optional[str]]:
+    """Genera un video desde una imagen y lo escribe en streaming en out_path.
+
+    El video se escribe por bloques en un temporal, se vuelca a disco y se renombra de
+    forma atómica; nunca se carga completo en memoria si Veo devuelve una URI. Con
+    resume_only sólo se retoma la operación del diario (ver _run_operation).
+
+    Returns:
+        ({'video_path', 'bytes', 'sha256'}, None) o (None, mensaje de error)
+    """
+    operation, err = _run_operation(
+        image_path, prompt=prompt, timeout_sec=timeout_sec, model=model,
+        max_retries=max_retries, journal=journal, video_path=out_path, scheduler=scheduler,
+        resume_only=resume_only,
+    )
+    if err:
+        return None, err
+    info = None
+    try:
+        with VideoSink(out_path) as sink:
+            _, err = _collect_video(operation, sink)
+            if not err:
+                info = sink.commit()
+    except OSError as e:
+        err = f"Error guardando archivo: {e}"
+    if journal:
+        journal.mark(image_path, prompt, model, 'failed' if err else 'saved', message=err, video_path=out_path if info else None)
+    return info, err
+
 def main() -> None:
+    from .image_catalog import ImageCatalog
+    from .veo_cache import VeoResultCache, default_cache_max_bytes
+    from .veo_journal import VeoJobJournal
+    from .veo_leases import LeaseManager, distributed_enabled
+    from .veo_scheduler import BudgetExceeded, CostBudget, RetryLater, VeoScheduler
+    try:
+        get_client()
+    except RuntimeError as e:
+        print(f"[!] ERROR: {e}")
+        exit(1)
+
     root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     images_dir = os.path.join(root_dir, 'images')
-    videos_dir = os.path.join(root_dir, 'videos')
-    os.makedirs(videos_dir, exist_ok=True)
+    videos_dir = videos_output_dir()
 
     if not os.path.isdir(images_dir):
         print(f"[!] Carpeta de imágenes no encontrada: {images_dir}")
@@ -345,8 +867,12 @@ def main() -> None:
     except ValueError:
         max_videos = 0
 
-    all_files = sorted(os.listdir(images_dir))
-    image_files = [f for f in all_files if os.path.splitext(f)[1].lower() in SUPPORTED_EXTS]
+    catalog = ImageCatalog(images_dir)
+    try:
+        catalog.refresh(videos_dir)
+        image_files = catalog.filenames()
+    finally:
+        catalog.close()
     
     if not image_files:
         print(f"[!] No se encontraron imágenes en {images_dir}")
@@ -358,43 +884,104 @@ def main() -> None:
     processed = 0
     skipped = 0
     failed = 0
+    cached = 0
+    journal = VeoJobJournal(videos_dir)
+    cache = VeoResultCache(videos_dir, max_bytes=default_cache_max_bytes())
+    # Con VEO_DISTRIBUTED=1 se pueden lanzar varias copias sobre la misma carpeta compartida
+    leases = LeaseManager(videos_dir) if distributed_enabled() else None
+    try:
+        run_started = time.time()
+        # Como en generate_videos_for_list: presupuesto, circuito y reintentos, aquí de uno en uno
+        budget = CostBudget.from_env(videos_dir)
+        with VeoScheduler(1, budget=budget) as scheduler:
+
+            def run_one(src_path: str, out_path: str) -> Optional[Dict[str, object]]:
+                """Genera un video a través del planificador; None si se agotó el presupuesto"""
+                if leases:
+                    future = scheduler.submit(
+                        _generate_with_lease, leases, run_started, False,
+                        src_path, out_path, prompt_default, 1200, journal, cache, scheduler,
+                    )
+                else:
+                    future = scheduler.submit(_generate_and_save, src_path, out_path, prompt_default, 1200, journal, cache, scheduler)
+                try:
+                    return future.result()
+                except BudgetExceeded as e:
+                    print(f"[!] {e}. Deteniendo.")
+                    return None
+                except RetryLater as e:
+                    return {'image': src_path, 'status': 'failed', 'message': str(e)}
+
+            def count(filename: str, result: Dict[str, object]) -> None:
+                nonlocal processed, skipped, failed, cached
+                if result['status'] == 'skipped':
+                    skipped += 1
+                elif result['status'] == 'processed':
+                    processed += 1
+                    cached += 1 if result.get('cached') else 0
+                else:
+                    print(f"[x] Falló '{filename}': {result.get('message')}")
+                    failed += 1
+
+            busy: List[Tuple[str, str, str]] = []
+            stopped = False
+            for idx, filename in enumerate(image_files, start=1):
+                src_path = os.path.join(images_dir, filename)
+                base, _ = os.path.splitext(filename)
+                out_path = os.path.join(videos_dir, f"{base}.mp4")
+
+                if os.path.exists(out_path) and _output_matches(cache, out_path, src_path, prompt_default):
+                    print(f"[-] Ya existe, salto: {out_path}")
+                    skipped += 1
+                    continue
 
-    for idx, filename in enumerate(image_files, start=1):
-        src_path = os.path.join(images_dir, filename)
-        base, _ = os.path.splitext(filename)
-        out_path = os.path.join(videos_dir, f"{base}.mp4")
-
-        if os.path.exists(out_path):
-            print(f"[-] Ya existe, salto: {out_path}")
-            skipped += 1
-            continue
-
-        if max_videos and processed >= max_videos:
-            print(f"[i] Alcanzado MAX_VIDEOS={max_videos}, deteniendo.")
-            break
-
-        print(f"\n[{idx}/{len(image_files)}] Procesando: {filename}")
-        video_bytes, err = generate_video_from_image(src_path, prompt=prompt_default)
-        
-        if err:
-            print(f"[x] Falló '{filename}': {err}")
-            failed += 1
-            continue
-
-        try:
-            with open(out_path, 'wb') as f:
-                f.write(video_bytes)  # type: ignore[arg-type]
-            size_mb = (len(video_bytes) if video_bytes else 0) / (1024 * 1024)
-            print(f"[✔] Guardado: {out_path} ({size_mb:.2f} MB)")
-            processed += 1
-        except Exception as e:
-            print(f"[x] Error guardando '{out_path}': {e}")
-            failed += 1
+                if max_videos and processed >= max_videos:
+                    print(f"[i] Alcanzado MAX_VIDEOS={max_videos}, deteniendo.")
+                    stopped = True
+                    break
+
+                print(f"\n[{idx}/{len(image_files)}] Procesando: {filename}")
+                result = run_one(src_path, out_path)
+                if result is None:
+                    stopped = True
+                    break
+                if result.get('lease_busy'):
+                    busy.append((filename, src_path, out_path))
+                    continue
+                count(filename, result)
+
+            # Los que tenía otro worker se revisan hasta que termine o caduque su concesión (como mucho el plazo de un video)
+            deadline = time.monotonic() + 1200
+            while busy and not stopped:
+                wait = max(1.0, leases.ttl_sec / 3)
+                print(f"[VEO] {len(busy)} videos en curso en otros workers: se revisan de nuevo en {wait:.0f}s")
+                time.sleep(wait)
+                still_busy = []
+                for filename, src_path, out_path in busy:
+                    if max_videos and processed >= max_videos:
+                        stopped = True
+                        break
+                    result = run_one(src_path, out_path)
+                    if result is None:
+                        stopped = True
+                        break
+                    if result.get('lease_busy') and time.monotonic() < deadline:
+                        still_busy.append((filename, src_path, out_path))
+                        continue
+                    count(filename, result)
+                busy = still_busy
+    finally:
+        if leases:
+            leases.close()
+        journal.close()
+        cache.close()
 
     print("\n===== Resumen =====")
     print(f"Procesados: {processed}")
     print(f"Saltados:   {skipped}")
     print(f"Fallidos:   {failed}")
+    print(f"De caché:   {cached}")
+    print(f"Gasto est.: {budget.run_spent:.2f} USD")
     print("===================\n")
 
 if __name__ == "__main__":
@@ -0,0 +1,162 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+JOURNAL_FILENAME = '.veo_jobs.sqlite'
+
+# pending: operación lanzada y sin terminar; done: terminada pero el video aún no está en disco
+RESUMABLE_STATES = ('pending', 'done')
+
+def prompt_hash(prompt: str) -> str:
+    """Hash estable del prompt para identificar el trabajo"""
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+class VeoJobJournal:
+    """
+    Diario persistente (SQLite) de las operaciones de Veo lanzadas.
+
+    Cada trabajo se identifica por imagen, hash del prompt y modelo, y guarda el nombre
+    de la operación en cuanto se lanza. Si el proceso muere mientras se espera, la
+    siguiente ejecución retoma el sondeo de esa operación en lugar de pagar otra.
+    """
+    def __init__(self, folder: str, filename: str = JOURNAL_FILENAME):
+        """
+        Abre (o crea) el diario dentro de la carpeta de videos
+
+        Args:
+            folder (str): Carpeta donde se guardan los videos generados
+            filename (str, optional): Nombre del fichero SQLite. Defaults to JOURNAL_FILENAME.
+        """
+        os.makedirs(folder, exist_ok=True)
+        self.path = os.path.join(folder, filename)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                image TEXT NOT NULL,
+                prompt_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt TEXT,
+                operation_name TEXT,
+                state TEXT NOT NULL,
+                video_path TEXT,
+                message TEXT,
+                created_at REAL,
+                updated_at REAL,
+                PRIMARY KEY (image, prompt_hash, model)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, image: str, prompt: str, model: str) -> Optional[dict]:
+        """Devuelve el trabajo de una imagen con ese prompt y modelo
+
+        Args:
+            image (str): Ruta de la imagen fuente
+            prompt (str): El prompt del video
+            model (str): El modelo de Veo
+
+        Returns:
+            Optional[dict]: El trabajo guardado o None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT image, prompt, model, operation_name, state, video_path, message, created_at, updated_at "
+                "FROM jobs WHERE image = ? AND prompt_hash = ? AND model = ?",
+                (os.path.abspath(image), prompt_hash(prompt), model),
+            ).fetchone()
+        return _row_to_job(row) if row else None
+
+    def record_submitted(self, image: str, prompt: str, model: str, operation_name: str, video_path: Optional[str] = None) -> None:
+        """Registra una operación recién lanzada
+
+        Args:
+            image (str): Ruta de la imagen fuente
+            prompt (str): El prompt del video
+            model (str): El modelo de Veo
+            operation_name (str): Nombre de la operación devuelto por Veo
+            video_path (Optional[str], optional): Ruta donde se guardará el video. Defaults to None.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO jobs (image, prompt_hash, model, prompt, operation_name, state, video_path, message, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, 'pending', ?, NULL, ?, ?)
+                ON CONFLICT(image, prompt_hash, model) DO UPDATE SET
+                    operation_name = excluded.operation_name,
+                    state = 'pending',
+                    video_path = COALESCE(excluded.video_path, jobs.video_path),
+                    message = NULL,
+                    created_at = excluded.created_at,
+                    updated_at = excluded.updated_at
+                """,
+                (os.path.abspath(image), prompt_hash(prompt), model, prompt, operation_name, video_path, now, now),
+            )
+            self._conn.commit()
+
+    def mark(
+            self,
+            image: str,
+            prompt: str,
+            model: str,
+            state: str,
+            *,
+            message: Optional[str] = None,
+            video_path: Optional[str] = None,
+    ) -> None:
+        """Actualiza el estado de un trabajo
+
+        Args:
+            image (str): Ruta de la imagen fuente
+            prompt (str): El prompt del video
+            model (str): El modelo de Veo
+            state (str): 'pending', 'done', 'saved' o 'failed'
+            message (Optional[str], optional): Mensaje de error. Defaults to None.
+            video_path (Optional[str], optional): Ruta del video guardado. Defaults to None.
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, message = ?, video_path = COALESCE(?, video_path), updated_at = ? "
+                "WHERE image = ? AND prompt_hash = ? AND model = ?",
+                (state, message, video_path, time.time(), os.path.abspath(image), prompt_hash(prompt), model),
+            )
+            self._conn.commit()
+
+    def resumable(self) -> list[dict]:
+        """Trabajos lanzados cuyo video todavía no se ha guardado
+
+        Returns:
+            list[dict]: Los trabajos en estado 'pending' o 'done', del más antiguo al más reciente
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT image, prompt, model, operation_name, state, video_path, message, created_at, updated_at "
+                f"FROM jobs WHERE state IN ({', '.join('?' * len(RESUMABLE_STATES))}) ORDER BY created_at",
+                RESUMABLE_STATES,
+            ).fetchall()
+        return [_row_to_job(row) for row in rows]
+
+    def latest_states(self) -> dict[str, str]:
+        """Estado del trabajo más reciente de cada imagen
+
+        Returns:
+            dict[str, str]: Ruta absoluta de la imagen -> estado
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT image, state FROM jobs ORDER BY updated_at").fetchall()
+        return dict(rows)
+
+    def close(self) -> None:
+        """Cierra la conexión con la base de datos"""
+        with self._lock:
+            self._conn.close()
+
+def _row_to_job(row: tuple) -> dict:
+    keys = ('image', 'prompt', 'model', 'operation_name', 'state', 'video_path', 'message', 'created_at', 'updated_at')
+    return dict(zip(keys, row))
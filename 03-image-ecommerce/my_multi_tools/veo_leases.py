@@ -0,0 +1,188 @@
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Optional
+
+LEASES_DIRNAME = '.veo_leases'
+DEFAULT_LEASE_TTL_SEC = 120.0
+
+def default_worker_id() -> str:
+    """Identificador único del proceso: host, pid y un sufijo aleatorio"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+def default_lease_ttl() -> float:
+    """Duración de una concesión sin renovar (VEO_LEASE_TTL_SEC)."""
+    try:
+        return max(10.0, float(os.getenv("VEO_LEASE_TTL_SEC", str(DEFAULT_LEASE_TTL_SEC))))
+    except ValueError:
+        return DEFAULT_LEASE_TTL_SEC
+
+def distributed_enabled() -> bool:
+    """Modo de reparto entre varios procesos o máquinas (VEO_DISTRIBUTED=1)."""
+    return os.getenv("VEO_DISTRIBUTED", "0").lower() in ("1", "true", "yes")
+
+class LeaseManager:
+    """
+    Reparto de trabajos entre procesos mediante ficheros de concesión en un directorio compartido.
+
+    Cada trabajo tiene un fichero `<clave>.lease` que se crea con O_CREAT | O_EXCL, así que sólo
+    un proceso lo consigue aunque estén en máquinas distintas. Mientras el trabajo sigue en
+    curso un hilo renueva la fecha de modificación de sus concesiones cada ttl/3; si un
+    proceso muere, su concesión caduca a los ttl segundos y otro la reclama renombrándola
+    primero (el renombrado también es atómico: sólo uno de los que compiten lo logra).
+    Se asume que los relojes de las máquinas están razonablemente sincronizados.
+    """
+    def __init__(self, folder: str, worker_id: Optional[str] = None, ttl_sec: Optional[float] = None):
+        """
+        Prepara el directorio de concesiones
+
+        Args:
+            folder (str): Carpeta compartida (la de videos); las concesiones viven en su subcarpeta LEASES_DIRNAME
+            worker_id (Optional[str], optional): Identificador de este proceso. Defaults to default_worker_id().
+            ttl_sec (Optional[float], optional): Segundos hasta que caduca una concesión sin renovar.
+                Defaults to default_lease_ttl().
+        """
+        self.dir = os.path.join(folder, LEASES_DIRNAME)
+        os.makedirs(self.dir, exist_ok=True)
+        self.worker_id = worker_id or default_worker_id()
+        self.ttl_sec = ttl_sec or default_lease_ttl()
+        self.stats = {'claimed': 0, 'busy': 0, 'reclaimed': 0, 'lost': 0}
+        self._held: set[str] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._renewer: Optional[threading.Thread] = None
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.dir, f"{key}.lease")
+
+    def claim(self, key: str) -> bool:
+        """Intenta quedarse con un trabajo
+
+        Args:
+            key (str): Clave del trabajo (ej: el nombre del video de salida)
+
+        Returns:
+            bool: True si la concesión es ahora de este proceso
+        """
+        path = self._path(key)
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                if not self._reclaim_if_expired(path):
+                    with self._lock:
+                        self.stats['busy'] += 1
+                    return False
+                continue
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'worker': self.worker_id, 'claimed_at': time.time()}, f)
+            with self._lock:
+                self._held.add(key)
+                self.stats['claimed'] += 1
+            self._ensure_renewer()
+            return True
+        return False
+
+    def _reclaim_if_expired(self, path: str) -> bool:
+        """Retira una concesión caducada; True si este proceso la ha retirado"""
+        try:
+            age = time.time() - os.stat(path).st_mtime
+        except FileNotFoundError:
+            return True
+        if age < self.ttl_sec:
+            return False
+        stale_path = f"{path}.{uuid.uuid4().hex}.stale"
+        try:
+            os.rename(path, stale_path)
+        except FileNotFoundError:
+            # Otro proceso la ha retirado antes: se compite por crearla de nuevo
+            return True
+        if time.time() - os.stat(stale_path).st_mtime < self.ttl_sec:
+            # Entre el stat y el rename otro proceso la reclamó y creó una nueva: se devuelve
+            try:
+                os.link(stale_path, path)
+            except FileExistsError:
+                pass
+            os.remove(stale_path)
+            return False
+        owner = _read_owner(stale_path)
+        os.remove(stale_path)
+        print(f"[!] Concesión caducada de {owner or 'desconocido'} ({age:.0f}s): {os.path.basename(path)}")
+        with self._lock:
+            self.stats['reclaimed'] += 1
+        return True
+
+    def owns(self, key: str) -> bool:
+        """Indica si la concesión sigue siendo de este proceso"""
+        return _read_owner(self._path(key)) == self.worker_id
+
+    def renew(self, key: str) -> bool:
+        """Renueva una concesión propia
+
+        Returns:
+            bool: False si se ha perdido (caducó y la reclamó otro proceso)
+        """
+        path = self._path(key)
+        if _read_owner(path) != self.worker_id:
+            with self._lock:
+                if key in self._held:
+                    self._held.discard(key)
+                    self.stats['lost'] += 1
+            print(f"[!] Concesión perdida: {key}")
+            return False
+        try:
+            os.utime(path, None)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def release(self, key: str) -> None:
+        """Libera una concesión propia"""
+        with self._lock:
+            self._held.discard(key)
+        path = self._path(key)
+        if _read_owner(path) == self.worker_id:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def held(self) -> list[str]:
+        with self._lock:
+            return sorted(self._held)
+
+    def _ensure_renewer(self) -> None:
+        with self._lock:
+            if self._renewer is None or not self._renewer.is_alive():
+                self._stop.clear()
+                self._renewer = threading.Thread(target=self._renew_loop, name='veo-lease-renewer', daemon=True)
+                self._renewer.start()
+
+    def _renew_loop(self) -> None:
+        while not self._stop.wait(self.ttl_sec / 3):
+            for key in self.held():
+                self.renew(key)
+
+    def close(self) -> None:
+        """Detiene la renovación y libera las concesiones que queden"""
+        self._stop.set()
+        if self._renewer is not None:
+            self._renewer.join()
+        for key in self.held():
+            self.release(key)
+
+    def __enter__(self) -> 'LeaseManager':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def _read_owner(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return json.load(f).get('worker')
+    except (OSError, ValueError):
+        return None
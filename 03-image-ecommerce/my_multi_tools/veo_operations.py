@@ -0,0 +1,147 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+class OperationPoller:
+    """
+    Sondeo compartido de las operaciones de larga duración de Veo.
+
+    Un único hilo lleva todas las operaciones en curso en una cola de prioridad ordenada
+    por el próximo sondeo. Cada operación se consulta pronto al principio y cada vez más
+    espaciada después (initial_interval * growth^n, hasta max_interval), y el hilo nunca
+    hace más de max_polls_per_sec consultas, así que el tráfico no crece con el número
+    de trabajos. El resultado se entrega con un Future que se resuelve con la operación
+    terminada o con TimeoutError si vence su plazo.
+    """
+    def __init__(
+            self,
+            refresh: Callable[[Any], Any],
+            initial_interval: float = 5.0,
+            max_interval: float = 30.0,
+            growth: float = 1.5,
+            max_polls_per_sec: float = 2.0,
+    ):
+        """
+        Inicializa el sondeo
+
+        Args:
+            refresh (Callable[[Any], Any]): Función que devuelve la operación actualizada (ej: client.operations.get)
+            initial_interval (float, optional): Segundos hasta el primer sondeo de una operación. Defaults to 5.0.
+            max_interval (float, optional): Intervalo máximo entre sondeos de una misma operación. Defaults to 30.0.
+            growth (float, optional): Factor de crecimiento del intervalo tras cada sondeo. Defaults to 1.5.
+            max_polls_per_sec (float, optional): Consultas por segundo máximas entre todas las operaciones. Defaults to 2.0.
+        """
+        self.refresh = refresh
+        self.initial_interval = initial_interval
+        self.max_interval = max(max_interval, initial_interval)
+        self.growth = max(1.0, growth)
+        self.min_spacing = 1.0 / max_polls_per_sec if max_polls_per_sec > 0 else 0.0
+        self.polls = 0
+        self._heap: list[tuple[float, int, dict]] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, operation: Any, timeout_sec: Optional[float] = None, on_done: Optional[Callable[[Future], None]] = None) -> Future:
+        """Añade una operación al sondeo
+
+        Args:
+            operation (Any): La operación devuelta por generate_videos
+            timeout_sec (Optional[float], optional): Plazo máximo desde ahora. Defaults to None (sin plazo).
+            on_done (Optional[Callable[[Future], None]], optional): Callback al terminar. Defaults to None.
+
+        Returns:
+            Future: Se resuelve con la operación terminada
+        """
+        future: Future = Future()
+        future.set_running_or_notify_cancel()
+        if on_done:
+            future.add_done_callback(on_done)
+        if getattr(operation, 'done', False):
+            future.set_result(operation)
+            return future
+
+        now = time.monotonic()
+        job = {
+            'operation': operation,
+            'future': future,
+            'started': now,
+            'deadline': now + timeout_sec if timeout_sec else None,
+            'interval': self.initial_interval,
+            'polls': 0,
+        }
+        with self._condition:
+            self._schedule(job, now + self.initial_interval)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name='veo-operation-poller', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return future
+
+    def wait(self, operation: Any, timeout_sec: Optional[float] = None) -> Any:
+        """Espera a que termine una operación
+
+        Raises:
+            TimeoutError: Si vence el plazo antes de que termine
+
+        Returns:
+            Any: La operación terminada
+        """
+        return self.submit(operation, timeout_sec).result()
+
+    def pending(self) -> int:
+        """Número de operaciones en curso"""
+        with self._condition:
+            return len(self._heap)
+
+    def _schedule(self, job: dict, when: float) -> None:
+        if job['deadline'] is not None:
+            # Una última consulta justo al vencer el plazo
+            when = min(when, job['deadline'])
+        heapq.heappush(self._heap, (when, next(self._counter), job))
+
+    def _loop(self) -> None:
+        last_poll = 0.0
+        while True:
+            with self._condition:
+                while True:
+                    if not self._heap:
+                        # Sin trabajos: el hilo termina y submit lo vuelve a lanzar
+                        self._thread = None
+                        return
+                    when = max(self._heap[0][0], last_poll + self.min_spacing)
+                    delay = when - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self._condition.wait(delay)
+                _, _, job = heapq.heappop(self._heap)
+
+            if job['future'].cancelled():
+                continue
+            last_poll = time.monotonic()
+            try:
+                job['operation'] = self.refresh(job['operation'])
+            except Exception as refresh_err:
+                print(f"[!] Error refrescando operación: {refresh_err}")
+            self.polls += 1
+            job['polls'] += 1
+
+            now = time.monotonic()
+            operation = job['operation']
+            if getattr(operation, 'done', False):
+                job['future'].set_result(operation)
+                continue
+            if job['deadline'] is not None and now >= job['deadline']:
+                elapsed = now - job['started']
+                job['future'].set_exception(TimeoutError(f"Timeout tras {elapsed // 60:.0f} minutos"))
+                continue
+
+            elapsed_min = int((now - job['started']) // 60)
+            if elapsed_min != int((now - job['interval'] - job['started']) // 60):
+                print(f"[!] Esperando {getattr(operation, 'name', 'operación')}… {elapsed_min}m")
+            job['interval'] = min(self.max_interval, job['interval'] * self.growth)
+            with self._condition:
+                self._schedule(job, now + job['interval'])
@@ -0,0 +1,403 @@
+import datetime
+import heapq
+import itertools
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+from .rate_limiter import parse_retry_after
+
+SPEND_LEDGER_FILENAME = '.veo_spend.sqlite'
+LEGACY_SPEND_LEDGER_FILENAME = '.veo_spend.json'
+
+class RetryLater(Exception):
+    """La operación no se pudo lanzar por sobrecarga o cuota; el planificador la reintentará."""
+    def __init__(self, kind: str, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.kind = kind  # 'overloaded' o 'quota'
+        self.retry_after = retry_after
+
+class BudgetExceeded(Exception):
+    """Lanzar otro video superaría el presupuesto de la ejecución o del día."""
+
+def classify_error(error: Exception) -> Optional[RetryLater]:
+    """Convierte un error de Veo reintentable en RetryLater
+
+    Args:
+        error (Exception): El error devuelto por el cliente de GenAI
+
+    Returns:
+        Optional[RetryLater]: El error clasificado o None si no se debe reintentar
+    """
+    text = str(error)
+    if "RESOURCE_EXHAUSTED" in text or "429" in text or "quota" in text.lower():
+        kind = 'quota'
+    elif "503" in text or "UNAVAILABLE" in text or "overloaded" in text.lower():
+        kind = 'overloaded'
+    else:
+        return None
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    retry_after = parse_retry_after(headers.get('Retry-After')) if hasattr(headers, 'get') else None
+    return RetryLater(kind, text, retry_after)
+
+class CircuitBreaker:
+    """
+    Pausa todo el lote mientras el modelo está sobrecargado.
+
+    Tras failure_threshold sobrecargas seguidas el circuito se abre durante cooldown_sec
+    (o lo que indique Retry-After, si es más). Al cerrarse queda a un fallo de volver a
+    abrirse, así que la primera petición hace de prueba.
+    """
+    def __init__(self, failure_threshold: int = 3, cooldown_sec: float = 60.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_sec = cooldown_sec
+        self._failures = 0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    def record_failure(self, retry_after: Optional[float] = None) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                pause = max(self.cooldown_sec, retry_after or 0.0)
+                self._open_until = max(self._open_until, time.monotonic() + pause)
+                self._failures = self.failure_threshold - 1
+                print(f"[!] Veo sobrecargado: lote en pausa {pause:.0f}s")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+
+    def remaining(self) -> float:
+        """Segundos que quedan con el circuito abierto (0 si está cerrado)"""
+        with self._lock:
+            return max(0.0, self._open_until - time.monotonic())
+
+class CostBudget:
+    """
+    Presupuesto de gasto en Veo por ejecución y por día.
+
+    Cada lanzamiento reserva cost_per_video; si la operación no llega a lanzarse la reserva
+    se devuelve. El gasto del día se guarda en SQLite junto a los videos para que lo
+    compartan las distintas ejecuciones: la comprobación del límite diario y el apunte se
+    hacen en una misma transacción (BEGIN IMMEDIATE), así que varios procesos o workers
+    sobre la misma carpeta no pierden gasto ni superan el límite entre los dos.
+    """
+    def __init__(
+            self,
+            cost_per_video: float = 0.5,
+            per_run_usd: float = 0.0,
+            per_day_usd: float = 0.0,
+            ledger_path: Optional[str] = None,
+    ):
+        """
+        Inicializa el presupuesto
+
+        Args:
+            cost_per_video (float, optional): Coste estimado por video en USD. Defaults to 0.5.
+            per_run_usd (float, optional): Máximo por ejecución. 0 sin límite. Defaults to 0.0.
+            per_day_usd (float, optional): Máximo por día (UTC). 0 sin límite. Defaults to 0.0.
+            ledger_path (Optional[str], optional): SQLite con el gasto por día. Defaults to None (sólo en memoria).
+        """
+        self.cost_per_video = cost_per_video
+        self.per_run_usd = per_run_usd
+        self.per_day_usd = per_day_usd
+        self.ledger_path = ledger_path
+        self.run_spent = 0.0
+        self._day_spent: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._ledger_ready = False
+
+    def _today(self) -> str:
+        return datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Conexión al libro de gasto en modo autocommit (las transacciones se abren a mano)"""
+        conn = sqlite3.connect(self.ledger_path, timeout=30, isolation_level=None)
+        if not self._ledger_ready:
+            conn.execute("CREATE TABLE IF NOT EXISTS spend (day TEXT PRIMARY KEY, usd REAL NOT NULL)")
+            self._import_legacy_ledger(conn)
+            self._ledger_ready = True
+        return conn
+
+    def _import_legacy_ledger(self, conn: sqlite3.Connection) -> None:
+        """Incorpora el gasto del antiguo .veo_spend.json la primera vez que se abre el libro"""
+        legacy_path = os.path.join(os.path.dirname(self.ledger_path), LEGACY_SPEND_LEDGER_FILENAME)
+        if not os.path.exists(legacy_path):
+            return
+        try:
+            with open(legacy_path) as f:
+                legacy = {day: float(usd) for day, usd in json.load(f).items()}
+        except (OSError, ValueError, AttributeError):
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("INSERT OR IGNORE INTO spend (day, usd) VALUES (?, ?)", legacy.items())
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        try:
+            os.replace(legacy_path, f"{legacy_path}.imported")
+        except FileNotFoundError:  # Otro proceso lo importó a la vez (INSERT OR IGNORE evita duplicarlo)
+            pass
+
+    def _change_day(self, amount: float, limit: float = 0.0) -> None:
+        """Suma amount al gasto del día comprobando antes el límite diario, de forma atómica
+
+        Raises:
+            BudgetExceeded: Si con amount se superaría limit (0 sin límite)
+        """
+        today = self._today()
+        if not self.ledger_path:
+            spent = self._day_spent.get(today, 0.0)
+            if limit and spent + amount > limit + 1e-9:
+                raise BudgetExceeded(f"Presupuesto diario agotado ({spent:.2f}/{limit:.2f} USD)")
+            self._day_spent[today] = max(0.0, round(spent + amount, 4))
+            return
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT usd FROM spend WHERE day = ?", (today,)).fetchone()
+                spent = row[0] if row else 0.0
+                if limit and spent + amount > limit + 1e-9:
+                    raise BudgetExceeded(f"Presupuesto diario agotado ({spent:.2f}/{limit:.2f} USD)")
+                conn.execute(
+                    "INSERT INTO spend (day, usd) VALUES (?, ?) "
+                    "ON CONFLICT(day) DO UPDATE SET usd = excluded.usd",
+                    (today, max(0.0, round(spent + amount, 4))),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    def spent_today(self) -> float:
+        with self._lock:
+            if not self.ledger_path:
+                return self._day_spent.get(self._today(), 0.0)
+            conn = self._connect()
+            try:
+                row = conn.execute("SELECT usd FROM spend WHERE day = ?", (self._today(),)).fetchone()
+            finally:
+                conn.close()
+            return row[0] if row else 0.0
+
+    def reserve(self) -> None:
+        """Reserva el coste de un video
+
+        Raises:
+            BudgetExceeded: Si se superaría el límite de la ejecución o del día
+        """
+        cost = self.cost_per_video
+        with self._lock:
+            if self.per_run_usd and self.run_spent + cost > self.per_run_usd + 1e-9:
+                raise BudgetExceeded(f"Presupuesto de la ejecución agotado ({self.run_spent:.2f}/{self.per_run_usd:.2f} USD)")
+            self._change_day(cost, self.per_day_usd)
+            self.run_spent += cost
+
+    def refund(self) -> None:
+        """Devuelve una reserva cuyo video no llegó a lanzarse"""
+        with self._lock:
+            self.run_spent = max(0.0, self.run_spent - self.cost_per_video)
+            self._change_day(-self.cost_per_video)
+
+    @classmethod
+    def from_env(cls, folder: Optional[str] = None) -> 'CostBudget':
+        """Presupuesto desde VEO_COST_PER_VIDEO, VEO_BUDGET_PER_RUN_USD y VEO_BUDGET_PER_DAY_USD."""
+        def number(name: str, default: float) -> float:
+            try:
+                return float(os.getenv(name, str(default)))
+            except ValueError:
+                return default
+        return cls(
+            cost_per_video=number("VEO_COST_PER_VIDEO", 0.5),
+            per_run_usd=number("VEO_BUDGET_PER_RUN_USD", 0.0),
+            per_day_usd=number("VEO_BUDGET_PER_DAY_USD", 0.0),
+            ledger_path=os.path.join(folder, SPEND_LEDGER_FILENAME) if folder else None,
+        )
+
+class VeoScheduler:
+    """
+    Planificador de trabajos de Veo con prioridades, presupuesto y concurrencia adaptativa.
+
+    Los trabajos salen de una cola de prioridad (menor valor primero y, a igualdad, por
+    orden de llegada). La concurrencia arranca en max_concurrent, se reduce a la mitad
+    con cada error de cuota y sube de uno en uno tras increase_after éxitos seguidos.
+    Un trabajo que lanza RetryLater vuelve a la cola con backoff exponencial con jitter
+    (o el Retry-After del servidor) hasta max_attempts intentos; las sobrecargas
+    alimentan además un CircuitBreaker que detiene el lote entero.
+    """
+    def __init__(
+            self,
+            max_concurrent: int = 4,
+            *,
+            min_concurrent: int = 1,
+            budget: Optional[CostBudget] = None,
+            breaker: Optional[CircuitBreaker] = None,
+            max_attempts: int = 5,
+            base_delay: float = 4.0,
+            max_delay: float = 300.0,
+            increase_after: int = 3,
+    ):
+        self.max_concurrent = max(1, max_concurrent)
+        self.min_concurrent = max(1, min(min_concurrent, self.max_concurrent))
+        self.limit = self.max_concurrent
+        self.budget = budget
+        self.breaker = breaker or CircuitBreaker()
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.increase_after = max(1, increase_after)
+        self.stats = {'completed': 0, 'retried': 0, 'quota_errors': 0, 'overloaded_errors': 0}
+        self._ready: list[tuple[int, int, dict]] = []
+        self._delayed: list[tuple[float, int, dict]] = []
+        self._counter = itertools.count()
+        self._active = 0
+        self._successes = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._workers: list[threading.Thread] = []
+
+    def submit(self, fn: Callable[..., Any], *args, priority: int = 0, **kwargs) -> Future:
+        """Encola un trabajo
+
+        Args:
+            fn (Callable[..., Any]): La función del trabajo; puede lanzar RetryLater o BudgetExceeded
+            priority (int, optional): Menor valor se ejecuta antes. Defaults to 0.
+
+        Returns:
+            Future: Se resuelve con el resultado de fn o con su excepción definitiva
+        """
+        future: Future = Future()
+        job = {'fn': fn, 'args': args, 'kwargs': kwargs, 'priority': priority, 'future': future, 'attempts': 0}
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("El planificador está cerrado")
+            heapq.heappush(self._ready, (priority, next(self._counter), job))
+            if len(self._workers) < self.max_concurrent:
+                worker = threading.Thread(target=self._worker, name=f'veo-scheduler-{len(self._workers)}', daemon=True)
+                self._workers.append(worker)
+                worker.start()
+            self._condition.notify_all()
+        return future
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Cierra la cola; los trabajos ya encolados se terminan"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def __enter__(self) -> 'VeoScheduler':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown(wait=True)
+
+    def before_submit(self) -> None:
+        """Se llama justo antes de lanzar una operación: respeta el circuito y reserva presupuesto
+
+        Raises:
+            BudgetExceeded: Si no queda presupuesto
+        """
+        while (pause := self.breaker.remaining()) > 0:
+            time.sleep(pause)
+        if self.budget:
+            self.budget.reserve()
+
+    def submit_failed(self) -> None:
+        """La operación no llegó a lanzarse: se devuelve la reserva"""
+        if self.budget:
+            self.budget.refund()
+
+    def _next_job(self) -> Optional[dict]:
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, _, job = heapq.heappop(self._delayed)
+                    heapq.heappush(self._ready, (job['priority'], next(self._counter), job))
+                pause = self.breaker.remaining()
+                if self._ready and self._active < self.limit and not pause:
+                    _, _, job = heapq.heappop(self._ready)
+                    self._active += 1
+                    return job
+                if self._closed and not self._ready and not self._delayed and not self._active:
+                    self._condition.notify_all()
+                    return None
+                waits = [w for w in (pause, self._delayed[0][0] - now if self._delayed else None) if w]
+                self._condition.wait(min(waits) if waits else None)
+
+    def _worker(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            job['attempts'] += 1
+            try:
+                result = job['fn'](*job['args'], **job['kwargs'])
+            except RetryLater as e:
+                self._on_retry(job, e)
+                continue
+            except BaseException as e:
+                self._finish(job)
+                job['future'].set_exception(e)
+                continue
+            self._on_success()
+            self._finish(job)
+            job['future'].set_result(result)
+
+    def _finish(self, job: dict) -> None:
+        with self._condition:
+            self._active -= 1
+            self.stats['completed'] += 1
+            self._condition.notify_all()
+
+    def _on_success(self) -> None:
+        self.breaker.record_success()
+        with self._condition:
+            self._successes += 1
+            if self._successes >= self.increase_after and self.limit < self.max_concurrent:
+                self.limit += 1
+                self._successes = 0
+                print(f"[VEO] Concurrencia aumentada a {self.limit}")
+
+    def _on_retry(self, job: dict, error: RetryLater) -> None:
+        if error.kind == 'overloaded':
+            self.stats['overloaded_errors'] += 1
+            self.breaker.record_failure(error.retry_after)
+        else:
+            self.stats['quota_errors'] += 1
+        with self._condition:
+            self._active -= 1
+            self._successes = 0
+            if error.kind == 'quota':
+                new_limit = max(self.min_concurrent, self.limit // 2)
+                if new_limit != self.limit:
+                    self.limit = new_limit
+                    print(f"[!] Cuota de Veo agotada: concurrencia reducida a {self.limit}")
+            if job['attempts'] >= self.max_attempts:
+                self.stats['completed'] += 1
+                self._condition.notify_all()
+                job['future'].set_exception(error)
+                return
+            delay = error.retry_after if error.retry_after is not None else random.uniform(
+                0, min(self.max_delay, self.base_delay * 2 ** (job['attempts'] - 1))
+            )
+            delay = min(delay, self.max_delay)
+            self.stats['retried'] += 1
+            print(f"[VEO] Reintento {job['attempts']}/{self.max_attempts - 1} en {delay:.0f}s ({error.kind})")
+            heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._counter), job))
+            self._condition.notify_all()
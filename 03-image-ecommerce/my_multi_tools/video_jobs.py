@@ -0,0 +1,171 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+JOB_STATES = ('queued', 'running', 'done', 'failed')
+MAX_FINISHED_JOBS = 200
+MAX_RESULTS_IN_STATUS = 50
+
+def default_max_batches() -> int:
+    """Lotes de video que se ejecutan a la vez en segundo plano (VEO_MAX_BATCHES)."""
+    try:
+        return max(1, int(os.getenv("VEO_MAX_BATCHES", "4")))
+    except ValueError:
+        return 4
+
+class VideoJobManager:
+    """
+    Trabajos de generación de video en segundo plano para las herramientas del agente.
+
+    submit() devuelve un identificador al momento y ejecuta el lote en un pool de hilos, así
+    que el turno del agente no espera a Veo y un mismo servidor atiende los lotes de varios
+    usuarios a la vez. El lote informa de cada imagen terminada (on_result) y status()
+    devuelve el progreso y, al acabar, el resumen. Se conservan los últimos
+    MAX_FINISHED_JOBS trabajos terminados.
+    """
+    def __init__(self, max_workers: Optional[int] = None):
+        """
+        Inicializa el gestor
+
+        Args:
+            max_workers (Optional[int], optional): Lotes simultáneos. Defaults to default_max_batches().
+        """
+        self.max_workers = max_workers or default_max_batches()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._jobs: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn: Callable[..., dict], *args, total: int = 0, **kwargs) -> dict[str, Any]:
+        """Lanza un lote en segundo plano
+
+        fn recibe además on_result, que el gestor usa para contar el progreso.
+
+        Args:
+            kind (str): Tipo de trabajo (ej: 'carpeta'), sólo informativo
+            fn (Callable[..., dict]): La función del lote (ej: generate_videos_for_list)
+            total (int, optional): Imágenes previstas, para el progreso. Defaults to 0.
+
+        Returns:
+            dict[str, Any]: El estado inicial del trabajo, con su 'job_id'
+        """
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            'job_id': job_id,
+            'kind': kind,
+            'state': 'queued',
+            'total': total,
+            'progress': {'processed': 0, 'skipped': 0, 'failed': 0},
+            'submitted_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'results': [],
+            'summary': None,
+            'error': None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._trim()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='veo-batch')
+            executor = self._executor
+        executor.submit(self._run, job, fn, args, kwargs)
+        print(f"[VEO] Trabajo {job_id} en cola ({kind}, {total} imágenes)")
+        return self.status(job_id)
+
+    def _run(self, job: dict, fn: Callable[..., dict], args: tuple, kwargs: dict) -> None:
+        with self._lock:
+            job['state'] = 'running'
+            job['started_at'] = time.time()
+
+        def on_result(result: dict) -> None:
+            with self._lock:
+                status = result.get('status')
+                if status in job['progress']:
+                    job['progress'][status] += 1
+                job['results'].append(result)
+
+        try:
+            summary = fn(*args, on_result=on_result, **kwargs)
+        except Exception as e:
+            print(f"[x] Trabajo {job['job_id']} fallido: {e}")
+            with self._lock:
+                job['state'] = 'failed'
+                job['error'] = f"{type(e).__name__}: {e}"
+                job['finished_at'] = time.time()
+            return
+        with self._lock:
+            job['summary'] = {k: v for k, v in summary.items() if k != 'results'}
+            if summary.get('status') == 'error':
+                job['state'] = 'failed'
+                job['error'] = summary.get('message')
+            else:
+                job['state'] = 'done'
+                job['results'] = [r for r in summary.get('results', []) if r]
+            job['finished_at'] = time.time()
+        print(f"[VEO] Trabajo {job['job_id']} terminado: {job['state']}")
+
+    def status(self, job_id: str) -> dict[str, Any]:
+        """Estado, progreso y resultados de un trabajo
+
+        Returns:
+            dict[str, Any]: El trabajo (los últimos MAX_RESULTS_IN_STATUS resultados) o status 'error' si no existe
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return {'status': 'error', 'message': f"No existe el trabajo {job_id}"}
+            return _describe(job, MAX_RESULTS_IN_STATUS)
+
+    def list_jobs(self) -> list[dict[str, Any]]:
+        """Resumen de todos los trabajos conocidos, del más reciente al más antiguo (sin resultados)"""
+        with self._lock:
+            return [_describe(job, 0) for job in reversed(self._jobs.values())]
+
+    def _trim(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job['state'] in ('done', 'failed')]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Espera a los lotes en curso y cierra el pool"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+def _describe(job: dict, max_results: int) -> dict[str, Any]:
+    progress = dict(job['progress'])
+    completed = sum(progress.values())
+    end = job['finished_at'] or time.time()
+    described = {
+        'status': 'success',
+        'job_id': job['job_id'],
+        'kind': job['kind'],
+        'state': job['state'],
+        'total': job['total'],
+        'completed': completed,
+        'progress': progress,
+        'elapsed_sec': round(end - (job['started_at'] or end)),
+    }
+    if job['summary'] is not None:
+        described['summary'] = dict(job['summary'])
+    if job['error']:
+        described['error'] = job['error']
+    if max_results:
+        described['results'] = [dict(r) for r in job['results'][-max_results:]]
+    return described
+
+_manager: Optional[VideoJobManager] = None
+_manager_lock = threading.Lock()
+
+def job_manager() -> VideoJobManager:
+    """Gestor de trabajos compartido por todas las sesiones del proceso."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = VideoJobManager()
+        return _manager
@@ -0,0 +1,109 @@
+import hashlib
+import io
+import os
+from abc import ABC, abstractmethod
+from typing import Iterable, Optional
+
+CHUNK_SIZE = 1024 * 1024
+
+class ChunkSink(ABC):
+    """Escritura por bloques común a los destinos de video: las subclases implementan write()"""
+    bytes_written = 0
+
+    @abstractmethod
+    def write(self, chunk: bytes) -> None:
+        """Escribe un bloque y suma su tamaño a bytes_written
+
+        Args:
+            chunk (bytes): El bloque recibido
+        """
+
+    def write_all(self, data: bytes) -> None:
+        """Escribe un contenido ya en memoria por bloques (respuestas con bytes en línea)"""
+        view = memoryview(data)
+        for start in range(0, len(view), CHUNK_SIZE):
+            self.write(view[start:start + CHUNK_SIZE])
+
+    def write_iter(self, chunks: Iterable[bytes]) -> None:
+        """Escribe todos los bloques de un iterable (ej: response.iter_content)"""
+        for chunk in chunks:
+            self.write(chunk)
+
+class BufferSink(ChunkSink):
+    """Destino en memoria con la interfaz de VideoSink, para quien necesita los bytes del video"""
+    def __init__(self):
+        self.bytes_written = 0
+        self._buffer = io.BytesIO()
+
+    def write(self, chunk: bytes) -> None:
+        self._buffer.write(chunk)
+        self.bytes_written += len(chunk)
+
+    def getvalue(self) -> bytes:
+        return self._buffer.getvalue()
+
+class VideoSink(ChunkSink):
+    """
+    Destino de escritura atómica para videos recibidos por partes.
+
+    Los bloques se escriben en `<destino>.part` a medida que llegan, calculando el tamaño
+    y el SHA-256 por el camino. commit() hace fsync y renombra al destino final, de modo
+    que nunca queda un MP4 a medias con el nombre definitivo ni el video entero en memoria.
+    """
+    def __init__(self, dest_path: str):
+        """
+        Abre el fichero temporal junto al destino
+
+        Args:
+            dest_path (str): Ruta final del video
+        """
+        self.dest_path = dest_path
+        self.part_path = f"{dest_path}.part"
+        self.bytes_written = 0
+        self._digest = hashlib.sha256()
+        os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+        self._file: Optional[object] = open(self.part_path, 'wb')
+
+    def write(self, chunk: bytes) -> None:
+        """Añade un bloque al fichero temporal"""
+        if not chunk:
+            return
+        self._file.write(chunk)  # type: ignore[union-attr]
+        self._digest.update(chunk)
+        self.bytes_written += len(chunk)
+
+    @property
+    def sha256(self) -> str:
+        return self._digest.hexdigest()
+
+    def commit(self) -> dict:
+        """Vuelca a disco y renombra el temporal al destino final
+
+        Returns:
+            dict: 'video_path', 'bytes' y 'sha256' del video guardado
+        """
+        f = self._file
+        self._file = None
+        f.flush()  # type: ignore[union-attr]
+        os.fsync(f.fileno())  # type: ignore[union-attr]
+        f.close()  # type: ignore[union-attr]
+        os.replace(self.part_path, self.dest_path)
+        return {'video_path': self.dest_path, 'bytes': self.bytes_written, 'sha256': self.sha256}
+
+    def abort(self) -> None:
+        """Descarta el fichero temporal"""
+        if self._file is not None:
+            self._file.close()  # type: ignore[union-attr]
+            self._file = None
+        try:
+            os.remove(self.part_path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> 'VideoSink':
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        # Si no se llegó a hacer commit, no se deja nada a medias
+        if self._file is not None:
+            self.abort()
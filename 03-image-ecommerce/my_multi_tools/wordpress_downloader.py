@@ -1,185 +1,171 @@
 import requests
-import os
 import json
-import time
-
-class WordPressMediaDownload:
+from collections import deque
+from itertools import islice
+from typing import Iterator, Optional
+from concurrent.futures import ThreadPoolExecutor
+from .cms_connectors import CMSMediaDownload
+
+# Proyección de campos en el servidor: sólo lo que usan los filtros y la descarga
+MEDIA_FIELDS = ','.join([
+    'id',
+    'source_url',
+    'media_type',
+    'mime_type',
+    'alt_text',
+    'media_details.width',
+    'media_details.height',
+    'media_details.filesize',
+    'media_details.sizes',
+    'modified_gmt',
+])
+
+class WordPressMediaDownload(CMSMediaDownload):
     """
     Una herramienta para descargar las imágenes a través de una API desde la carpeta de medias WordPress
     """
-    def __init__(self, wordpress_url: str):
+    platform_name = 'WordPress'
+
+    def __init__(self, wordpress_url: str, **kwargs):
         """ 
         Inicializa el descargador con la URL del sitio WordPress
 
         Args:
             wordpress_url (str): La URL del sitio WordPress
+            **kwargs: Opciones del motor de descarga (ver CMSMediaDownload): max_workers, max_per_host,
+                dedup, requests_per_second, host_rates, min_edge, filters, transport y link_duplicates
         """
         if not wordpress_url.startswith(("http://", "https://")):
             raise ValueError("La URL de WordPress debe comenzar con http:// o https://")
+        super().__init__(**kwargs)
         self.base_url = wordpress_url.rstrip('/')
         self.api_endpoint = f"{self.base_url}/wp-json/wp/v2/media"
-        self.exclude_keywords = ['screenshot', 'elementor', 'logo', 'icon', 'banner', 'filtros', 'background']
-        self.downloaded_count = 0
-        self.skipped_count = 0
-        self.failed_count = 0
 
-    def _is_potential_image(self, media_item: dict) -> bool:
-        """Aplica heurísticas para determinar si una imagen es probablemente una foto de producto
+    def _fetch_page(
+            self,
+            page: int,
+            per_page: int,
+            modified_after: Optional[str] = None,
+    ) -> tuple[list[dict], int, int]:
+        """Descarga una página del listado de medios pidiendo sólo los campos necesarios
 
         Args:
-            media_item (dict): El elemento de medios a evaluar
+            page (int): Número de página (empezando en 1)
+            per_page (int): Elementos por página (WordPress admite como máximo 100)
+            modified_after (Optional[str], optional): Sólo elementos modificados después de esta fecha ISO 8601. Defaults to None.
 
         Returns:
-            bool: True si la imagen pasa los filtros, False en caso contrario
-        """
-        # 1º Filtro
-        if media_item.get('media_type') != 'image':
-            return False
-        
-        source_url = media_item.get('source_url', '').lower()
-        if not source_url:
-            return False
-        
-        # 2º Filtro: El nombre del archivo no debe contener palabras clave excluidas
-        for keyword in self.exclude_keywords:
-            if keyword in source_url:
-                print(f"Filtrado por palabra clave {keyword}: {source_url}")
-                return False
-            
-        # 3º Filtro: La imagen debe tener dimensiones mínimas (ejemplo: al menos 300x300)
-        media_details = media_item.get('media_details', {})
-        width = media_details.get('width', 0)
-        height = media_details.get('height', 0)
-        min_dimension = 300
-        if width < min_dimension or height < min_dimension:
-            print(f"Filtrado por dimensiones insuficientes ({width}x{height}): {source_url}")
-            return False
-        return True
-
-    def fetch_media_urls(self, max_images: int = 0) -> list[str]:
+            tuple[list[dict], int, int]: Los elementos de la página, el total de elementos
+            (X-WP-Total) y el total de páginas (X-WP-TotalPages); 0 si la cabecera no viene
         """
-        Recupera todas las URLs de imágenes de la API de medios, manejando la paginación
-
-        Returns:
-            list[str]: Una lista de URLs de imágenes
+        params = {
+            'per_page': per_page,
+            'page': page,
+            '_fields': MEDIA_FIELDS,
+        }
+        if modified_after:
+            params['modified_after'] = modified_after
+        with self.transport.host_slot(self.api_endpoint):
+            response = self.transport.request('GET', self.api_endpoint, params=params, timeout=30)
+        # WordPress devuelve 400 (rest_post_invalid_page_number) al pedir una página fuera de rango
+        if response.status_code == 400 and page > 1:
+            return [], 0, 0
+        response.raise_for_status() # Lanza un error para códigos de estado 4xx/5xx
+        total = int(response.headers.get('X-WP-Total', 0) or 0)
+        total_pages = int(response.headers.get('X-WP-TotalPages', 0) or 0)
+        return response.json(), total, total_pages
+
+    def iter_media_items(
+            self,
+            max_images: int = 0,
+            per_page: int = 100,
+            modified_after: Optional[str] = None,
+    ) -> Iterator[dict]:
         """
-        all_image_urls = []
-        page = 1
-        per_page = 10 # Este valor lo podemos ajusta a las páginas que queramos
-
-        print(f"Inicializando la obtención de URLs desde {self.api_endpoint}")
-
-        while True:
-            if max_images > 0 and len(all_image_urls) >= max_images:
-                break
-
-            params = {
-                'per_page': per_page,
-                'page': page
-            }
-            try:
-                response = requests.get(
-                    self.api_endpoint, 
-                    params=params, 
-                    timeout=30
-                    )
-                response.raise_for_status() # Lanza un error para códigos de estado 4xx/5xx
-                media_items = response.json()
-
-                if not media_items:
-                    print("No se encontraron más elementos de medios.")
-                    break
-                
-                valid_count_before = len(all_image_urls)
-                for item in media_items:
-                    # Nos asguramos de que el item es una imagen y tiene la URL
-                    if self._is_potential_image(item):
-                        all_image_urls.append(item['source_url'])
-                        if max_images > 0 and len(all_image_urls) >= max_images:
-                            break
-                    
-                    added = len(all_image_urls) - valid_count_before
-                    print(f"Página {page}: Obtenidas {len(media_items)} URLs de imágenes.")
-                    page += 1
-                    time.sleep(1) # Pausa para evitar sobrecargar el servidor
+        Genera los elementos de medios que pasan los filtros de producto a medida que llegan las páginas.
 
-            except requests.exceptions.Timeout as e:
-                print(f"Error: el servidor no respondió a tiempo en la página {page}. {e}")
-                break
-            except requests.exceptions.RequestException as e:
-                print(f"Error al conectarse a la API de WordPress: {e}")
-                break
-            except json.JSONDecodeError:
-                print(f"Error: la respuesta de la API en la página {page} no es JSON válido.")
-                break
+        Lee X-WP-Total/X-WP-TotalPages de la primera respuesta y pide por adelantado hasta
+        max_workers páginas en paralelo, entregándolas en orden. Si el servidor no envía esas
+        cabeceras, recorre las páginas una a una hasta encontrar una vacía. La memoria usada
+        no depende del tamaño de la librería.
 
-        final_urls = all_image_urls[:max_images] if max_images > 0 else all_image_urls
+        Args:
+            max_images (int, optional): Número máximo de imágenes. 0 para ilimitado. Defaults to 0.
+            per_page (int, optional): Elementos por página, como máximo 100. Defaults to 100.
+            modified_after (Optional[str], optional): Sólo elementos modificados después de esta fecha ISO 8601. Defaults to None.
 
-        print(f"Se encontraron un total de {len(final_urls)} URLs de imágenes válidas.")
-        return final_urls
+        Yields:
+            dict: Los elementos de medios válidos, en el orden de la API
+        """
+        per_page = max(1, min(per_page, 100))
+        yielded = 0
 
-    def download_images(self, urls: list[str], destination_folder: str = 'images'):
-        """Descarga imágenes desde una lista de URLs a una carpeta de destino
+        def accepted(page: int, media_items: list[dict]) -> list[dict]:
+            # Nos asguramos de que el item es una imagen y tiene la URL
+            print(f"Página {page}: Obtenidos {len(media_items)} elementos de medios.")
+            valid = self.filters.filter_page(media_items)
+            return valid[:max_images - yielded] if max_images > 0 else valid
 
-        Args:
-            urls (list[str]): Lista de URLs de imágenes a descargar
-            destination_folder (str, optional): Carpeta de destino para las imágenes descargadas. Defaults to 'images'.
-        """
-        if not urls:
-            print("No hay URLs para descargar.")
-            return
-        
-        # print(f"Creando directorio de destino: {destination_folder}")
-        # os.makedirs(destination_folder, exist_ok=True)
-        # Vamos crear el destino de manera realita a la carpeta de 'image-ecommerce'
-        project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
-        abs_destination_folder = os.path.join(project_root, destination_folder)
-
-        print(f'Creando directorio de destino: {abs_destination_folder}')
-        os.makedirs(abs_destination_folder, exist_ok=True)
-
-        for url in urls:
-            try:
-                # Estraer el nombre del fichero de la URL
-                # filename = url.split('/')[-1]
-                filename = url.split('/')[-1].split('?')[0]  # Eliminar parámetros de consulta si existen
-                filepath = os.path.join(abs_destination_folder, filename)
-
-                if os.path.exists(filepath):
-                    print(f"El archivo {filename} ya existe. Saltando descarga.")
-                    self.skipped_count += 1
-                    continue
-
-                print(f"Descargando {url} -> {filepath}")
-                with requests.get(url, stream=True, timeout=15) as r:
-                    r.raise_for_status()
-                    with open(filepath, 'wb') as f:
-                        for chunk in r.iter_content(chunk_size=8192):
-                            f.write(chunk)
-                self.downloaded_count += 1
-            except requests.exceptions.RequestException as e:
-                print(f"Error al descargar {url}: {e}")
-                self.failed_count += 1
-            except Exception as e:
-                print(f"Error inesperado al descargar {url}: {e}")
-                self.failed_count += 1
-    def run(self, destination_folder: str, max_images: int = 0):
-        """Método principal para obtener las URLs de imágenes y descargarlas
+        print(f"Inicializando la obtención de URLs desde {self.api_endpoint}")
 
-        Args:
-            destination_folder (str, optional): Carpeta de destino para las imágenes descargadas.
-            max_images (int, optional): Número máximo de imágenes a descargar. 0 para ilimitado. Defaults to 0.
-        """
-        print(f"Iniciando el proceso de descarga de imágenes desde WordPress... Límite de descarga de imágenes: {'Sin límite' if max_images == 0 else max_images}")
-        media_urls = self.fetch_media_urls(max_images=max_images)
-        if media_urls:
-            self.download_images(media_urls, destination_folder)
-        print("Proceso de descarga completado.")
+        page = 1
+        try:
+            media_items, total, total_pages = self._fetch_page(page, per_page, modified_after)
+            if not media_items:
+                print("No se encontraron más elementos de medios.")
+                return
+            if total_pages:
+                print(f"La librería de medios tiene {total} elementos en {total_pages} páginas.")
+            for item in accepted(page, media_items):
+                yielded += 1
+                yield item
+
+            if total_pages:
+                # Páginas restantes en paralelo con una ventana de max_workers páginas por adelantado
+                next_pages = iter(range(2, total_pages + 1))
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    pending: deque = deque()
+                    for p in islice(next_pages, self.max_workers):
+                        pending.append((p, executor.submit(self._fetch_page, p, per_page, modified_after)))
+                    while pending and not (max_images > 0 and yielded >= max_images):
+                        page, future = pending.popleft()
+                        media_items = future.result()[0]
+                        for p in islice(next_pages, 1):
+                            pending.append((p, executor.submit(self._fetch_page, p, per_page, modified_after)))
+                        for item in accepted(page, media_items):
+                            yielded += 1
+                            yield item
+                    for _, future in pending:
+                        future.cancel()
+            else:
+                while not (max_images > 0 and yielded >= max_images):
+                    page += 1
+                    media_items, _, _ = self._fetch_page(page, per_page, modified_after)
+                    if not media_items:
+                        print("No se encontraron más elementos de medios.")
+                        break
+                    for item in accepted(page, media_items):
+                        yielded += 1
+                        yield item
+
+        except requests.exceptions.Timeout as e:
+            self.listing_failed = True
+            print(f"Error: el servidor no respondió a tiempo al listar los medios. {e}")
+        except requests.exceptions.RequestException as e:
+            self.listing_failed = True
+            print(f"Error al conectarse a la API de WordPress: {e}")
+        except json.JSONDecodeError:
+            self.listing_failed = True
+            print("Error: la respuesta de la API al listar los medios no es JSON válido.")
+
+        print(self.filters.summary())
 
 def download_imagenes_wordpress(
     wordpress_url: str, 
     destination_folder: str = "image-ecommerce/images/wordpress", 
-    max_images: int = 0
+    max_images: int = 0,
+    incremental: bool = False,
+    min_edge: int = 0
     ) -> str:
     """Descarga de imágenes de productos desde un sitio de WordPress a una carpeta local.
 
@@ -187,20 +173,25 @@ def download_imagenes_wordpress(
         wordpress_url (str): La URL del sitio de WordPress desde donde descargar las imágenes.
         destination_folder (str, optional): La carpeta local donde se guardarán las imágenes. Defaults to "image-ecommerce/images/wordpress".
         max_images (int, optional): El número máximo de imágenes a descargar. Si es 0, se descargarán todas las imágenes.
+        incremental (bool, optional): Si se sincroniza sólo lo modificado desde la última ejecución.
+        min_edge (int, optional): Lado corto mínimo en píxeles para descargar una versión reducida en lugar del original. 0 para el original.
     Returns:
         str: Un mensaje indicando el resultado de la operación.
     """
     try:
-        downloader = WordPressMediaDownload(wordpress_url=wordpress_url)
+        downloader = WordPressMediaDownload(wordpress_url=wordpress_url, min_edge=min_edge)
         downloader.run(
             destination_folder=destination_folder, 
-            max_images=max_images
+            max_images=max_images,
+            incremental=incremental
             )
         summary = (
             f"Descarga completada. "
             f"Imágenes descargadas: {downloader.downloaded_count}, "
             f"Saltadas: {downloader.skipped_count}, "
-            f"Fallidas: {downloader.failed_count}."
+            f"Fallidas: {downloader.failed_count}. "
+            f"Velocidad: {downloader.throughput.get('bytes_per_sec', 0) / (1024 * 1024):.2f} MB/s, "
+            f"{downloader.throughput.get('files_per_sec', 0):.2f} archivos/s."
         )
         return summary
     except Exception as e: